@@ -0,0 +1,43 @@
+"""Generate a synthetic uv.lock and config, for benchmarks and scaling tests."""
+
+import argparse
+import sys
+from pathlib import Path
+
+# the generator lives with the tests, which use it the most
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from tests.corpus import generate_corpus
+
+
+def main() -> None:
+    """Write the generated uv.lock and config to the output directory."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("output_dir", type=Path, help="directory to write into")
+    parser.add_argument("--packages", type=int, default=1000, help="locked packages")
+    parser.add_argument("--repos", type=int, default=1000, help="config repos")
+    parser.add_argument(
+        "--pragmas", type=int, default=1000, help="'# sync-with-uv' lines"
+    )
+    parser.add_argument("--wheels", type=int, default=8, help="wheels per package")
+    parser.add_argument("--format", choices=["yaml", "toml"], default="yaml")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(
+        args.packages,
+        args.repos,
+        args.pragmas,
+        config_format=args.format,
+        n_wheels=args.wheels,
+        seed=args.seed,
+    )
+    config_name = ".pre-commit-config.yaml" if args.format == "yaml" else "prek.toml"
+    args.output_dir.mkdir(parents=True, exist_ok=True)
+    for name, text in (("uv.lock", corpus.uv_lock), (config_name, corpus.config)):
+        path = args.output_dir / name
+        path.write_text(text, encoding="utf-8")
+        print(f"Wrote {path} ({len(text.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    main()
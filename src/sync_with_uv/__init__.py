@@ -3,7 +3,13 @@
 © 2025 Tsvika Shapira. Some rights reserved.
 """
 
-from ._version import version as _version
+import time
+
+# Taken before any other import, so that ``--profile`` can report import time.
+IMPORT_START_NS = time.perf_counter_ns()
+IMPORT_START_CPU_NS = time.process_time_ns()
+
+from ._version import version as _version  # noqa: E402
 
 __version__ = _version
 __all__: list[str] = []
@@ -0,0 +1,283 @@
+"""Sync a fleet of projects into one combined ``git apply`` patch.
+
+Each project is synced in memory and never written to. The patch of its config
+is rendered from the engine's edits, without diffing the texts, and handed over
+as soon as the project is done, so a combined patch of hundreds of projects
+streams out while they are synced, and can be reviewed and applied in one go.
+
+On a network file system, reading the files of a project mostly waits on the
+server rather than the CPU, so the files of the next projects are read on a
+pool of threads while a project is synced. How many projects, and how many
+bytes, are read ahead is bounded, to bound the memory they take.
+"""
+
+import collections
+import concurrent.futures
+import contextlib
+from collections.abc import Callable, Iterable, Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+from .diff import git_patch_from_edits
+from .lock_index import lock_index_path
+from .repo_data import parse_user_mappings
+from .stamp import compute_stamp, read_stamp
+from .sync_with_uv import (
+    CONFIG_FILENAMES,
+    Changes,
+    config_format_for,
+    sync_config_lines,
+    uv_data_from_bytes,
+)
+
+# The defaults of how many projects, and how many bytes of their files, a fleet
+# sync reads ahead.
+DEFAULT_PREFETCH_PROJECTS = 8
+DEFAULT_PREFETCH_BYTES = 64 * 1024 * 1024
+
+
+class Project(NamedTuple):
+    """The files of a project to sync."""
+
+    config_path: Path
+    uv_lock_path: Path
+    pyproject_path: Path
+
+
+def find_project(directory: Path) -> Project:
+    """Return the project in *directory*.
+
+    Its config is the first of :data:`~sync_with_uv.sync_with_uv.CONFIG_FILENAMES`
+    that exists, next to its ``uv.lock`` and ``pyproject.toml``.
+
+    Raises:
+        ValueError: If the directory has no config.
+    """
+    for name in CONFIG_FILENAMES:
+        config_path = directory / name
+        if config_path.is_file():
+            return Project(
+                config_path, directory / "uv.lock", directory / "pyproject.toml"
+            )
+    tried = " or ".join(f'"{name}"' for name in CONFIG_FILENAMES)
+    msg = f"{directory}: {tried} does not exist."
+    raise ValueError(msg)
+
+
+class ProjectFiles(NamedTuple):
+    """The content of the files of a project, see :func:`read_project_files`.
+
+    ``lock_index`` and ``pyproject`` are ``None`` when the project has no
+    lock index sidecar or no ``pyproject.toml``.
+    """
+
+    config: bytes
+    uv_lock: bytes
+    lock_index: bytes | None
+    pyproject: bytes | None
+
+    @property
+    def size(self) -> int:
+        """The total size of the files, in bytes."""
+        return sum(len(data) for data in self if data is not None)
+
+
+def read_project_files(project: Project) -> ProjectFiles:
+    """Read the files of *project* that :func:`patch_project` needs.
+
+    Raises:
+        OSError: If the config or ``uv.lock`` can't be read, or the
+            ``pyproject.toml`` exists but can't be read.
+    """
+    config = project.config_path.read_bytes()
+    uv_lock = project.uv_lock_path.read_bytes()
+    lock_index = None
+    # the sidecar is only a cache, so a failure to read it is not an error
+    with contextlib.suppress(OSError):
+        lock_index = lock_index_path(project.uv_lock_path).read_bytes()
+    pyproject = None
+    with contextlib.suppress(FileNotFoundError):
+        pyproject = project.pyproject_path.read_bytes()
+    return ProjectFiles(config, uv_lock, lock_index, pyproject)
+
+
+class ProjectResult(NamedTuple):
+    """The outcome of syncing one project of a fleet.
+
+    ``patch`` holds the lines of the project's patch, and is empty when the
+    project is already synced or failed. ``error`` is the message of a failure,
+    in which case ``changes`` is ``None``.
+    """
+
+    project: Project
+    patch: list[str]
+    changes: Changes | None
+    error: str | None = None
+
+
+def patch_project(
+    project: Project,
+    *,
+    root: Path,
+    stamp: bool = False,
+    n: int = 3,
+    files: ProjectFiles | None = None,
+) -> ProjectResult:
+    """Sync *project* in memory and return its patch.
+
+    Args:
+        project: The project to sync.
+        root: The directory the patch is applied from; the config's path in
+            the patch is relative to it.
+        stamp: Whether to write or update the sync stamp, as ``--stamp`` does.
+            A project whose stamp already matches is left as it is.
+        n: Number of context lines around each hunk.
+        files: The files of the project, if they were already read by
+            :func:`read_project_files`.
+
+    Raises:
+        ValueError: If the config is outside *root*, or a ``# sync-with-uv``
+            line is invalid.
+        OSError: If a file of the project can't be read.
+    """
+    path = project.config_path.resolve().relative_to(root.resolve()).as_posix()
+    config_format = config_format_for(project.config_path)
+    if files is None:
+        files = read_project_files(project)
+    user_repo_mappings: dict[str, str] = {}
+    user_version_mappings: dict[str, str] = {}
+    if files.pyproject is not None:
+        user_repo_mappings, user_version_mappings = parse_user_mappings(files.pyproject)
+    lines = files.config.decode().splitlines(keepends=True)
+    stamp_value = None
+    if stamp:
+        stamp_value = compute_stamp(
+            files.uv_lock, user_repo_mappings, user_version_mappings
+        )
+        if read_stamp(lines) == stamp_value:
+            return ProjectResult(project, [], Changes({}, {}))
+    edits, changes = sync_config_lines(
+        lines,
+        # the working tree is never written, not even a stale lock index
+        uv_data_from_bytes(files.uv_lock, files.lock_index),
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        user_version_mappings=user_version_mappings,
+        stamp=stamp_value,
+    )
+    return ProjectResult(
+        project, list(git_patch_from_edits(lines, edits, path, n=n)), changes
+    )
+
+
+def sync_fleet(  # noqa: PLR0913
+    projects: Iterable[Project],
+    *,
+    root: Path,
+    stamp: bool = False,
+    n: int = 3,
+    prefetch_projects: int = DEFAULT_PREFETCH_PROJECTS,
+    prefetch_bytes: int = DEFAULT_PREFETCH_BYTES,
+) -> Iterator[ProjectResult]:
+    """Yield the result of :func:`patch_project` for each project, in order.
+
+    A project that fails is yielded with its error, and the others go on.
+
+    The files of up to *prefetch_projects* projects are read ahead, by as many
+    threads, while a project is synced. No more are read once those read ahead
+    take *prefetch_bytes*, so that at most one project per thread is read past
+    that. With *prefetch_projects* 0, each project is read as it is synced.
+    """
+    if prefetch_projects <= 0:
+        for project in projects:
+            yield _try_patch_project(project, None, root=root, stamp=stamp, n=n)
+        return
+    for project, files in prefetch_project_files(
+        projects, max_projects=prefetch_projects, max_bytes=prefetch_bytes
+    ):
+        yield _try_patch_project(project, files, root=root, stamp=stamp, n=n)
+
+
+def prefetch_project_files(
+    projects: Iterable[Project],
+    *,
+    max_projects: int = DEFAULT_PREFETCH_PROJECTS,
+    max_bytes: int = DEFAULT_PREFETCH_BYTES,
+) -> Iterator[tuple[Project, concurrent.futures.Future[ProjectFiles]]]:
+    """Yield each project, in order, with the future of its files.
+
+    The files are read by :func:`read_project_files` on *max_projects* threads,
+    ahead of the project being yielded; the future of a project that can't be
+    read holds the error. While a project is yielded, up to *max_projects*
+    projects after it are read, while those already read take less than
+    *max_bytes*.
+    """
+    remaining = iter(projects)
+    ahead: collections.deque[
+        tuple[Project, concurrent.futures.Future[ProjectFiles]]
+    ] = collections.deque()
+    executor = concurrent.futures.ThreadPoolExecutor(max_projects)
+    try:
+        while True:
+            if not ahead:
+                project = next(remaining, None)
+                if project is None:
+                    return
+                ahead.append((project, executor.submit(read_project_files, project)))
+            current = ahead.popleft()
+            # the projects after it are read while the caller syncs it
+            while len(ahead) < max_projects and _bytes_read(ahead) < max_bytes:
+                project = next(remaining, None)
+                if project is None:
+                    break
+                ahead.append((project, executor.submit(read_project_files, project)))
+            yield current
+    finally:
+        # a sync that stops early doesn't wait for the projects it won't need
+        executor.shutdown(cancel_futures=True)
+
+
+def _bytes_read(
+    ahead: Iterable[tuple[Project, concurrent.futures.Future[ProjectFiles]]],
+) -> int:
+    """Return the size of the files of the projects read ahead so far."""
+    return sum(
+        files.result().size
+        for _project, files in ahead
+        if files.done() and files.exception() is None
+    )
+
+
+def _try_patch_project(
+    project: Project,
+    files: concurrent.futures.Future[ProjectFiles] | None,
+    *,
+    root: Path,
+    stamp: bool,
+    n: int,
+) -> ProjectResult:
+    """Return the result of :func:`patch_project`, or of its failure."""
+    try:
+        return patch_project(
+            project,
+            root=root,
+            stamp=stamp,
+            n=n,
+            files=files.result() if files is not None else None,
+        )
+    except Exception as e:  # noqa: BLE001
+        return ProjectResult(project, [], None, str(e))
+
+
+def write_fleet_patch(
+    results: Iterable[ProjectResult], write: Callable[[str], object]
+) -> Iterator[ProjectResult]:
+    """Write the patch of each result with *write*, yielding it once written.
+
+    The patches are concatenated into one patch that ``git apply`` takes as a
+    whole, from the root the results were made for.
+    """
+    for result in results:
+        for line in result.patch:
+            write(line)
+        yield result
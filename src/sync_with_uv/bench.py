@@ -0,0 +1,272 @@
+"""In-process benchmarks of the sync stages, for ``sync-with-uv bench``.
+
+Each case runs one stage (or the whole pipeline) against the project's real
+config and uv.lock. The config is only ever read: engines that produce the
+updated text discard it, and the disk cache lives in a temporary directory.
+Besides their run times, cases can be measured for the memory they allocate,
+with :mod:`tracemalloc`.
+"""
+
+import functools
+import time
+import tracemalloc
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from typing import Literal, NamedTuple, Protocol
+
+from .cache import DiskResultCache, MemoryResultCache, cached_process_config_text
+from .pipeline import sync_config_pipelined
+from .repo_data import load_user_mappings
+from .sharding import process_config_sharded
+from .sync_with_uv import (
+    config_needs_sync,
+    load_uv_lock,
+    process_config_bytes,
+    process_config_text,
+    sync_config_file,
+    sync_config_lines,
+)
+from .telemetry import percentile
+
+
+class BenchResult(NamedTuple):
+    """The run times of a benchmark case, in nanoseconds, sorted."""
+
+    name: str
+    times_ns: list[int]
+
+    @property
+    def min_ms(self) -> float:
+        """The fastest run, in milliseconds."""
+        return self.times_ns[0] / 1e6
+
+    @property
+    def median_ms(self) -> float:
+        """The median run, in milliseconds."""
+        return percentile(self.times_ns, 50) / 1e6
+
+    @property
+    def p95_ms(self) -> float:
+        """The 95th percentile run, in milliseconds."""
+        return percentile(self.times_ns, 95) / 1e6
+
+
+class MemoryResult(NamedTuple):
+    """The memory allocated by one run of a benchmark case.
+
+    ``peak_bytes`` is the peak traced memory during the run, above what was in
+    use before it. ``retained_bytes`` and ``retained_blocks`` are what was still
+    allocated when the run returned, which is mostly its result.
+    """
+
+    name: str
+    peak_bytes: int
+    retained_bytes: int
+    retained_blocks: int
+
+
+class _Engine(Protocol):
+    """The signature shared by the config processing engines."""
+
+    def __call__(
+        self,
+        config_text: str,
+        uv_data: dict[str, str],
+        *,
+        config_format: Literal["yaml", "toml"],
+        user_repo_mappings: dict[str, str] | None,
+        user_version_mappings: dict[str, str] | None,
+    ) -> object: ...
+
+
+@contextmanager
+def bench_cases(
+    config_path: Path,
+    config_format: Literal["yaml", "toml"],
+    uv_lock_path: Path,
+) -> Iterator[dict[str, Callable[[], object]]]:
+    """Yield the benchmark cases for a project, by name.
+
+    The ``load_*`` and ``read_config`` cases time the input stages. The
+    ``process[...]`` cases time each engine on inputs loaded once beforehand:
+    ``text`` (:func:`process_config_text`), ``bytes``
+    (:func:`process_config_bytes`, on the undecoded config), ``sharded``
+    (:func:`~sync_with_uv.sharding.process_config_sharded` on the undecoded
+    config, serial unless it is very large), ``edits``
+    (:func:`sync_config_lines`), ``check`` (:func:`config_needs_sync`),
+    ``stream`` (:func:`sync_config_file` with ``check``, which reads the config
+    file as it goes), and the text engine behind a warm memory or disk cache.
+    ``pipeline`` times all stages of a ``--check`` run that reports its changes:
+    loading the user mappings, then
+    :func:`~sync_with_uv.pipeline.sync_config_pipelined`, which loads uv.lock
+    while the config is read and scanned.
+    """
+    user_repo_mappings, user_version_mappings = load_user_mappings()
+    uv_data = load_uv_lock(uv_lock_path, update_index=False)
+    config_bytes = config_path.read_bytes()
+    config_text = config_bytes.decode(encoding="utf-8")
+    lines = config_text.splitlines(keepends=True)
+
+    def process(engine: _Engine) -> Callable[[], object]:
+        return lambda: engine(
+            config_text,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+        )
+
+    def pipeline() -> object:
+        repo_mappings, version_mappings = load_user_mappings()
+        return sync_config_pipelined(
+            config_path,
+            uv_lock_path,
+            config_format=config_format,
+            user_repo_mappings=repo_mappings,
+            user_version_mappings=version_mappings,
+            update_index=False,
+        )
+
+    memory_cache = MemoryResultCache()
+    with TemporaryDirectory(prefix="sync-with-uv-bench-") as cache_dir:
+        disk_cache = DiskResultCache(Path(cache_dir))
+        yield {
+            "load_user_mappings": load_user_mappings,
+            "load_uv_lock": lambda: load_uv_lock(uv_lock_path, update_index=False),
+            "read_config": lambda: config_path.read_bytes().decode(encoding="utf-8"),
+            "process[text]": process(process_config_text),
+            "process[bytes]": lambda: process_config_bytes(
+                config_bytes,
+                uv_data,
+                config_format=config_format,
+                user_repo_mappings=user_repo_mappings,
+                user_version_mappings=user_version_mappings,
+            ),
+            "process[sharded]": lambda: process_config_sharded(
+                config_bytes,
+                uv_data,
+                config_format=config_format,
+                user_repo_mappings=user_repo_mappings,
+                user_version_mappings=user_version_mappings,
+            ),
+            "process[edits]": lambda: sync_config_lines(
+                lines,
+                uv_data,
+                config_format=config_format,
+                user_repo_mappings=user_repo_mappings,
+                user_version_mappings=user_version_mappings,
+            ),
+            "process[check]": process(config_needs_sync),
+            "process[stream]": lambda: sync_config_file(
+                config_path,
+                uv_data,
+                config_format=config_format,
+                user_repo_mappings=user_repo_mappings,
+                user_version_mappings=user_version_mappings,
+                check=True,
+            ),
+            "process[memory-cache]": process(
+                functools.partial(cached_process_config_text, memory_cache)
+            ),
+            "process[disk-cache]": process(
+                functools.partial(cached_process_config_text, disk_cache)
+            ),
+            "pipeline": pipeline,
+        }
+
+
+def run_bench(cases: dict[str, Callable[[], object]], repeat: int) -> list[BenchResult]:
+    """Time each case *repeat* times, after one untimed warm-up run.
+
+    The warm-up run fills the caches, so cached cases are measured warm.
+    """
+    results = []
+    for name, case in cases.items():
+        case()
+        times_ns = []
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            case()
+            times_ns.append(time.perf_counter_ns() - start)
+        results.append(BenchResult(name, sorted(times_ns)))
+    return results
+
+
+def measure_memory(name: str, case: Callable[[], object]) -> MemoryResult:
+    """Trace the memory allocated by one run of *case*.
+
+    Memory tracing is started for the run, and stopped after it unless it was
+    already running. Call the case once beforehand, so that lazy imports and
+    caches are not counted.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        own_traces = [tracemalloc.Filter(inclusive=False, filename_pattern=__file__)]
+        before = tracemalloc.take_snapshot().filter_traces(own_traces)
+        tracemalloc.reset_peak()
+        memory_start = tracemalloc.get_traced_memory()[0]
+        result = case()
+        memory_end, memory_peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot().filter_traces(own_traces)
+        del result
+    finally:
+        if started:
+            tracemalloc.stop()
+    return MemoryResult(
+        name,
+        memory_peak - memory_start,
+        memory_end - memory_start,
+        sum(stat.count_diff for stat in after.compare_to(before, "filename")),
+    )
+
+
+def run_memory_bench(cases: dict[str, Callable[[], object]]) -> list[MemoryResult]:
+    """Measure the memory of each case, after one untimed warm-up run."""
+    results = []
+    for name, case in cases.items():
+        case()
+        results.append(measure_memory(name, case))
+    return results
+
+
+def format_results(results: Iterable[BenchResult]) -> str:
+    """Return a table of the min, median and p95 time of each case."""
+    rows = [("case", "runs", "min ms", "median ms", "p95 ms")]
+    rows.extend(
+        (
+            result.name,
+            str(len(result.times_ns)),
+            f"{result.min_ms:.3f}",
+            f"{result.median_ms:.3f}",
+            f"{result.p95_ms:.3f}",
+        )
+        for result in results
+    )
+    width = max(len(row[0]) for row in rows)
+    return "\n".join(
+        f"{name:<{width}} {runs:>5} {low:>10} {median:>10} {p95:>10}"
+        for name, runs, low, median, p95 in rows
+    )
+
+
+def format_memory_results(results: Iterable[MemoryResult]) -> str:
+    """Return a table of the peak and retained memory of each case."""
+    rows = [("case", "peak KiB", "retained KiB", "blocks")]
+    rows.extend(
+        (
+            result.name,
+            f"{result.peak_bytes / 1024:.1f}",
+            f"{result.retained_bytes / 1024:.1f}",
+            str(result.retained_blocks),
+        )
+        for result in results
+    )
+    width = max(len(row[0]) for row in rows)
+    return "\n".join(
+        f"{name:<{width}} {peak:>10} {retained:>12} {blocks:>8}"
+        for name, peak, retained, blocks in rows
+    )
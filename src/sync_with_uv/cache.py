@@ -0,0 +1,284 @@
+"""Content-addressed cache for :func:`process_config_text` results.
+
+Many repos share byte-identical configs and lock files, so the result of a sync
+is keyed by a hash of everything that can affect it: the config text, the
+uv.lock versions, the user mappings, the config format and the tool version.
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Literal, Protocol
+
+from . import __version__
+from .dependency_line import DepLineChange
+from .sync_with_uv import Changes, process_config_text
+
+# The on-disk cache defaults to a size that comfortably holds a few thousand
+# typical results.
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+
+class ResultCache(Protocol):
+    """A store of :func:`process_config_text` results, keyed by :func:`cache_key`."""
+
+    def get(self, key: str) -> tuple[str, Changes] | None:
+        """Return the stored result for *key*, or ``None`` on a miss."""
+
+    def put(self, key: str, result: tuple[str, Changes]) -> None:
+        """Store *result* under *key*."""
+
+
+def cache_key(  # noqa: PLR0913
+    config_text: str,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+) -> str:
+    """Return the cache key for a :func:`process_config_text` call.
+
+    The user mappings are hashed sorted: their lookups, most specific first,
+    don't depend on their order, so neither does the key.
+
+    Returns:
+        A hex SHA-256 digest of all inputs that can affect the result.
+    """
+    payload = json.dumps(
+        [
+            __version__,
+            config_format,
+            sorted(uv_data.items()),
+            sorted((user_repo_mappings or {}).items()),
+            sorted((user_version_mappings or {}).items()),
+            stamp,
+            config_text,
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def dump_result(result: tuple[str, Changes]) -> str:
+    """Serialize a :func:`process_config_text` result to JSON."""
+    text, changes = result
+    return json.dumps(
+        {
+            "text": text,
+            "repos": [
+                [name, list(change) if isinstance(change, tuple) else change]
+                for name, change in changes.repos.items()
+            ],
+            "lines": [
+                [line_number, *change] for line_number, change in changes.lines.items()
+            ],
+        },
+        ensure_ascii=False,
+    )
+
+
+def load_result(data: str) -> tuple[str, Changes]:
+    """Deserialize a result produced by :func:`dump_result`.
+
+    Raises:
+        ValueError: If *data* is not a serialized result.
+    """
+    try:
+        obj = json.loads(data)
+        repos: dict[str, bool | tuple[str, str]] = {
+            name: tuple(change) if isinstance(change, list) else bool(change)
+            for name, change in obj["repos"]
+        }
+        lines = {
+            int(line_number): DepLineChange(package, old_spec, new_spec)
+            for line_number, package, old_spec, new_spec in obj["lines"]
+        }
+        text = str(obj["text"])
+    except (KeyError, TypeError, ValueError) as e:
+        msg = "invalid cached result"
+        raise ValueError(msg) from e
+    return text, Changes(repos, lines)
+
+
+def _copy_result(result: tuple[str, Changes]) -> tuple[str, Changes]:
+    """Return *result* with fresh dicts, so callers cannot mutate a cached entry."""
+    text, changes = result
+    return text, Changes(dict(changes.repos), dict(changes.lines))
+
+
+class MemoryResultCache:
+    """An in-memory LRU cache of results, for batch and server use.
+
+    ``hits`` and ``misses`` count the outcomes of :meth:`get`.
+    """
+
+    def __init__(self, max_entries: int = 128) -> None:
+        """Create an empty cache holding at most *max_entries* results."""
+        self.max_entries = max_entries
+        self.hits = self.misses = 0
+        self._entries: OrderedDict[str, tuple[str, Changes]] = OrderedDict()
+
+    def get(self, key: str) -> tuple[str, Changes] | None:
+        """Return the stored result for *key*, or ``None`` on a miss."""
+        result = self._entries.get(key)
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return _copy_result(result)
+
+    def put(self, key: str, result: tuple[str, Changes]) -> None:
+        """Store *result* under *key*, evicting the least recently used entries."""
+        self._entries[key] = _copy_result(result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        """Return the number of stored results."""
+        return len(self._entries)
+
+
+class DiskResultCache:
+    """An on-disk cache of results, one JSON file per key.
+
+    The directory is kept under *max_bytes* by evicting the least recently used
+    entries (by modification time, which is refreshed on every hit). Its size is
+    scanned on the first write, then kept up to date by each write, so that the
+    directory is only scanned again to evict entries; the writes of other
+    processes are counted from then on.
+    ``hits`` and ``misses`` count the outcomes of :meth:`get`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        """Create a cache stored in *directory*, created on the first write."""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = self.misses = 0
+        self._size: int | None = None  # of the entries, once scanned
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> tuple[str, Changes] | None:
+        """Return the stored result for *key*, or ``None`` on a miss.
+
+        A corrupt or unreadable entry is treated as a miss.
+        """
+        path = self._path(key)
+        try:
+            result = load_result(path.read_text(encoding="utf-8"))
+            os.utime(path)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def put(self, key: str, result: tuple[str, Changes]) -> None:
+        """Store *result* under *key*, then evict entries beyond the size limit."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._path(key)
+        data = dump_result(result).encode("utf-8")
+        replaced_size = 0
+        with contextlib.suppress(OSError):
+            replaced_size = path.stat().st_size
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            Path(tmp_name).replace(path)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self._entries())
+        else:
+            self._size += len(data) - replaced_size
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        """Return the (modification time, size, path) of each stored entry."""
+        entries = []
+        for path in self.directory.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # removed concurrently
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _evict(self) -> None:
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+
+def cached_process_config_text(  # noqa: PLR0913
+    cache: ResultCache,
+    config_text: str,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+) -> tuple[str, Changes]:
+    """Like :func:`process_config_text`, but reuse a stored result when possible.
+
+    Inputs that raise (such as an invalid ``# sync-with-uv`` line) are not
+    cached, so the error is reported on every run. The cache is only there for
+    speed, so a cache that can't be read or written (such as a read-only cache
+    directory) is bypassed rather than failing the sync.
+
+    Args:
+        cache: Where results are looked up and stored.
+        config_text: Raw config file content.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+
+    Returns:
+        The same tuple of (updated_config_text, changes) as
+        :func:`process_config_text`.
+    """
+    key = cache_key(
+        config_text,
+        uv_data,
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        user_version_mappings=user_version_mappings,
+        stamp=stamp,
+    )
+    result = None
+    with contextlib.suppress(OSError):
+        result = cache.get(key)
+    if result is None:
+        result = process_config_text(
+            config_text,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+            stamp=stamp,
+        )
+        with contextlib.suppress(OSError):
+            cache.put(key, result)
+    return result
@@ -1,53 +1,90 @@
 """CLI for sync_with_uv."""
 
-import difflib
+import contextlib
+import io
 import sys
+import time
+from collections.abc import Iterable, Iterator
 from pathlib import Path
-from typing import Annotated, Literal
+from typing import Annotated, Literal, NamedTuple, TypedDict
 
 import cyclopts.types
 from colorama import Fore, Style
 from cyclopts import App, Parameter
 
+from . import IMPORT_START_CPU_NS, IMPORT_START_NS
+from .batch import (
+    DEFAULT_PREFETCH_BYTES,
+    DEFAULT_PREFETCH_PROJECTS,
+    Project,
+    find_project,
+    sync_fleet,
+    write_fleet_patch,
+)
+from .bench import (
+    bench_cases,
+    format_memory_results,
+    format_results,
+    run_bench,
+    run_memory_bench,
+)
+from .cache import DiskResultCache, cached_process_config_text
+from .diff import unified_diff_from_edits
+from .in_place import write_in_place
+from .pipeline import sync_config_pipelined
+from .profiling import Profiler, phase
 from .repo_data import load_user_mappings
-from .sync_with_uv import Changes, load_uv_lock, process_config_text
+from .sharding import process_config_sharded
+from .stamp import compute_stamp, read_config_stamp
+from .sync_with_uv import (
+    CONFIG_FILENAMES,
+    ByteEdit,
+    Changes,
+    apply_line_edits,
+    config_format_for,
+    config_needs_sync,
+    load_uv_lock,
+    sync_config_file,
+    sync_config_lines,
+    sync_config_stream,
+    write_lock_index,
+)
+from .telemetry import RunInfo, append_record, make_record, read_records, summarize
 
 app = App(name="sync-with-uv")
 app.register_install_completion_command()
 
 
-def get_colored_diff(diff_lines: list[str]) -> list[str]:
+def get_colored_diff(diff_lines: Iterable[str]) -> Iterator[str]:
     """Apply ANSI color codes to diff lines.
 
     Args:
-        diff_lines: List of unified diff lines.
+        diff_lines: Unified diff lines.
 
-    Returns:
-        List of diff lines with ANSI color codes applied.
+    Yields:
+        Diff lines with ANSI color codes applied, as they are consumed.
     """
-    output_lines = []
     for line in diff_lines:
         if line.startswith(("+++", "---")):
-            output_lines.append(Style.BRIGHT + line + Fore.RESET)
+            yield Style.BRIGHT + line + Fore.RESET
         elif line.startswith("+"):
-            output_lines.append(Fore.GREEN + line + Fore.RESET)
+            yield Fore.GREEN + line + Fore.RESET
         elif line.startswith("-"):
-            output_lines.append(Fore.RED + line + Fore.RESET)
+            yield Fore.RED + line + Fore.RESET
         elif line.startswith("@@"):
-            output_lines.append(Fore.CYAN + line + Fore.RESET)
+            yield Fore.CYAN + line + Fore.RESET
         else:
-            output_lines.append(line)
-    return output_lines
+            yield line
 
 
-# Config filenames tried in order when no explicit path is given.
-_DEFAULT_CONFIGS = (".pre-commit-config.yaml", "prek.toml")
+# The config path that stands for stdin and stdout.
+_STDIN = Path("-")
 
 
 def _resolve_config(explicit: Path | None) -> Path:
     """Return the config file path to use.
 
-    When *explicit* is ``None``, try each name in :data:`_DEFAULT_CONFIGS`
+    When *explicit* is ``None``, try each name in :data:`CONFIG_FILENAMES`
     in order, returning the first that exists.
 
     Raises:
@@ -59,29 +96,22 @@ def _resolve_config(explicit: Path | None) -> Path:
             msg = f'"{explicit}" does not exist.'
             raise ValueError(msg)
         return resolved
-    for name in _DEFAULT_CONFIGS:
+    for name in CONFIG_FILENAMES:
         candidate = Path(name)
         if candidate.is_file():
             return candidate.resolve()
-    tried = " or ".join(f'"{n}"' for n in _DEFAULT_CONFIGS)
+    tried = " or ".join(f'"{n}"' for n in CONFIG_FILENAMES)
     msg = f"{tried} does not exist."
     raise ValueError(msg)
 
 
-def _resolve_config_format(filename: Path) -> Literal["yaml", "toml"]:
-    if filename.suffix in (".yaml", ".yml"):
-        return "yaml"
-    if filename.suffix == ".toml":
-        return "toml"
-    msg = "precommit_filename must be a YAML or a TOML"
-    raise ValueError(msg)
-
-
 @app.default()
 def process_precommit(  # noqa: PLR0913
     *,
     precommit_filename: Annotated[
-        Path | None, Parameter(["-p", "--pre-commit-config"])
+        Path | None,
+        # "-" (stdin) is a value, not an option
+        Parameter(["-p", "--pre-commit-config"], allow_leading_hyphen=True),
     ] = None,
     uv_lock_filename: Annotated[
         cyclopts.types.ResolvedExistingFile, Parameter(["-u", "--uv-lock"])
@@ -89,8 +119,26 @@ def process_precommit(  # noqa: PLR0913
     check: Annotated[bool, Parameter(negative="")] = False,
     diff: Annotated[bool, Parameter(negative="")] = False,
     color: bool = False,
+    diff_context: int = 3,
     quiet: Annotated[bool, Parameter(alias="-q")] = False,
     verbose: Annotated[bool, Parameter(alias="-v")] = False,
+    cache_dir: Annotated[
+        Path | None, Parameter(env_var="SYNC_WITH_UV_CACHE_DIR")
+    ] = None,
+    stamp: Annotated[bool, Parameter(negative="")] = False,
+    stream: Annotated[bool, Parameter(negative="")] = False,
+    in_place: Annotated[bool, Parameter(negative="")] = False,
+    jobs: Annotated[int | None, Parameter(alias="-j")] = None,
+    pipeline: Annotated[bool, Parameter(negative="")] = False,
+    config_format: Literal["yaml", "toml"] | None = None,
+    profile: Annotated[
+        bool, Parameter(negative="", env_var="SYNC_WITH_UV_PROFILE")
+    ] = False,
+    profile_memory: Annotated[bool, Parameter(negative="")] = False,
+    profile_stats: Path | None = None,
+    telemetry_log: Annotated[
+        Path | None, Parameter(env_var="SYNC_WITH_UV_TELEMETRY_LOG")
+    ] = None,
 ) -> int:
     """Sync pre-commit hook versions with uv.lock.
 
@@ -106,6 +154,8 @@ def process_precommit(  # noqa: PLR0913
     precommit_filename:
         Path to .pre-commit-config.yaml or prek.toml file to update.
         Auto-detected if not specified.
+        Use "-" to read the config from stdin and write it to stdout,
+        streaming it as with --stream.
     uv_lock_filename
         Path to uv.lock file containing package versions
     check
@@ -118,49 +168,611 @@ def process_precommit(  # noqa: PLR0913
         just output a diff to indicate what changes would be made.
     color
         Enable colored diff output. Only applies when --diff is given.
+    diff_context
+        Number of context lines around each diff hunk.
+        Only applies when --diff is given.
     quiet
         Stop emitting all non-critical output.
         Error messages will still be emitted.
     verbose
         Show detailed information about all packages,
         including those that were not changed.
+    cache_dir
+        Directory for a cache of sync results, keyed by the content of the
+        config, uv.lock and mappings. A repeated run with the same inputs
+        reuses the stored result. Can also be set with SYNC_WITH_UV_CACHE_DIR.
+        Not used with --diff, which needs the individual edits.
+    stamp
+        Keep a "# sync-with-uv: lock=<hash>" comment at the top of the config,
+        recording the uv.lock and mappings it was synced against.
+        When the stamp already matches, exit immediately without scanning
+        the config. Manual edits to the config are not detected by the stamp.
+    stream
+        Stream the config through the sync line by line, writing it to a
+        temporary file that then replaces the config, so that memory use does
+        not depend on the size of the config. Can't be used with --diff or
+        --cache-dir.
+    in_place
+        When every change keeps the length of the text it replaces, as most
+        version bumps do, write only the changed lines into the config, then
+        check the size and hash of the file. Otherwise, or if a check fails,
+        the config is atomically replaced by a temporary file.
+        Can't be used with --stream.
+    jobs
+        Number of workers to sync a very large config with, split into shards
+        at repo headers. By default, the config is synced serially. A shard
+        has at least 20000 lines, so a config of fewer than 40000 lines is
+        always synced serially.
+    pipeline
+        Parse uv.lock on a background thread while the config is read and
+        scanned. Ignored with --stream, --diff, --cache-dir and --check -q,
+        which load uv.lock first.
+    config_format
+        Format of the config, "yaml" or "toml".
+        By default, it is detected from the file suffix, or "yaml" for stdin.
+    profile
+        Print the wall and CPU time of each phase of the run to stderr.
+        Can also be set with SYNC_WITH_UV_PROFILE=1.
+    profile_memory
+        With --profile, also trace the peak memory of each phase.
+    profile_stats
+        With --profile, also write cProfile stats of all phases to this file,
+        for use with pstats or snakeviz.
+    telemetry_log
+        Append a JSON Lines record of this run to this file: the time of each
+        phase, the size of uv.lock and of the config, the number of packages
+        and the cache outcome. Summarize logs with "sync-with-uv stats".
+        Can also be set with SYNC_WITH_UV_TELEMETRY_LOG.
     """
+    config_path: Path | None = None
     try:
-        config_path = _resolve_config(precommit_filename)
-        config_format = _resolve_config_format(config_path)
+        if precommit_filename != _STDIN:
+            config_path = _resolve_config(precommit_filename)
+        config_format = config_format or (
+            "yaml" if config_path is None else config_format_for(config_path)
+        )
     except ValueError as e:
         print("Error:", e, file=sys.stderr)
         return 1
+    options = _Options(
+        check=check,
+        diff=diff,
+        color=color,
+        diff_context=diff_context,
+        quiet=quiet,
+        verbose=verbose,
+        cache_dir=cache_dir,
+        stamp=stamp,
+        stream=stream or config_path is None,
+        in_place=in_place,
+        jobs=jobs,
+        pipeline=pipeline,
+    )
+    if options.stream and (diff or cache_dir is not None or in_place):
+        print(
+            "Error: streaming can't be used with --diff, --cache-dir or --in-place.",
+            file=sys.stderr,
+        )
+        return 1
+    report = profile or profile_memory or profile_stats is not None
+    profiler = None
+    if report or telemetry_log is not None:
+        profiler = Profiler(trace_memory=profile_memory, stats_path=profile_stats)
+        profiler.add(
+            "startup",
+            time.perf_counter_ns() - IMPORT_START_NS,
+            time.process_time_ns() - IMPORT_START_CPU_NS,
+        )
+    info = RunInfo()
+    exit_code = 123
     try:
+        exit_code = _sync(
+            config_path,
+            config_format,
+            uv_lock_filename,
+            options,
+            profiler=profiler,
+            info=info,
+        )
+    except Exception as e:  # noqa: BLE001
+        print("Error:", e, file=sys.stderr)
+    finally:
+        if profiler is not None:
+            profiler.finish()
+            if report:
+                print(profiler.report(), file=sys.stderr)
+            if telemetry_log is not None:
+                # telemetry must never fail the run
+                with contextlib.suppress(OSError):
+                    append_record(
+                        telemetry_log, make_record(profiler.phases, info, exit_code)
+                    )
+    return exit_code
+
+
+class _Options(NamedTuple):
+    """Options of a sync run that don't select its input files."""
+
+    check: bool
+    diff: bool
+    color: bool
+    diff_context: int
+    quiet: bool
+    verbose: bool
+    cache_dir: Path | None
+    stamp: bool
+    stream: bool
+    in_place: bool
+    jobs: int | None
+    pipeline: bool
+
+
+class _ProcessKwargs(TypedDict):
+    """Keyword arguments shared by the config processing functions."""
+
+    config_format: Literal["yaml", "toml"]
+    user_repo_mappings: dict[str, str] | None
+    user_version_mappings: dict[str, str] | None
+    stamp: str | None
+
+
+def _sync(  # noqa: PLR0913
+    config_path: Path | None,
+    config_format: Literal["yaml", "toml"],
+    uv_lock_filename: Path,
+    options: _Options,
+    *,
+    profiler: Profiler | None,
+    info: RunInfo,
+) -> int:
+    with phase(profiler, "load_user_mappings"):
         user_repo_mappings, user_version_mappings = load_user_mappings()
-        uv_data = load_uv_lock(uv_lock_filename)
-        # note that the next line can be simplified in Python>=3.13 using
-        # read_text with newline=""
-        config_text = config_path.read_bytes().decode(encoding="utf-8")
-        fixed_text, changes = process_config_text(
-            config_text,
-            uv_data,
-            config_format=config_format,
-            user_repo_mappings=user_repo_mappings,
-            user_version_mappings=user_version_mappings,
+    stamp_value = None
+    if options.stamp:
+        with phase(profiler, "stamp"):
+            stamp_value = compute_stamp(
+                uv_lock_filename.read_bytes(), user_repo_mappings, user_version_mappings
+            )
+            # stdin is streamed to stdout even when its stamp matches
+            stamp_matches = (
+                config_path is not None
+                and read_config_stamp(config_path) == stamp_value
+            )
+        if stamp_matches:
+            info.cache = "stamp"
+            if options.verbose or not options.quiet:
+                print("All done! Stamp matches uv.lock.", file=sys.stderr)
+            return 0
+    process_kwargs = _ProcessKwargs(
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        user_version_mappings=user_version_mappings,
+        stamp=stamp_value,
+    )
+    info.lock_bytes = uv_lock_filename.stat().st_size
+    check_quiet = (
+        options.check and options.quiet and not (options.diff or options.verbose)
+    )
+    if options.pipeline and not (
+        options.stream or options.diff or options.cache_dir is not None or check_quiet
+    ):
+        assert config_path is not None  # noqa: S101 (stdin is always streamed)
+        return _sync_pipelined(
+            config_path,
+            uv_lock_filename,
+            process_kwargs,
+            options,
+            profiler=profiler,
+            info=info,
+        )
+    with phase(profiler, "load_uv_lock"):
+        uv_data = load_uv_lock(uv_lock_filename, update_index=_updates_files(options))
+    info.packages = len(uv_data)
+    if options.stream:
+        return _sync_stream(
+            config_path, uv_data, process_kwargs, options, profiler=profiler, info=info
+        )
+    assert config_path is not None  # noqa: S101 (stdin is always streamed)
+    with phase(profiler, "read_config"):
+        config_bytes = config_path.read_bytes()
+    info.config_bytes = len(config_bytes)
+    if options.cache_dir is not None:
+        info.cache = "bypassed"  # until the cache is consulted below
+    if check_quiet:
+        # nothing is reported, so only find out whether anything would change
+        with phase(profiler, "config_needs_sync"):
+            # as in process_config_bytes, bytes that aren't UTF-8 are kept apart
+            config_text = config_bytes.decode("utf-8", "surrogateescape")
+            return int(config_needs_sync(config_text, uv_data, **process_kwargs))
+    diff_lines = None
+    byte_edits: list[ByteEdit] | None = None
+    if options.diff:
+        # the diff is rendered from the engine's edits, so bypass the cache
+        with phase(profiler, "process_config_text"):
+            lines = config_bytes.decode(encoding="utf-8").splitlines(keepends=True)
+            edits, changes = sync_config_lines(lines, uv_data, **process_kwargs)
+            fixed_bytes = apply_line_edits(lines, edits).encode(encoding="utf-8")
+        diff_lines = unified_diff_from_edits(
+            lines, edits, str(config_path), str(config_path), n=options.diff_context
         )
-        # report the results / change files
-        if verbose:
+    elif options.cache_dir is not None:
+        cache = DiskResultCache(options.cache_dir)
+        with phase(profiler, "process_config_text"):
+            fixed_text, changes = cached_process_config_text(
+                cache,
+                config_bytes.decode(encoding="utf-8"),
+                uv_data,
+                **process_kwargs,
+            )
+            fixed_bytes = fixed_text.encode(encoding="utf-8")
+        info.cache = "hit" if cache.hits else "miss"
+    else:
+        # the config is synced without decoding or re-encoding it as a whole
+        byte_edits = [] if options.in_place else None
+        with phase(profiler, "process_config_text"):
+            fixed_bytes, changes = process_config_sharded(
+                config_bytes,
+                uv_data,
+                byte_edits=byte_edits,
+                max_workers=options.jobs or 1,
+                **process_kwargs,
+            )
+    return _report_and_write(
+        config_path,
+        config_bytes,
+        fixed_bytes,
+        changes,
+        diff_lines=diff_lines,
+        byte_edits=byte_edits,
+        options=options,
+        profiler=profiler,
+    )
+
+
+def _updates_files(options: _Options) -> bool:
+    """Whether the run may write files, such as a stale lock index.
+
+    --check and --diff only read.
+    """
+    return not (options.check or options.diff)
+
+
+def _sync_pipelined(  # noqa: PLR0913
+    config_path: Path,
+    uv_lock_filename: Path,
+    process_kwargs: _ProcessKwargs,
+    options: _Options,
+    *,
+    profiler: Profiler | None,
+    info: RunInfo,
+) -> int:
+    """Sync the config with :func:`sync_config_pipelined`, loading uv.lock meanwhile.
+
+    The config is synced without decoding or re-encoding it as a whole.
+    """
+    byte_edits: list[ByteEdit] | None = [] if options.in_place else None
+    synced = sync_config_pipelined(
+        config_path,
+        uv_lock_filename,
+        byte_edits=byte_edits,
+        max_workers=options.jobs or 1,
+        profiler=profiler,
+        update_index=_updates_files(options),
+        **process_kwargs,
+    )
+    info.packages = len(synced.uv_data)
+    info.config_bytes = len(synced.config_bytes)
+    return _report_and_write(
+        config_path,
+        synced.config_bytes,
+        synced.fixed_bytes,
+        synced.changes,
+        diff_lines=None,
+        byte_edits=byte_edits,
+        options=options,
+        profiler=profiler,
+    )
+
+
+def _sync_stream(  # noqa: PLR0913
+    config_path: Path | None,
+    uv_data: dict[str, str],
+    process_kwargs: _ProcessKwargs,
+    options: _Options,
+    *,
+    profiler: Profiler | None,
+    info: RunInfo,
+) -> int:
+    """Sync the config with :func:`sync_config_file`, or stdin to stdout."""
+    # only the summary needs the changes, which grow with the config
+    changes = Changes({}, {}) if options.verbose or not options.quiet else None
+    with phase(profiler, "process_config_text"):
+        if config_path is None:
+            changed = _sync_stdin(uv_data, process_kwargs, options, changes)
+        else:
+            info.config_bytes = config_path.stat().st_size
+            changed = sync_config_file(
+                config_path,
+                uv_data,
+                check=options.check,
+                changes=changes,
+                **process_kwargs,
+            )
+    if changes is not None:
+        if options.verbose:
             _print_changes(changes)
-        # output a diff to to stdout
-        if diff:
-            _print_diff(config_text, fixed_text, config_path, color=color)
-        # update the file
-        if not diff and not check:
-            config_path.write_text(fixed_text, encoding="utf-8", newline="")
-        # print summary
-        if verbose or not quiet:
-            _print_summary(changes, dry_mode=diff or check)
-        # return 1 if check and changed
-        return int(check and fixed_text != config_text)
+        _print_summary(changes, dry_mode=options.check)
+    return int(options.check and changed)
+
+
+def _sync_stdin(
+    uv_data: dict[str, str],
+    process_kwargs: _ProcessKwargs,
+    options: _Options,
+    changes: Changes | None,
+) -> bool:
+    """Stream the config from stdin to stdout, keeping its line endings.
+
+    With --check, nothing is written to stdout.
+    """
+    source = io.TextIOWrapper(sys.stdin.buffer, encoding="utf-8", newline="")
+    target = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+    try:
+        return sync_config_stream(
+            source,
+            None if options.check else target.write,
+            uv_data,
+            changes=changes,
+            **process_kwargs,
+        )
+    finally:
+        target.flush()
+        # leave the standard streams open
+        source.detach()
+        target.detach()
+
+
+def _report_and_write(  # noqa: PLR0913
+    config_path: Path,
+    config_bytes: bytes,
+    fixed_bytes: bytes,
+    changes: Changes,
+    *,
+    diff_lines: Iterable[str] | None,
+    byte_edits: list[ByteEdit] | None,
+    options: _Options,
+    profiler: Profiler | None,
+) -> int:
+    # report the results / change files
+    if options.verbose:
+        _print_changes(changes)
+    # output a diff to to stdout
+    if diff_lines is not None:
+        with phase(profiler, "diff"):
+            _print_diff(diff_lines, color=options.color)
+    # update the file
+    elif not options.check:
+        with phase(profiler, "write"):
+            if options.in_place:
+                write_in_place(config_path, config_bytes, fixed_bytes, byte_edits)
+            else:
+                config_path.write_bytes(fixed_bytes)
+    # print summary
+    if options.verbose or not options.quiet:
+        _print_summary(changes, dry_mode=diff_lines is not None or options.check)
+    # return 1 if check and changed
+    return int(options.check and fixed_bytes != config_bytes)
+
+
+@app.command(name="index")
+def write_index(
+    *,
+    uv_lock_filename: Annotated[
+        cyclopts.types.ResolvedExistingFile, Parameter(["-u", "--uv-lock"])
+    ] = Path("uv.lock"),
+    quiet: Annotated[bool, Parameter(alias="-q")] = False,
+) -> int:
+    """Write a lock index sidecar next to uv.lock.
+
+    The sidecar (.sync-with-uv.lockindex) holds the package versions and the
+    hash of uv.lock. When it is present, later runs read the versions from it
+    instead of parsing uv.lock, and rebuild it whenever uv.lock changes.
+    Commit it to make fresh clones fast.
+
+    Parameters
+    ----------
+    uv_lock_filename
+        Path to uv.lock file containing package versions
+    quiet
+        Stop emitting all non-critical output.
+        Error messages will still be emitted.
+    """
+    try:
+        index_path = write_lock_index(uv_lock_filename)
     except Exception as e:  # noqa: BLE001
         print("Error:", e, file=sys.stderr)
         return 123
+    if not quiet:
+        print(f"Wrote {index_path}", file=sys.stderr)
+    return 0
+
+
+@app.command(name="patch")
+def fleet_patch(  # noqa: PLR0913
+    *projects: cyclopts.types.ExistingDirectory,
+    output: Annotated[Path | None, Parameter(["-o", "--output"])] = None,
+    stamp: Annotated[bool, Parameter(negative="")] = False,
+    diff_context: int = 3,
+    prefetch_projects: int = DEFAULT_PREFETCH_PROJECTS,
+    prefetch_bytes: int = DEFAULT_PREFETCH_BYTES,
+    quiet: Annotated[bool, Parameter(alias="-q")] = False,
+) -> int:
+    """Write one patch that syncs the configs of many projects.
+
+    Each project is synced in memory, and its changes are appended to a single
+    unified diff as soon as it is done. The projects are never written to;
+    apply the patch from the current directory with "git apply". A project
+    that fails is reported, and the others are still synced.
+
+    Parameters
+    ----------
+    projects
+        Project directories, each with a .pre-commit-config.yaml or prek.toml,
+        a uv.lock and optionally a pyproject.toml with mappings.
+        Defaults to the current directory.
+    output
+        Write the patch to this file instead of stdout.
+    stamp
+        Also write or update the sync stamp of each config, as with --stamp.
+    diff_context
+        Number of context lines around each diff hunk.
+    prefetch_projects
+        Number of projects whose files are read ahead, on as many threads,
+        while a project is synced. Use 0 to read each project when it is
+        synced.
+    prefetch_bytes
+        Stop reading ahead while the files already read ahead take this many
+        bytes, to bound memory use.
+    quiet
+        Stop emitting all non-critical output.
+        Error messages will still be emitted.
+    """
+    n_changed = n_failed = 0
+    with contextlib.ExitStack() as stack:
+        if output is None:
+            target = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8", newline="")
+            # flush, and leave stdout open
+            stack.callback(target.detach)
+            stack.callback(target.flush)
+        else:
+            target = stack.enter_context(output.open("w", encoding="utf-8", newline=""))
+        results = sync_fleet(
+            map(_find_fleet_project, projects or (Path(),)),
+            root=Path.cwd(),
+            stamp=stamp,
+            n=diff_context,
+            prefetch_projects=prefetch_projects,
+            prefetch_bytes=prefetch_bytes,
+        )
+        for result in write_fleet_patch(results, target.write):
+            target.flush()
+            if result.error is not None:
+                n_failed += 1
+                print("Error:", result.error, file=sys.stderr)
+            elif result.patch:
+                n_changed += 1
+    if not quiet:
+        n_projects = len(projects) or 1
+        print(
+            f"All done! {n_changed} of {n_projects} "
+            f"{_plural(n_projects, 'project', 'projects')} would be changed.",
+            file=sys.stderr,
+        )
+    return 123 if n_failed else 0
+
+
+def _find_fleet_project(directory: Path) -> Project:
+    """Return the project in *directory*, with no files if it has no config."""
+    try:
+        return find_project(directory)
+    except ValueError:
+        # patch_project then fails on the missing config, as for any project
+        return Project(
+            directory / CONFIG_FILENAMES[0],
+            directory / "uv.lock",
+            directory / "pyproject.toml",
+        )
+
+
+@app.command(name="bench")
+def bench(
+    *,
+    precommit_filename: Annotated[
+        Path | None, Parameter(["-p", "--pre-commit-config"])
+    ] = None,
+    uv_lock_filename: Annotated[
+        cyclopts.types.ResolvedExistingFile, Parameter(["-u", "--uv-lock"])
+    ] = Path("uv.lock"),
+    repeat: Annotated[int, Parameter(alias="-n")] = 20,
+    case: Annotated[list[str] | None, Parameter(negative="")] = None,
+    memory: Annotated[bool, Parameter(negative="")] = False,
+) -> int:
+    """Benchmark the sync stages on this project's config and uv.lock.
+
+    Each stage, each engine (text, edits, check) and each cache mode (memory,
+    disk) is run in-process, after one untimed warm-up run, and the min, median
+    and 95th percentile times are printed side by side. The config is never
+    written.
+
+    Parameters
+    ----------
+    precommit_filename:
+        Path to .pre-commit-config.yaml or prek.toml file to benchmark.
+        Auto-detected if not specified.
+    uv_lock_filename
+        Path to uv.lock file containing package versions
+    repeat
+        Number of timed runs of each case.
+    case
+        Only run these cases (can be repeated), e.g. "process[text]".
+    memory
+        Also trace one more run of each case with tracemalloc, and print its
+        peak memory and the memory it retained.
+    """
+    if repeat < 1:
+        print("Error: --repeat must be at least 1.", file=sys.stderr)
+        return 1
+    try:
+        config_path = _resolve_config(precommit_filename)
+        config_format = config_format_for(config_path)
+    except ValueError as e:
+        print("Error:", e, file=sys.stderr)
+        return 1
+    try:
+        with bench_cases(config_path, config_format, uv_lock_filename) as cases:
+            if unknown := set(case or ()) - cases.keys():
+                print(
+                    f"Error: unknown case {', '.join(sorted(unknown))}; "
+                    f"choose from {', '.join(cases)}",
+                    file=sys.stderr,
+                )
+                return 1
+            selected = {name: cases[name] for name in case} if case else cases
+            results = run_bench(selected, repeat)
+            memory_results = run_memory_bench(selected) if memory else None
+    except Exception as e:  # noqa: BLE001
+        print("Error:", e, file=sys.stderr)
+        return 123
+    print(format_results(results))
+    if memory_results is not None:
+        print()
+        print(format_memory_results(memory_results))
+    return 0
+
+
+@app.command(name="stats")
+def telemetry_stats(*logs: cyclopts.types.ExistingFile) -> int:
+    """Summarize telemetry logs written with --telemetry-log.
+
+    Prints the 50th, 90th, 95th and 99th percentiles and the maximum of the
+    wall time of each phase across all recorded runs, and counts the cache
+    outcomes. Invalid lines are skipped.
+
+    Parameters
+    ----------
+    logs
+        Telemetry log files, for instance collected from many machines.
+    """
+    if not logs:
+        print("Error: no telemetry log given.", file=sys.stderr)
+        return 1
+    try:
+        summary = summarize(read_records(logs))
+    except Exception as e:  # noqa: BLE001
+        print("Error:", e, file=sys.stderr)
+        return 123
+    print(summary)
+    return 0
 
 
 def _print_changes(changes: Changes) -> None:
@@ -183,20 +795,14 @@ def _print_changes(changes: Changes) -> None:
     print(file=sys.stderr)
 
 
-def _print_diff(
-    precommit_text: str, fixed_text: str, precommit_filename: Path, *, color: bool
-) -> None:
-    diff_lines = list(
-        difflib.unified_diff(
-            precommit_text.splitlines(keepends=True),
-            fixed_text.splitlines(keepends=True),
-            fromfile=str(precommit_filename),
-            tofile=str(precommit_filename),
-        )
-    )
+def _print_diff(diff_lines: Iterable[str], *, color: bool) -> None:
+    """Stream *diff_lines* to stdout, one line at a time."""
+    # a last line without a line ending still ends its own output line
+    diff_lines = (line if line.endswith("\n") else line + "\n" for line in diff_lines)
     if color:
         diff_lines = get_colored_diff(diff_lines)
-    print("\n".join(diff_lines))
+    for line in diff_lines:
+        sys.stdout.write(line)
 
 
 def _plural(count: int, singular: str, plural: str) -> str:
@@ -1,12 +1,20 @@
 """Sync a single ``# sync-with-uv`` dependency line with uv.lock."""
 
+import functools
 import re
+from collections.abc import Iterable, Iterator
 from typing import NamedTuple
 
+from sync_with_uv.stats import SyncStats
+
 # A dependency line is only synced when it carries this pragma comment,
 # e.g. ``- pydantic==2.0.0  # sync-with-uv``. The pragma is an explicit,
 # per-line opt-in, so the sync is safe regardless of where the line lives.
-_DEP_PRAGMA_RE = re.compile(r"#\s*sync-with-uv(?![\w-])")
+# A comment may follow it after a colon, but the sync stamp comment,
+# ``# sync-with-uv: lock=<hash>`` (see sync_with_uv.stamp), is no pragma.
+_DEP_PRAGMA_RE = re.compile(r"#\s*sync-with-uv(?![\w-]|:\s*lock=)")
+# Text every pragma contains; lines without it are rejected before any regex.
+PRAGMA_TEXT = "sync-with-uv"
 # A PEP 440 version specifier: one or more comma-separated ``<operator><version>``
 # clauses, e.g. ``==2.0.0`` or ``>=1.0,<2.0``.
 _DEP_OP = r"(?:===|==|~=|!=|<=|>=|<|>)"
@@ -48,6 +56,29 @@ _DEP_BARE_RE = re.compile(
 # second quoted string -- means the line carries more than one dependency, of
 # which only the first would be synced.
 _DEP_TAIL_RE = re.compile(r"""[\s'",]*(?:;.*)?""")
+# Pragma lines come from configs we don't control, so the matchers above must
+# not backtrack catastrophically. They match in time linear in the line length
+# because no line can be split between their tokens in more than one way:
+# every repeated token is followed by a token that cannot start with a
+# character it consumes (a name stops at ``[``, whitespace or an operator, a
+# version at whitespace or ``,``, and the clauses of a specifier are separated
+# by a required ``,``). The dependency matchers are anchored, so they are tried
+# at one position only, and only on the text before the pragma.
+
+
+# The line breaks of str.splitlines besides "\n". A text buffer containing none
+# of them can be scanned for pragmas without splitting it into lines.
+_OTHER_LINE_BREAKS = (
+    "\r",
+    "\v",
+    "\f",
+    "\x1c",
+    "\x1d",
+    "\x1e",
+    "\x85",
+    "\u2028",
+    "\u2029",
+)
 
 
 class DepLineChange(NamedTuple):
@@ -67,13 +98,62 @@ class DepLineChange(NamedTuple):
         return self.old_spec != self.new_spec
 
 
+class DepLineEdit(NamedTuple):
+    """A ``# sync-with-uv`` line processed by :func:`sync_dependency_lines`.
+
+    ``line_number`` is 1-based. ``new_line`` equals ``old_line`` when the
+    dependency was already pinned to the locked version.
+    """
+
+    line_number: int
+    old_line: str
+    new_line: str
+    change: DepLineChange
+
+
+class DepLineError(NamedTuple):
+    """An invalid ``# sync-with-uv`` line found by :func:`sync_dependency_lines`."""
+
+    line_number: int
+    message: str
+
+
+_NAME_SEPARATORS_RE = re.compile(r"[-_.]+")
+
+
+@functools.lru_cache(maxsize=4096)
 def _normalize_package_name(name: str) -> str:
-    """Normalize a package name to its PEP 503 form (as used in uv.lock)."""
-    return re.sub(r"[-_.]+", "-", name).lower()
+    """Normalize a package name to its PEP 503 form (as used in uv.lock).
+
+    Configs pin the same few packages over and over, so the results are cached.
+    """
+    return _NAME_SEPARATORS_RE.sub("-", name).lower()
+
+
+def _locate_dependency(
+    line: str, end: int, stats: SyncStats | None
+) -> tuple[str, int, int] | None:
+    """Locate the dependency in ``line[:end]``, as its name and specifier span.
+
+    A specifier is replaced in place; a bare dependency has a pin inserted after
+    its name, so its specifier span is the empty slice at the name's end.
+    Returns ``None`` when there is no dependency.
+    """
+    if stats is not None:
+        stats.regex_attempts["dep_line"] += 1
+    spec_match = _DEP_LINE_RE.match(line, 0, end)
+    if spec_match is not None:
+        return spec_match.group("name"), *spec_match.span("spec")
+    if stats is not None:
+        stats.regex_attempts["dep_bare"] += 1
+    bare_match = _DEP_BARE_RE.match(line, 0, end)
+    if bare_match is None:
+        return None
+    return bare_match.group("name"), bare_match.end(), bare_match.end()
 
 
 def sync_dependency_line(
-    line: str, uv_data: dict[str, str]
+    line: str, uv_data: dict[str, str], stats: SyncStats | None = None
 ) -> tuple[str, DepLineChange] | str | None:
     """Sync a dependency on a ``# sync-with-uv`` line.
 
@@ -90,6 +170,8 @@ def sync_dependency_line(
     Args:
         line: A single config line (with its line ending, if any).
         uv_data: Package name to version mapping from uv.lock.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count the
+            regex attempts and pragma lines in.
 
     Returns:
         ``None`` if the line does not carry the pragma. A tuple of (updated line,
@@ -98,24 +180,22 @@ def sync_dependency_line(
         not in uv.lock, it has no dependency to sync, or it has more than one);
         the caller collects these and raises.
     """
+    if PRAGMA_TEXT not in line:
+        return None
+    if stats is not None:
+        stats.regex_attempts["dep_pragma"] += 1
     pragma = _DEP_PRAGMA_RE.search(line)
     if pragma is None:
         return None
-    # Locate the dependency and the span of its version specifier. A specifier is
-    # replaced in place; a bare dependency has a pin inserted after its name, so
-    # its specifier span is the empty slice at the name's end.
-    spec_match = _DEP_LINE_RE.match(line)
-    if spec_match is not None:
-        name = spec_match.group("name")
-        old_spec = spec_match.group("spec")
-        spec_start, spec_end = spec_match.start("spec"), spec_match.end("spec")
-    else:
-        bare_match = _DEP_BARE_RE.match(line)
-        if bare_match is None:
-            return "no dependency to sync"
-        name = bare_match.group("name")
-        old_spec = ""
-        spec_start = spec_end = bare_match.end()
+    if stats is not None:
+        stats.pragma_lines += 1
+    dependency = _locate_dependency(line, pragma.start(), stats)
+    if dependency is None:
+        return "no dependency to sync"
+    name, spec_start, spec_end = dependency
+    old_spec = line[spec_start:spec_end]
+    if stats is not None:
+        stats.regex_attempts["dep_tail"] += 1
     if not _DEP_TAIL_RE.fullmatch(line, spec_end, pragma.start()):
         return "more than one dependency on the line; use one per line"
     package = _normalize_package_name(name)
@@ -124,3 +204,66 @@ def sync_dependency_line(
     target_spec = f"=={uv_data[package]}"
     line_fixed = line[:spec_start] + target_spec + line[spec_end:]
     return line_fixed, DepLineChange(package, old_spec, target_spec)
+
+
+def _lines_with_pragma_text(lines: str | Iterable[str]) -> Iterator[tuple[int, str]]:
+    r"""Yield the 1-based number and text of each line containing the pragma text.
+
+    *lines* is split as by ``str.splitlines(keepends=True)`` when it is a text
+    buffer. A buffer whose only line break is ``"\n"`` is not split at all: the
+    scan jumps from one occurrence of the pragma text to the next, and only
+    counts the line breaks in between.
+    """
+    if not isinstance(lines, str) or any(
+        line_break in lines for line_break in _OTHER_LINE_BREAKS
+    ):
+        if isinstance(lines, str):
+            lines = lines.splitlines(keepends=True)
+        for line_number, line in enumerate(lines, start=1):
+            if PRAGMA_TEXT in line:
+                yield line_number, line
+        return
+    line_number = 1
+    counted_to = 0
+    position = lines.find(PRAGMA_TEXT)
+    while position != -1:
+        start = lines.rfind("\n", 0, position) + 1
+        end = lines.find("\n", position) + 1 or len(lines)
+        line_number += lines.count("\n", counted_to, start)
+        counted_to = start
+        yield line_number, lines[start:end]
+        position = lines.find(PRAGMA_TEXT, end)
+
+
+def sync_dependency_lines(
+    lines: str | Iterable[str], uv_data: dict[str, str], stats: SyncStats | None = None
+) -> tuple[list[DepLineEdit], list[DepLineError]]:
+    r"""Sync every ``# sync-with-uv`` dependency line, in one pass.
+
+    The results are those of :func:`sync_dependency_line` on each line, but the
+    lines without a pragma are skipped in a single scan: a text buffer is not
+    even split into lines unless it uses line breaks other than ``"\n"``.
+
+    Args:
+        lines: The lines (with their line endings), or a whole text buffer.
+        uv_data: Package name to version mapping from uv.lock.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count the
+            regex attempts and pragma lines in.
+
+    Returns:
+        A tuple of (edits, errors): a :class:`DepLineEdit` for each processed
+        dependency line, including those already pinned, and a
+        :class:`DepLineError` for each invalid one, both in line order.
+    """
+    edits: list[DepLineEdit] = []
+    errors: list[DepLineError] = []
+    for line_number, line in _lines_with_pragma_text(lines):
+        result = sync_dependency_line(line, uv_data, stats)
+        if result is None:
+            continue
+        if isinstance(result, str):
+            errors.append(DepLineError(line_number, result))
+        else:
+            line_fixed, change = result
+            edits.append(DepLineEdit(line_number, line, line_fixed, change))
+    return edits, errors
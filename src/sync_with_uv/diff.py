@@ -0,0 +1,182 @@
+"""Unified diffs rendered from known line edits.
+
+The sync engine knows exactly which lines it rewrote, so instead of running
+:func:`difflib.unified_diff` over both texts, the hunks are built straight from
+the edits. The output is the same as :func:`difflib.unified_diff` produces for
+the minimal, line-aligned diff, and is generated lazily.
+"""
+
+import difflib
+from collections.abc import Iterable, Iterator, Sequence
+
+from .sync_with_uv import LineEdit, apply_line_edits
+
+# An opcode as in difflib.SequenceMatcher.get_opcodes, plus the new lines of a
+# non-equal opcode (an equal opcode reuses the old lines).
+_Opcode = tuple[str, int, int, int, int, list[str]]
+
+
+def _edit_opcodes(n_old_lines: int, edits: Iterable[LineEdit]) -> list[_Opcode]:
+    """Return the opcodes turning the old lines into the new ones.
+
+    Adjacent edits are merged into a single opcode, as difflib does.
+    """
+    # coalesce adjacent edits into blocks of (old_start, old_stop, new_lines)
+    blocks: list[tuple[int, int, list[str]]] = []
+    for edit in edits:
+        start = edit.line_number - 1
+        stop = start + 1 if edit.old_line else start
+        if blocks and blocks[-1][1] == start:
+            block_start, _, new_lines = blocks[-1]
+            new_lines.append(edit.new_line)
+            blocks[-1] = (block_start, stop, new_lines)
+        else:
+            blocks.append((start, stop, [edit.new_line]))
+    opcodes: list[_Opcode] = []
+    position = offset = 0
+    for start, stop, new_lines in blocks:
+        if start > position:
+            opcodes.append(
+                ("equal", position, start, position + offset, start + offset, [])
+            )
+        tag = "replace" if stop > start else "insert"
+        new_start = start + offset
+        new_stop = new_start + len(new_lines)
+        opcodes.append((tag, start, stop, new_start, new_stop, new_lines))
+        offset += len(new_lines) - (stop - start)
+        position = stop
+    end = n_old_lines
+    if opcodes and position < end:
+        opcodes.append(("equal", position, end, position + offset, end + offset, []))
+    return opcodes
+
+
+def _grouped_opcodes(opcodes: list[_Opcode], n: int) -> Iterator[list[_Opcode]]:
+    """Group opcodes into hunks with *n* lines of context.
+
+    Mirrors :meth:`difflib.SequenceMatcher.get_grouped_opcodes`.
+    """
+    if not opcodes:
+        return
+    if opcodes[0][0] == "equal":
+        tag, i1, i2, j1, j2, new_lines = opcodes[0]
+        opcodes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2, new_lines
+    if opcodes[-1][0] == "equal":
+        tag, i1, i2, j1, j2, new_lines = opcodes[-1]
+        opcodes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n), new_lines
+    group: list[_Opcode] = []
+    for tag, i1, i2, j1, j2, new_lines in opcodes:
+        if tag == "equal" and i2 - i1 > 2 * n:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n), new_lines))
+            yield group
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)  # noqa: PLW2901
+        group.append((tag, i1, i2, j1, j2, new_lines))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        yield group
+
+
+def _format_range(start: int, stop: int) -> str:
+    """Format a hunk range as in :func:`difflib.unified_diff`."""
+    beginning = start + 1
+    length = stop - start
+    if length == 1:
+        return f"{beginning}"
+    if not length:
+        beginning -= 1
+    return f"{beginning},{length}"
+
+
+def unified_diff_from_edits(
+    old_lines: Sequence[str],
+    edits: Iterable[LineEdit],
+    fromfile: str = "",
+    tofile: str = "",
+    n: int = 3,
+) -> Iterator[str]:
+    """Yield the unified diff of applying *edits* to *old_lines*.
+
+    Args:
+        old_lines: The original lines, with their line endings.
+        edits: The edits to apply, sorted by line number, as returned by
+            :func:`~sync_with_uv.sync_with_uv.sync_config_lines`.
+        fromfile: Name of the original file, for the header.
+        tofile: Name of the updated file, for the header.
+        n: Number of context lines around each hunk.
+
+    Yields:
+        Diff lines, as :func:`difflib.unified_diff` yields them.
+    """
+    started = False
+    for group in _grouped_opcodes(_edit_opcodes(len(old_lines), edits), n):
+        if not started:
+            started = True
+            yield f"--- {fromfile}\n"
+            yield f"+++ {tofile}\n"
+        first, last = group[0], group[-1]
+        old_range = _format_range(first[1], last[2])
+        new_range = _format_range(first[3], last[4])
+        yield f"@@ -{old_range} +{new_range} @@\n"
+        for tag, i1, i2, _, _, new_lines in group:
+            if tag == "equal":
+                for line in old_lines[i1:i2]:
+                    yield " " + line
+                continue
+            for line in old_lines[i1:i2]:
+                yield "-" + line
+            for line in new_lines:
+                yield "+" + line
+
+
+def _split_at_newlines(text: str) -> list[str]:
+    r"""Return the lines of *text* as git sees them: split only at ``\n``."""
+    lines = text.split("\n")
+    return [line + "\n" for line in lines[:-1]] + ([lines[-1]] if lines[-1] else [])
+
+
+def git_patch_from_edits(
+    old_lines: Sequence[str], edits: Sequence[LineEdit], path: str, n: int = 3
+) -> Iterator[str]:
+    r"""Yield a ``git apply`` patch of applying *edits* to the file at *path*.
+
+    This is :func:`unified_diff_from_edits` with git's ``diff --git`` header,
+    ``a/`` and ``b/`` path prefixes, and a ``\ No newline at end of file``
+    marker after a last line without a line ending. git splits lines at
+    ``\n`` only, so a config with other line breaks (such as a lone ``\r``)
+    is diffed again with :mod:`difflib` on its git lines instead.
+
+    Args:
+        old_lines: The original lines, with their line endings.
+        edits: The edits to apply, sorted by line number, as returned by
+            :func:`~sync_with_uv.sync_with_uv.sync_config_lines`.
+        path: The path of the file, relative to where the patch is applied,
+            with ``/`` separators.
+        n: Number of context lines around each hunk.
+
+    Yields:
+        Patch lines, each with its line ending. Nothing for no edits.
+    """
+    if not edits:
+        return
+    if all(line.endswith("\n") for line in old_lines[:-1]):
+        diff_lines = unified_diff_from_edits(
+            old_lines, edits, f"a/{path}", f"b/{path}", n=n
+        )
+    else:
+        diff_lines = difflib.unified_diff(
+            _split_at_newlines("".join(old_lines)),
+            _split_at_newlines(apply_line_edits(list(old_lines), edits)),
+            f"a/{path}",
+            f"b/{path}",
+            n=n,
+        )
+    started = False
+    for line in diff_lines:
+        if not started:
+            started = True
+            yield f"diff --git a/{path} b/{path}\n"
+        if line.endswith("\n"):
+            yield line
+        else:
+            yield line + "\n"
+            yield "\\ No newline at end of file\n"
@@ -0,0 +1,123 @@
+"""Write a synced config back to its file.
+
+Most syncs only bump versions of the same length, such as ``v0.5.1`` to
+``v0.5.2``, so the synced config is as long as the original and differs only in
+a few lines. :func:`write_in_place` then writes just those lines into the
+existing file, rather than writing every byte of it again, which dominates the
+run time of large configs on network file systems.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+
+from .sync_with_uv import ByteEdit
+
+# The size of the reads that hash the patched file.
+_CHUNK_SIZE = 1 << 20
+
+
+def replace_file(path: Path, data: bytes) -> None:
+    """Atomically replace the file at *path* with *data*, keeping its mode.
+
+    *data* is written to a temporary file in the same directory, which then
+    replaces *path*, so a failed write leaves the file untouched.
+    """
+    fd, tmp_name = tempfile.mkstemp(
+        dir=path.parent, prefix=f".{path.name}.", suffix=".tmp"
+    )
+    tmp_path = Path(tmp_name)
+    try:
+        with os.fdopen(fd, "wb") as target:
+            target.write(data)
+        shutil.copymode(path, tmp_path)
+        tmp_path.replace(path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _file_digest(fd: int) -> bytes:
+    """Return the SHA-256 digest of the whole file open as *fd*."""
+    digest = hashlib.sha256()
+    offset = 0
+    while chunk := os.pread(fd, _CHUNK_SIZE, offset):
+        digest.update(chunk)
+        offset += len(chunk)
+    return digest.digest()
+
+
+def _patch(
+    fd: int, old_bytes: bytes, new_bytes: bytes, edits: Sequence[ByteEdit]
+) -> bool:
+    """Write *edits* into the file open as *fd*, and check the result.
+
+    Returns:
+        Whether the file held *old_bytes* where it was patched, and holds
+        exactly *new_bytes* afterwards; not if a write failed.
+    """
+    if os.fstat(fd).st_size != len(old_bytes):
+        return False
+    # the file may have changed since it was read
+    if any(os.pread(fd, len(edit.old), edit.offset) != edit.old for edit in edits):
+        return False
+    try:
+        for edit in edits:
+            if os.pwrite(fd, edit.new, edit.offset) != len(edit.new):
+                return False
+    except OSError:
+        # such as a full disk: the file may be half patched, and is replaced
+        return False
+    return (
+        os.fstat(fd).st_size == len(new_bytes)
+        and _file_digest(fd) == hashlib.sha256(new_bytes).digest()
+    )
+
+
+def write_in_place(
+    path: Path,
+    old_bytes: bytes,
+    new_bytes: bytes,
+    edits: Sequence[ByteEdit] | None,
+) -> bool:
+    """Write the synced config *new_bytes* to *path*, which holds *old_bytes*.
+
+    When every edit is as long as the text it replaces, only the edited bytes
+    are written into the file, with :func:`os.pwrite`, and then the size and
+    SHA-256 hash of the file are checked against *new_bytes*. Otherwise, when
+    the edits are unknown (``None``), or if a check fails, the file is
+    atomically replaced with :func:`replace_file`, as it is if writing an edit
+    fails, and so the file is never left half patched. With no edits at all, the
+    file is left untouched.
+
+    Args:
+        path: Path to the config file.
+        old_bytes: The config the edits were made to.
+        new_bytes: The synced config.
+        edits: The edits from *old_bytes* to *new_bytes*, in order, as recorded
+            by :func:`~sync_with_uv.sync_with_uv.process_config_bytes`.
+
+    Returns:
+        Whether the file was patched in place.
+
+    Raises:
+        OSError: If the file can't be opened for writing, or replaced.
+    """
+    if edits is not None and not edits:
+        return True
+    if (
+        edits is not None
+        and hasattr(os, "pwrite")
+        and all(len(edit.old) == len(edit.new) for edit in edits)
+    ):
+        fd = os.open(path, os.O_RDWR)
+        try:
+            patched = _patch(fd, old_bytes, new_bytes, edits)
+        finally:
+            os.close(fd)
+        if patched:
+            return True
+    replace_file(path, new_bytes)
+    return False
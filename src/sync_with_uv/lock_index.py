@@ -0,0 +1,58 @@
+"""A small sidecar file caching the package versions of a uv.lock.
+
+The sidecar, written by ``sync-with-uv index``, holds the package-to-version
+map and the hash of the uv.lock it was derived from, so a fresh clone can load
+versions by reading a few hundred bytes instead of parsing the whole lock::
+
+    sync-with-uv-lockindex 1 <sha256 of uv.lock>
+    black 23.11.0
+    ruff 0.1.5
+"""
+
+import hashlib
+from pathlib import Path
+
+# The sidecar lives next to the uv.lock it indexes.
+LOCK_INDEX_FILENAME = ".sync-with-uv.lockindex"
+_MAGIC = "sync-with-uv-lockindex"
+_FORMAT_VERSION = "1"
+
+
+def lock_index_path(uv_lock_filename: Path) -> Path:
+    """Return the sidecar path for *uv_lock_filename*."""
+    return uv_lock_filename.with_name(LOCK_INDEX_FILENAME)
+
+
+def digest_bytes(data: bytes) -> str:
+    """Return the hex SHA-256 digest of *data*."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def format_lock_index(lock_digest: str, uv_data: dict[str, str]) -> str:
+    """Return the sidecar content for *uv_data*, derived from a lock with *lock_digest*.
+
+    Packages are sorted, so the sidecar diffs cleanly when committed.
+    """
+    lines = [f"{_MAGIC} {_FORMAT_VERSION} {lock_digest}"]
+    lines.extend(f"{name} {version}" for name, version in sorted(uv_data.items()))
+    return "\n".join(lines) + "\n"
+
+
+def parse_lock_index(text: str, lock_digest: str) -> dict[str, str] | None:
+    """Parse sidecar content produced by :func:`format_lock_index`.
+
+    Returns:
+        The package-to-version map, or ``None`` when the sidecar is malformed,
+        of another format version, or derived from a different lock.
+    """
+    lines = text.splitlines()
+    if not lines or lines[0].split() != [_MAGIC, _FORMAT_VERSION, lock_digest]:
+        return None
+    uv_data = {}
+    for line in lines[1:]:
+        try:
+            name, version = line.split()
+        except ValueError:
+            return None
+        uv_data[name] = version
+    return uv_data
@@ -0,0 +1,170 @@
+"""Load uv.lock on a background thread while the config is read and scanned.
+
+Reading a config, tokenizing it and resolving its repo URLs to packages don't
+need uv.lock, whose parsing takes about as long. A pipelined run parses uv.lock
+on a background thread meanwhile, and only waits for it to render the target
+revs, so that the run takes about the longer of the two rather than their sum.
+
+With the GIL, the two threads overlap while one of them reads a file or hashes
+uv.lock; on a free-threaded build of Python, the parsing itself overlaps too.
+A config large enough to be sharded (see :mod:`sync_with_uv.sharding`) is only
+read in the meantime, as its shards are scanned in parallel once uv.lock is
+loaded.
+"""
+
+import concurrent.futures
+import os
+import time
+from pathlib import Path
+from typing import Literal, NamedTuple
+
+from .profiling import Profiler, phase
+from .sharding import gil_enabled, process_config_sharded, shard_count
+from .stats import SyncStats
+from .sync_with_uv import (
+    ByteEdit,
+    Changes,
+    load_uv_lock,
+    process_scanned_config,
+    scan_config_bytes,
+)
+
+
+class _LockLoad(NamedTuple):
+    """The packages of uv.lock, and the time it took to load them."""
+
+    uv_data: dict[str, str]
+    wall_ns: int
+    cpu_ns: int
+
+
+def _load_uv_lock_timed(uv_lock_path: Path, *, update_index: bool) -> _LockLoad:
+    """Load uv.lock and time it; run on the background thread."""
+    wall_start = time.perf_counter_ns()
+    cpu_start = time.thread_time_ns()
+    uv_data = load_uv_lock(uv_lock_path, update_index=update_index)
+    return _LockLoad(
+        uv_data,
+        time.perf_counter_ns() - wall_start,
+        time.thread_time_ns() - cpu_start,
+    )
+
+
+def _overlap_saved_ns(lock_load: _LockLoad, waited_ns: int) -> int:
+    """Estimate the wall time saved by loading uv.lock in the background.
+
+    The main thread didn't wait for the load but for *waited_ns*. With the GIL,
+    or on a single CPU, the load's CPU time was taken from the main thread
+    though, so it isn't counted as saved; the estimate errs on the low side, as
+    hashing and reading release the GIL.
+    """
+    saved_ns = lock_load.wall_ns - waited_ns
+    if gil_enabled() or os.cpu_count() == 1:
+        saved_ns -= lock_load.cpu_ns
+    return max(saved_ns, 0)
+
+
+class PipelinedSync(NamedTuple):
+    """The outcome of :func:`sync_config_pipelined`."""
+
+    config_bytes: bytes
+    fixed_bytes: bytes
+    changes: Changes
+    uv_data: dict[str, str]
+
+
+def sync_config_pipelined(  # noqa: PLR0913
+    config_path: Path,
+    uv_lock_path: Path,
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+    byte_edits: list[ByteEdit] | None = None,
+    max_workers: int | None = None,
+    profiler: Profiler | None = None,
+    update_index: bool = True,
+) -> PipelinedSync:
+    """Sync the config at *config_path* in memory, loading uv.lock meanwhile.
+
+    The result is that of loading uv.lock and then syncing the config with
+    :func:`~sync_with_uv.sharding.process_config_sharded`, except that the
+    package lookups resolved by the scan count as mapping cache hits in
+    *stats*. Nothing is written but a stale lock index, unless *update_index*
+    is false.
+
+    The phases of the main thread are measured with *profiler*, if given:
+    ``read_config``, ``scan_config``, ``wait_uv_lock`` and
+    ``process_config_text``; the loading of uv.lock is added as the background
+    phase ``load_uv_lock``, with an estimate of the wall time its overlap saved.
+
+    Args:
+        config_path: Path to the config.
+        uv_lock_path: Path to uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in.
+        byte_edits: Optional list to append the edits of the config to.
+        max_workers: The most workers to sync a very large config with.
+        profiler: Optional :class:`~sync_with_uv.profiling.Profiler`.
+        update_index: Whether to rebuild a stale lock index sidecar, as in
+            :func:`~sync_with_uv.sync_with_uv.load_uv_lock`.
+
+    Raises:
+        ValueError: As :func:`~sync_with_uv.sync_with_uv.process_config_text`,
+            or if uv.lock is invalid.
+        OSError: If the config or uv.lock can't be read.
+    """
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        lock_future = executor.submit(
+            _load_uv_lock_timed, uv_lock_path, update_index=update_index
+        )
+        with phase(profiler, "read_config"):
+            config_bytes = config_path.read_bytes()
+        scanned = None
+        if shard_count(config_bytes, max_workers) <= 1:
+            with phase(profiler, "scan_config"):
+                scanned = scan_config_bytes(
+                    config_bytes,
+                    config_format=config_format,
+                    user_repo_mappings=user_repo_mappings,
+                    user_version_mappings=user_version_mappings,
+                )
+        wait_start = time.perf_counter_ns()
+        with phase(profiler, "wait_uv_lock"):
+            lock_load = lock_future.result()
+        waited_ns = time.perf_counter_ns() - wait_start
+    if profiler is not None:
+        profiler.add_background(
+            "load_uv_lock",
+            lock_load.wall_ns,
+            lock_load.cpu_ns,
+            saved_ns=_overlap_saved_ns(lock_load, waited_ns),
+        )
+    with phase(profiler, "process_config_text"):
+        if scanned is not None:
+            fixed_bytes, changes = process_scanned_config(
+                scanned,
+                lock_load.uv_data,
+                stamp=stamp,
+                stats=stats,
+                byte_edits=byte_edits,
+            )
+        else:
+            fixed_bytes, changes = process_config_sharded(
+                config_bytes,
+                lock_load.uv_data,
+                config_format=config_format,
+                user_repo_mappings=user_repo_mappings,
+                user_version_mappings=user_version_mappings,
+                stamp=stamp,
+                stats=stats,
+                byte_edits=byte_edits,
+                max_workers=max_workers,
+            )
+    return PipelinedSync(config_bytes, fixed_bytes, changes, lock_load.uv_data)
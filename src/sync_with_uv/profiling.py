@@ -0,0 +1,150 @@
+"""Per-phase timing of a sync run, for ``--profile``."""
+
+import contextlib
+import cProfile
+import time
+import tracemalloc
+from collections.abc import Iterator
+from pathlib import Path
+from typing import NamedTuple
+
+# Appended to the name of a phase run on a background thread, in reports.
+BACKGROUND_SUFFIX = " (background)"
+
+
+class PhaseTiming(NamedTuple):
+    """The cost of one phase of a run.
+
+    ``peak_memory`` is the peak traced allocation above the phase's starting
+    point, in bytes, or ``None`` when memory was not traced. A ``background``
+    phase ran on another thread, alongside the others, and its ``cpu_ns`` is
+    that thread's CPU time.
+    """
+
+    name: str
+    wall_ns: int
+    cpu_ns: int
+    peak_memory: int | None
+    background: bool = False
+
+    @property
+    def label(self) -> str:
+        """The name of the phase, marked when it ran in the background."""
+        return self.name + BACKGROUND_SUFFIX if self.background else self.name
+
+
+class Profiler:
+    """Collect per-phase wall time, CPU time and, optionally, peak memory.
+
+    Phases are measured with :func:`time.perf_counter_ns` and
+    :func:`time.process_time_ns`. With *trace_memory*, :mod:`tracemalloc` also
+    records each phase's peak memory; with *stats_path*, a :mod:`cProfile` runs
+    during all phases and its stats are written by :meth:`finish`.
+    """
+
+    def __init__(
+        self, *, trace_memory: bool = False, stats_path: Path | None = None
+    ) -> None:
+        """Create a profiler; tracing starts with the first phase."""
+        self.phases: list[PhaseTiming] = []
+        self.trace_memory = trace_memory
+        self.stats_path = stats_path
+        self._profile = cProfile.Profile() if stats_path is not None else None
+        self._started_tracing = False
+        self.overlap_saved_ns = 0
+
+    def add(self, name: str, wall_ns: int, cpu_ns: int) -> None:
+        """Record a phase measured elsewhere, such as the import time."""
+        self.phases.append(PhaseTiming(name, wall_ns, cpu_ns, None))
+
+    def add_background(
+        self, name: str, wall_ns: int, cpu_ns: int, *, saved_ns: int
+    ) -> None:
+        """Record a phase run on a background thread.
+
+        *saved_ns* is the wall time its overlap with the other phases saved.
+        """
+        self.phases.append(PhaseTiming(name, wall_ns, cpu_ns, None, background=True))
+        self.overlap_saved_ns += saved_ns
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Measure the code run in the ``with`` block as the phase *name*."""
+        memory_start = 0
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            tracemalloc.reset_peak()
+            memory_start = tracemalloc.get_traced_memory()[0]
+        if self._profile is not None:
+            self._profile.enable()
+        wall_start = time.perf_counter_ns()
+        cpu_start = time.process_time_ns()
+        try:
+            yield
+        finally:
+            wall_ns = time.perf_counter_ns() - wall_start
+            cpu_ns = time.process_time_ns() - cpu_start
+            if self._profile is not None:
+                self._profile.disable()
+            peak_memory = (
+                tracemalloc.get_traced_memory()[1] - memory_start
+                if self.trace_memory
+                else None
+            )
+            self.phases.append(PhaseTiming(name, wall_ns, cpu_ns, peak_memory))
+
+    def finish(self) -> None:
+        """Stop memory tracing and write the :mod:`cProfile` stats, if enabled."""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        if self._profile is not None and self.stats_path is not None:
+            self._profile.dump_stats(self.stats_path)
+
+    def report(self) -> str:
+        """Return a table of the recorded phases and their total.
+
+        The phases run in the background are listed after the total, which
+        doesn't include them, followed by the wall time their overlap saved.
+        """
+        foreground = [phase for phase in self.phases if not phase.background]
+        background = [phase for phase in self.phases if phase.background]
+        rows = [("phase", "wall ms", "cpu ms", "peak KiB")]
+        rows.extend(map(_phase_row, foreground))
+        rows.append(
+            (
+                "total",
+                f"{sum(phase.wall_ns for phase in foreground) / 1e6:.3f}",
+                f"{sum(phase.cpu_ns for phase in foreground) / 1e6:.3f}",
+                "",
+            )
+        )
+        if background:
+            rows.extend(map(_phase_row, background))
+            rows.append(
+                ("saved by overlap", f"{self.overlap_saved_ns / 1e6:.3f}", "", "")
+            )
+        width = max(len(row[0]) for row in rows)
+        return "\n".join(
+            f"{name:<{width}} {wall:>10} {cpu:>10} {peak:>10}".rstrip()
+            for name, wall, cpu, peak in rows
+        )
+
+
+def _phase_row(phase: PhaseTiming) -> tuple[str, str, str, str]:
+    """Return the row of *phase* in :meth:`Profiler.report`."""
+    return (
+        phase.label,
+        f"{phase.wall_ns / 1e6:.3f}",
+        f"{phase.cpu_ns / 1e6:.3f}",
+        "-" if phase.peak_memory is None else f"{phase.peak_memory / 1024:.1f}",
+    )
+
+
+def phase(
+    profiler: Profiler | None, name: str
+) -> contextlib.AbstractContextManager[None]:
+    """Return :meth:`Profiler.phase` for *name*, or a no-op without a profiler."""
+    return profiler.phase(name) if profiler is not None else contextlib.nullcontext()
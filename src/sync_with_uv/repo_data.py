@@ -71,9 +71,14 @@ def load_user_mappings(
     if not pyproject_path.exists():
         return {}, {}
 
-    with pyproject_path.open("rb") as f:
-        toml_data = tomli.load(f)
+    return parse_user_mappings(pyproject_path.read_bytes())
 
+
+def parse_user_mappings(
+    pyproject_bytes: bytes,
+) -> tuple[dict[str, str], dict[str, str]]:
+    """Like :func:`load_user_mappings`, on the content of a pyproject.toml file."""
+    toml_data = tomli.loads(pyproject_bytes.decode())
     tool_config = toml_data.get("tool", {}).get("sync-with-uv", {})
     user_repo_to_package = tool_config.get("repo-to-package", {})
     user_repo_to_version_template = tool_config.get("repo-to-version-template", {})
@@ -137,9 +142,12 @@ def repo_to_version_template(
     if repo_url in combined_mappings:
         return combined_mappings[repo_url]
 
-    # Check prefix matches (for repos with sub-paths)
-    for repo, version_template in combined_mappings.items():
-        if repo_url.startswith(repo + "/"):
-            return version_template
+    # Check prefix matches (for repos with sub-paths), most specific first.
+    # Looking up each parent path keeps this independent of the mapping size.
+    prefix = repo_url
+    while (cut := prefix.rfind("/")) > 0:
+        prefix = prefix[:cut]
+        if prefix in combined_mappings:
+            return combined_mappings[prefix]
 
     return None
@@ -0,0 +1,348 @@
+"""Sync a very large config in shards, on a pool of workers.
+
+Each repo block of a config is synced independently of the others, so a config
+of tens of thousands of repos can be split at repo headers into shards that are
+synced in parallel, each with a fresh tokenizer. The shards are processed by
+threads on a free-threaded build of Python, and by processes otherwise.
+
+A fresh tokenizer reads a shard as the whole config would only if its first
+line is at the top level of the config, outside any flow collection, YAML block
+scalar or TOML multi-line string. That is checked once the shard before it has
+been tokenized, and in the rare config where it fails, the config is synced
+again serially, so the result is always that of the serial engine.
+"""
+
+import concurrent.futures
+import itertools
+import os
+import sys
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import AnyStr, Generic, Literal, NamedTuple, overload
+
+from .stats import SyncStats
+from .sync_with_uv import (
+    ByteEdit,
+    Changes,
+    LineEdit,
+    apply_byte_edits,
+    apply_line_edits,
+    process_config_bytes,
+    process_config_text,
+    raise_dep_errors,
+    sync_lines,
+    with_stamp_edit,
+)
+from .tokenizer import ConfigTokenizer
+
+# The fewest lines worth a shard: about a tenth of a second of serial sync,
+# which outweighs starting a worker process and sending it the shard.
+MIN_SHARD_LINES = 20_000
+
+
+@dataclass(slots=True)
+class _Shard(Generic[AnyStr]):
+    """A run of config lines to sync, and what a worker needs to sync them."""
+
+    lines: list[AnyStr]
+    line_number: int  # of the line before the shard
+    offset: int  # where the shard starts
+    next_line: AnyStr | None  # the first line of the next shard
+    uv_data: dict[str, str]
+    config_format: Literal["yaml", "toml"]
+    user_repo_mappings: dict[str, str] | None
+    user_version_mappings: dict[str, str] | None
+    count: bool  # whether to count stats
+
+
+@dataclass(slots=True)
+class _ShardResult(Generic[AnyStr]):
+    """The synced lines of a shard, and whether the next shard can follow it."""
+
+    edits: list[tuple[int, AnyStr]]  # the line number and new line of each edit
+    changes: Changes
+    dep_errors: list[str]
+    stats: SyncStats | None
+    next_at_top_level: bool
+
+
+def _sync_shard(shard: _Shard[AnyStr]) -> _ShardResult[AnyStr]:
+    """Sync a shard with a fresh tokenizer; run by the workers."""
+    changes = Changes({}, {})
+    dep_errors: list[str] = []
+    stats = SyncStats() if shard.count else None
+    tokenizer = ConfigTokenizer(
+        shard.config_format, line_number=shard.line_number, offset=shard.offset
+    )
+    edits = [
+        (line_number, line_fixed)
+        for line_number, line, line_fixed in sync_lines(
+            shard.lines,
+            shard.uv_data,
+            config_format=shard.config_format,
+            user_repo_mappings=shard.user_repo_mappings,
+            user_version_mappings=shard.user_version_mappings,
+            changes=changes,
+            dep_errors=dep_errors,
+            stats=stats,
+            tokenizer=tokenizer,
+        )
+        if line_fixed is not line
+    ]
+    # the engine reads every line, as it reads the last batch before stopping
+    next_at_top_level = shard.next_line is None or tokenizer.at_top_level(
+        shard.next_line
+    )
+    return _ShardResult(edits, changes, dep_errors, stats, next_at_top_level)
+
+
+def _starts_repo(line: AnyStr, config_format: Literal["yaml", "toml"]) -> bool:
+    """Whether the first token of *line*, read at the top level, is a repo."""
+    tokens = ConfigTokenizer(config_format).feed(line)
+    return bool(tokens) and tokens[0].kind == "repo"
+
+
+def shard_boundaries(
+    lines: Sequence[AnyStr], config_format: Literal["yaml", "toml"], n_shards: int
+) -> list[int]:
+    """Return the indices of the lines that start the shards of *lines*.
+
+    The config is cut into *n_shards* runs of about the same number of lines,
+    each moved down to the next line starting with a repo header. The first
+    shard starts at 0, and there are fewer shards if no header is found before
+    the next cut.
+    """
+    boundaries = [0]
+    for shard in range(1, n_shards):
+        index = max(len(lines) * shard // n_shards, boundaries[-1] + 1)
+        stop = len(lines) * (shard + 1) // n_shards
+        while index < stop and not _starts_repo(lines[index], config_format):
+            index += 1
+        if index < stop:
+            boundaries.append(index)
+    return boundaries
+
+
+def gil_enabled() -> bool:
+    """Whether the GIL is enabled, so that threads run Python one at a time."""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is None or bool(is_gil_enabled())
+
+
+def shard_count(
+    config: str | bytes,
+    max_workers: int | None = None,
+    min_shard_lines: int = MIN_SHARD_LINES,
+) -> int:
+    """Return the number of shards :func:`process_config_sharded` would try.
+
+    A config is synced serially when this is at most 1.
+    """
+    max_shards = max_workers or os.cpu_count() or 1
+    n_lines = config.count("\n") if isinstance(config, str) else config.count(b"\n")
+    return min(max_shards, n_lines // min_shard_lines)
+
+
+class _ShardOptions(NamedTuple):
+    """The arguments of :func:`process_config_sharded` that shards share."""
+
+    uv_data: dict[str, str]
+    config_format: Literal["yaml", "toml"]
+    user_repo_mappings: dict[str, str] | None
+    user_version_mappings: dict[str, str] | None
+    stats: SyncStats | None
+    use_threads: bool | None
+
+
+def _sync_shards(
+    lines: list[AnyStr], n_shards: int, options: _ShardOptions
+) -> tuple[list[tuple[int, AnyStr]], Changes] | None:
+    """Sync *lines* in shards, and return their edits and changes.
+
+    Returns ``None`` when no more than one of the *n_shards* shards is found, or
+    a shard doesn't start at the top level; then nothing was counted in *stats*.
+    """
+    boundaries: list[int] = shard_boundaries(lines, options.config_format, n_shards)
+    if len(boundaries) < 2:  # noqa: PLR2004
+        return None
+    stops = [*boundaries[1:], len(lines)]
+    offsets = itertools.accumulate(
+        (
+            sum(map(len, lines[start:stop]))
+            for start, stop in zip(boundaries, stops, strict=True)
+        ),
+        initial=0,
+    )
+    shards = [
+        _Shard(
+            lines[start:stop],
+            start,
+            offset,
+            lines[stop] if stop < len(lines) else None,
+            options.uv_data,
+            options.config_format,
+            options.user_repo_mappings,
+            options.user_version_mappings,
+            options.stats is not None,
+        )
+        # the offsets end with that of the end of the config
+        for start, stop, offset in zip(boundaries, stops, offsets, strict=False)
+    ]
+    use_threads = options.use_threads
+    if use_threads is None:
+        use_threads = not gil_enabled()
+    executor: concurrent.futures.Executor = (
+        concurrent.futures.ThreadPoolExecutor(len(shards))
+        if use_threads
+        else concurrent.futures.ProcessPoolExecutor(len(shards))
+    )
+    with executor:
+        results = list(executor.map(_sync_shard, shards))
+    if not all(result.next_at_top_level for result in results):
+        return None
+    edits: list[tuple[int, AnyStr]] = []
+    changes = Changes({}, {})
+    dep_errors: list[str] = []
+    for result in results:
+        # the shards are in order, so later results win as in a serial sync
+        edits += result.edits
+        changes.repos.update(result.changes.repos)
+        changes.lines.update(result.changes.lines)
+        dep_errors += result.dep_errors
+        if options.stats is not None and result.stats is not None:
+            options.stats.update(result.stats)
+    raise_dep_errors(dep_errors)
+    return edits, changes
+
+
+@overload
+def process_config_sharded(
+    config: str,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+    byte_edits: list[ByteEdit] | None = None,
+    max_workers: int | None = None,
+    min_shard_lines: int = MIN_SHARD_LINES,
+    use_threads: bool | None = None,
+) -> tuple[str, Changes]: ...
+@overload
+def process_config_sharded(
+    config: bytes,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+    byte_edits: list[ByteEdit] | None = None,
+    max_workers: int | None = None,
+    min_shard_lines: int = MIN_SHARD_LINES,
+    use_threads: bool | None = None,
+) -> tuple[bytes, Changes]: ...
+def process_config_sharded(  # noqa: PLR0913
+    config: str | bytes,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+    byte_edits: list[ByteEdit] | None = None,
+    max_workers: int | None = None,
+    min_shard_lines: int = MIN_SHARD_LINES,
+    use_threads: bool | None = None,
+) -> tuple[str | bytes, Changes]:
+    """Sync a config as :func:`~sync_with_uv.sync_with_uv.process_config_text`.
+
+    A config of ``bytes`` is synced as by
+    :func:`~sync_with_uv.sync_with_uv.process_config_bytes`, which records its
+    edits in *byte_edits*. A config of at least twice *min_shard_lines* lines
+    is split into shards that are synced on a pool of workers; a smaller one is
+    synced serially, in this thread. The result is the same either way, except
+    that the mapping cache counts of *stats* are per shard.
+
+    Args:
+        config: Raw config file content, as text or bytes.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in.
+        byte_edits: Optional list to append the edits of a ``bytes`` config to.
+        max_workers: The most workers, and so shards, to use. Defaults to the
+            number of CPUs.
+        min_shard_lines: The fewest lines of a shard.
+        use_threads: Whether the workers are threads rather than processes.
+            Defaults to threads only if the GIL is disabled.
+
+    Returns:
+        Tuple of (updated config, changes), as in
+        :func:`~sync_with_uv.sync_with_uv.process_config_text`.
+
+    Raises:
+        ValueError: If a ``# sync-with-uv`` line has no dependency to sync, or
+            its package is not present in uv.lock.
+    """
+    shard_options = _ShardOptions(
+        uv_data,
+        config_format,
+        user_repo_mappings,
+        user_version_mappings,
+        stats,
+        use_threads,
+    )
+    # most configs are small, and are synced serially without splitting them twice
+    n_shards = shard_count(config, max_workers, min_shard_lines)
+    if isinstance(config, str):
+        lines = config.splitlines(keepends=True) if n_shards > 1 else []
+        sharded = _sync_shards(lines, n_shards, shard_options)
+        if sharded is None:
+            return process_config_text(
+                config,
+                uv_data,
+                config_format=config_format,
+                user_repo_mappings=user_repo_mappings,
+                user_version_mappings=user_version_mappings,
+                stamp=stamp,
+                stats=stats,
+            )
+        shard_edits, changes = sharded
+        edits = [
+            LineEdit(line_number, lines[line_number - 1], line_fixed)
+            for line_number, line_fixed in shard_edits
+        ]
+        return apply_line_edits(lines, with_stamp_edit(lines, edits, stamp)), changes
+    byte_lines = config.splitlines(keepends=True) if n_shards > 1 else []
+    sharded_bytes = _sync_shards(byte_lines, n_shards, shard_options)
+    if sharded_bytes is None:
+        return process_config_bytes(
+            config,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+            stamp=stamp,
+            stats=stats,
+            byte_edits=byte_edits,
+        )
+    shard_byte_edits, changes = sharded_bytes
+    fixed = apply_byte_edits(
+        config,
+        byte_lines,
+        [
+            (line_number, True, line_fixed)
+            for line_number, line_fixed in shard_byte_edits
+        ],
+        stamp=stamp,
+        byte_edits=byte_edits,
+    )
+    return fixed, changes
@@ -0,0 +1,86 @@
+"""A sync stamp comment recording the lock state a config was synced against.
+
+With the opt-in stamp, the config starts with a comment such as::
+
+    # sync-with-uv: lock=0123456789abcdef
+
+The hash covers uv.lock, the user mappings and the tool version, so a run can
+compare it with the first few lines of the config and exit early when nothing
+that affects the sync has changed -- without any cache directory.
+"""
+
+import itertools
+import json
+import re
+from collections.abc import Iterable
+from pathlib import Path
+
+from . import __version__
+from .lock_index import digest_bytes
+
+# The stamp is only looked for (and kept) within the first lines of the config,
+# so checking it never reads the whole file.
+STAMP_SEARCH_LINES = 5
+_STAMP_RE = re.compile(r"^#\s*sync-with-uv:\s*lock=(?P<stamp>[0-9a-f]+)[ \t]*$")
+_STAMP_LENGTH = 16
+
+
+def compute_stamp(
+    lock_bytes: bytes,
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+) -> str:
+    """Return the stamp for a uv.lock content and the user mappings.
+
+    As in :func:`~sync_with_uv.cache.cache_key`, the user mappings are hashed
+    sorted, so that reordering them doesn't invalidate the stamp.
+    """
+    payload = json.dumps(
+        [
+            __version__,
+            digest_bytes(lock_bytes),
+            sorted((user_repo_mappings or {}).items()),
+            sorted((user_version_mappings or {}).items()),
+        ]
+    )
+    return digest_bytes(payload.encode())[:_STAMP_LENGTH]
+
+
+def format_stamp(stamp: str) -> str:
+    """Return the stamp comment for *stamp*, without a line ending."""
+    return f"# sync-with-uv: lock={stamp}"
+
+
+def read_stamp(lines: Iterable[str]) -> str | None:
+    """Return the stamp found in the first lines of a config, if any."""
+    for line in itertools.islice(lines, STAMP_SEARCH_LINES):
+        if match := _STAMP_RE.match(line.rstrip("\r\n")):
+            return match.group("stamp")
+    return None
+
+
+def read_config_stamp(config_path: Path) -> str | None:
+    """Return the stamp of a config file, reading only its first lines."""
+    with config_path.open(encoding="utf-8", newline="") as f:
+        return read_stamp(f)
+
+
+def stamp_line_edit(lines: list[str], stamp: str) -> tuple[int, str, str] | None:
+    """Return the edit that writes or updates the stamp in config *lines*.
+
+    An existing stamp within the first :data:`STAMP_SEARCH_LINES` lines is
+    replaced in place; otherwise the stamp is inserted as the first line, using
+    the config's line ending.
+
+    Returns:
+        ``None`` when the stamp is already current, otherwise a tuple of
+        (1-based line number, old line, new line), where the old line is empty
+        for an inserted stamp.
+    """
+    for i, line in enumerate(lines[:STAMP_SEARCH_LINES]):
+        body = line.rstrip("\r\n")
+        if _STAMP_RE.match(body):
+            new_line = format_stamp(stamp) + line[len(body) :]
+            return None if new_line == line else (i + 1, line, new_line)
+    newline = lines[0][len(lines[0].rstrip("\r\n")) :] if lines else ""
+    return 1, "", format_stamp(stamp) + (newline or "\n")
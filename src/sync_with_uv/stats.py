@@ -0,0 +1,42 @@
+"""Counters of the work done by a sync, for spotting pathological configs."""
+
+from collections import Counter
+from dataclasses import dataclass, field
+
+
+@dataclass(slots=True)
+class SyncStats:
+    """Hot-path counters, filled in when passed to the processing functions.
+
+    Pass an instance as ``stats=`` to
+    :func:`~sync_with_uv.sync_with_uv.process_config_text` (or
+    :func:`~sync_with_uv.dependency_line.sync_dependency_line`) to collect them;
+    without it, nothing is counted. The same instance can be reused to
+    accumulate several runs.
+
+    ``repo_headers`` counts the ``repo`` entries found by the tokenizer.
+    ``regex_attempts`` counts the match attempts of each dependency-line
+    pattern, by name: ``dep_pragma``, ``dep_line``, ``dep_bare`` and
+    ``dep_tail``; ``dep_pragma`` is only tried on lines containing the text
+    ``sync-with-uv``. ``bytes_processed`` counts the characters of the scanned
+    lines. ``mapping_cache_hits`` and ``mapping_cache_misses`` count lookups of
+    repo URLs in the per-run memo of the repo mappings.
+    """
+
+    lines_scanned: int = 0
+    bytes_processed: int = 0
+    repo_headers: int = 0
+    pragma_lines: int = 0
+    mapping_cache_hits: int = 0
+    mapping_cache_misses: int = 0
+    regex_attempts: Counter[str] = field(default_factory=Counter)
+
+    def update(self, other: "SyncStats") -> None:
+        """Add the counts of *other* to these."""
+        self.lines_scanned += other.lines_scanned
+        self.bytes_processed += other.bytes_processed
+        self.repo_headers += other.repo_headers
+        self.pragma_lines += other.pragma_lines
+        self.mapping_cache_hits += other.mapping_cache_hits
+        self.mapping_cache_misses += other.mapping_cache_misses
+        self.regex_attempts.update(other.regex_attempts)
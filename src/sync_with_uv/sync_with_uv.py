@@ -1,13 +1,37 @@
 """sync-with-uv: Sync '.pre-commit-config.yaml' or 'prek.toml' from 'uv.lock'."""
 
-import re
+import bisect
+import collections
+import contextlib
+import functools
+import itertools
+import json
+import operator
+import os
+import shutil
+import string
+import tempfile
+from collections.abc import Callable, Iterable, Iterator
 from pathlib import Path
-from typing import Literal, NamedTuple
+from typing import AnyStr, Literal, NamedTuple, overload
 
 import tomli
 
-from sync_with_uv.dependency_line import DepLineChange, sync_dependency_line
+from sync_with_uv.dependency_line import (
+    PRAGMA_TEXT,
+    DepLineChange,
+    sync_dependency_line,
+)
+from sync_with_uv.lock_index import (
+    digest_bytes,
+    format_lock_index,
+    lock_index_path,
+    parse_lock_index,
+)
 from sync_with_uv.repo_data import repo_to_package, repo_to_version_template
+from sync_with_uv.stamp import STAMP_SEARCH_LINES, read_stamp, stamp_line_edit
+from sync_with_uv.stats import SyncStats
+from sync_with_uv.tokenizer import ConfigTokenizer, Token
 
 
 class Changes(NamedTuple):
@@ -23,17 +47,27 @@ class Changes(NamedTuple):
     lines: dict[int, DepLineChange]
 
 
-def load_uv_lock(filename: Path) -> dict[str, str]:
-    """Load package versions from uv.lock file.
+# Config filenames tried in order when no explicit path is given.
+CONFIG_FILENAMES = (".pre-commit-config.yaml", "prek.toml")
 
-    Args:
-        filename: Path to uv.lock file.
 
-    Returns:
-        Mapping of package names to their versions.
+def config_format_for(filename: Path) -> Literal["yaml", "toml"]:
+    """Return the format of the config at *filename*, from its suffix.
+
+    Raises:
+        ValueError: If the suffix is neither a YAML nor a TOML one.
     """
-    with filename.open("rb") as f:
-        toml_data = tomli.load(f)
+    if filename.suffix in (".yaml", ".yml"):
+        return "yaml"
+    if filename.suffix == ".toml":
+        return "toml"
+    msg = "precommit_filename must be a YAML or a TOML"
+    raise ValueError(msg)
+
+
+def _parse_uv_lock(lock_text: str) -> dict[str, str]:
+    """Return the package versions from uv.lock content."""
+    toml_data = tomli.loads(lock_text)
     return (
         {
             package["name"]: package["version"]
@@ -45,38 +79,543 @@ def load_uv_lock(filename: Path) -> dict[str, str]:
     )
 
 
+class LineEdit(NamedTuple):
+    """A config line rewritten by the sync.
+
+    ``line_number`` is 1-based, in the original config. ``old_line`` is ``""``
+    for a line inserted before ``line_number`` (such as a new sync stamp).
+    """
+
+    line_number: int
+    old_line: str
+    new_line: str
+
+
+PlanEditKind = Literal["rev", "dependency", "stamp"]
+
+
+class PlanEdit(NamedTuple):
+    """A span of a config replaced by the sync, see :func:`plan_config_sync`.
+
+    ``offset`` is the index in the original config text where ``old`` starts;
+    ``old`` is ``""`` for inserted text. ``package`` is the uv.lock package the
+    edit syncs, or ``""`` for the sync stamp.
+    """
+
+    offset: int
+    old: str
+    new: str
+    kind: PlanEditKind
+    package: str
+
+
+class ByteEdit(NamedTuple):
+    """A line of a config's bytes rewritten by :func:`process_config_bytes`.
+
+    ``offset`` is the index in the original config where ``old`` starts;
+    ``old`` is ``b""`` for an inserted line.
+    """
+
+    offset: int
+    old: bytes
+    new: bytes
+
+
+def load_uv_lock(filename: Path, *, update_index: bool = True) -> dict[str, str]:
+    """Load package versions from uv.lock file.
+
+    If a lock index sidecar (see :mod:`sync_with_uv.lock_index`) exists next to
+    the lock, it is used whenever it matches the lock's hash, and rebuilt
+    otherwise. Without a sidecar, the lock is parsed directly.
+
+    Args:
+        filename: Path to uv.lock file.
+        update_index: Whether to rebuild a sidecar that doesn't match the lock;
+            without it, nothing is ever written.
+
+    Returns:
+        Mapping of package names to their versions.
+    """
+    index_path = lock_index_path(filename)
+    if not index_path.is_file():
+        return _parse_uv_lock(filename.read_bytes().decode())
+    lock_bytes = filename.read_bytes()
+    lock_digest = digest_bytes(lock_bytes)
+    try:
+        uv_data = parse_lock_index(index_path.read_text(encoding="utf-8"), lock_digest)
+    except (OSError, UnicodeDecodeError):
+        uv_data = None
+    if uv_data is None:
+        uv_data = _parse_uv_lock(lock_bytes.decode())
+        if not update_index:
+            return uv_data
+        # the sidecar is only a cache, so a failure to rebuild it is not an error
+        with contextlib.suppress(OSError):
+            index_path.write_text(
+                format_lock_index(lock_digest, uv_data), encoding="utf-8", newline=""
+            )
+    return uv_data
+
+
+def uv_data_from_bytes(
+    lock_bytes: bytes, index_bytes: bytes | None = None
+) -> dict[str, str]:
+    """Like :func:`load_uv_lock`, on the content of uv.lock and of its sidecar.
+
+    The sidecar content, *index_bytes*, is used if it matches the lock's hash.
+    Nothing is ever written.
+    """
+    if index_bytes is not None:
+        with contextlib.suppress(UnicodeDecodeError):
+            uv_data = parse_lock_index(index_bytes.decode(), digest_bytes(lock_bytes))
+            if uv_data is not None:
+                return uv_data
+    return _parse_uv_lock(lock_bytes.decode())
+
+
+def write_lock_index(filename: Path) -> Path:
+    """Write a lock index sidecar for a uv.lock file.
+
+    Args:
+        filename: Path to uv.lock file.
+
+    Returns:
+        The path of the written sidecar.
+    """
+    lock_bytes = filename.read_bytes()
+    uv_data = _parse_uv_lock(lock_bytes.decode())
+    index_path = lock_index_path(filename)
+    index_path.write_text(
+        format_lock_index(digest_bytes(lock_bytes), uv_data),
+        encoding="utf-8",
+        newline="",
+    )
+    return index_path
+
+
+_TOKENIZE_BATCH_LINES = 256
+_REPO_MAPPINGS_MEMO_SIZE = 256
+_SKIP_REPOS = {
+    "yaml": {"local", "meta"},
+    "toml": {"local", "meta", "builtin"},
+}
+
+
+class _RepoMappings:
+    """Per-run memo of the repo URL to package and version template mappings.
+
+    A repo URL usually appears once per config, but the lookups are not free
+    (the version template falls back to looking up each parent path of the
+    URL), so repeated URLs are resolved once. The memo is cleared once it holds
+    :data:`_REPO_MAPPINGS_MEMO_SIZE` URLs, so that a streamed config of any size
+    is synced in bounded memory. Hits and misses are counted in *stats*, unless
+    it is ``None``. The package memo may be seeded with *packages* resolved
+    beforehand, as by :func:`scan_config_bytes`; their lookups count as hits.
+    """
+
+    def __init__(
+        self,
+        user_repo_mappings: dict[str, str] | None,
+        user_version_mappings: dict[str, str] | None,
+        stats: SyncStats | None,
+        packages: dict[str, str | None] | None = None,
+    ) -> None:
+        self._user_repo_mappings = user_repo_mappings
+        self._user_version_mappings = user_version_mappings
+        self._stats = stats
+        self._packages: dict[str, str | None] = dict(packages or {})
+        self._version_templates: dict[str, str | None] = {}
+
+    def _count(self, *, hit: bool) -> None:
+        if self._stats is not None:
+            if hit:
+                self._stats.mapping_cache_hits += 1
+            else:
+                self._stats.mapping_cache_misses += 1
+
+    def package(self, repo_url: str) -> str | None:
+        """Return :func:`repo_to_package` for *repo_url*."""
+        try:
+            package = self._packages[repo_url]
+        except KeyError:
+            self._count(hit=False)
+            if len(self._packages) >= _REPO_MAPPINGS_MEMO_SIZE:
+                self._packages.clear()
+            package = self._packages[repo_url] = repo_to_package(
+                repo_url, self._user_repo_mappings
+            )
+        else:
+            self._count(hit=True)
+        return package
+
+    def version_template(self, repo_url: str) -> str | None:
+        """Return :func:`repo_to_version_template` for *repo_url*."""
+        try:
+            version_template = self._version_templates[repo_url]
+        except KeyError:
+            self._count(hit=False)
+            if len(self._version_templates) >= _REPO_MAPPINGS_MEMO_SIZE:
+                self._version_templates.clear()
+            version_template = self._version_templates[repo_url] = (
+                repo_to_version_template(repo_url, self._user_version_mappings)
+            )
+        else:
+            self._count(hit=True)
+        return version_template
+
+
 def _repo_header_package(
     repo_url: str,
     uv_data: dict[str, str],
     skip_repos: set[str],
-    user_repo_mappings: dict[str, str] | None,
-    repo_changes: dict[str, bool | tuple[str, str]],
+    mappings: _RepoMappings,
+    repo_changes: dict[str, bool | tuple[str, str]] | None,
 ) -> str | None:
     """Resolve the package linked to a repo header.
 
-    Records unmanaged repos and packages absent from uv.lock in *repo_changes*.
+    Records unmanaged repos and packages absent from uv.lock in *repo_changes*,
+    unless it is ``None``.
 
     Returns:
         The package name to sync the repo's ``rev`` against, or ``None`` when
         the repo has no linked package in uv.lock.
     """
-    package = repo_to_package(repo_url, user_repo_mappings)
+    package = mappings.package(repo_url)
     if not package:
-        if repo_url not in skip_repos:
+        if repo_changes is not None and repo_url not in skip_repos:
             repo_changes[repo_url] = False
         return None
     if package not in uv_data:
-        repo_changes[package] = False
+        if repo_changes is not None:
+            repo_changes[package] = False
+        return None
     return package
 
 
-def process_config_text(
+def _target_rev(
+    current_version: str, version: str, version_template: str | None
+) -> str:
+    """Return the ``rev`` a repo should have for a locked package *version*.
+
+    Without a version template, a leading ``v`` in the current rev is preserved.
+    """
+    if version_template is None:
+        version_template = (
+            "v${version}"
+            if current_version and current_version[0] == "v"
+            else "${version}"
+        )
+    return version_template.replace("${version}", version)
+
+
+def _sync_rev(
+    current_version: str,
+    package: str,
+    version: str,
+    *,
+    version_template: str | None,
+    repo_changes: dict[str, bool | tuple[str, str]] | None,
+) -> str:
+    """Return the ``rev`` a repo at *current_version* should have.
+
+    The result is recorded in *repo_changes*, unless it is ``None``.
+    """
+    target_version = _target_rev(current_version, version, version_template)
+    if repo_changes is not None:
+        repo_changes[package] = current_version == target_version or (
+            current_version,
+            target_version,
+        )
+    return target_version
+
+
+def _sync_dependency(  # noqa: PLR0913
+    line: str,
+    line_number: int,
+    uv_data: dict[str, str],
+    *,
+    changes: Changes | None,
+    dep_errors: list[str],
+    stats: SyncStats | None,
+) -> str:
+    """Return a ``# sync-with-uv`` dependency line synced, or *line* if unchanged.
+
+    The change is recorded in *changes*, unless it is ``None``, and an invalid
+    line appends a message to *dep_errors*.
+    """
+    dep_result = sync_dependency_line(line, uv_data, stats)
+    if dep_result is None:
+        return line
+    if isinstance(dep_result, str):
+        dep_errors.append(f"line {line_number}: {dep_result}")
+        return line
+    line_fixed, dep_change = dep_result
+    if changes is not None:
+        changes.lines[line_number] = dep_change
+    return line_fixed if dep_change.changed else line
+
+
+def _count_lines(stats: SyncStats, n_lines: int, n_bytes: int) -> None:
+    """Count *n_lines* scanned lines, of *n_bytes* in total, in *stats*."""
+    stats.lines_scanned += n_lines
+    stats.bytes_processed += n_bytes
+
+
+def _as_text(line: str | bytes) -> str:
+    """Return *line*, decoded from UTF-8 if it is ``bytes``.
+
+    Invalid bytes are kept as surrogates, so :func:`_like` restores them.
+    """
+    return line.decode("utf-8", "surrogateescape") if isinstance(line, bytes) else line
+
+
+@overload
+def _like(line: str, text: str) -> str: ...
+
+
+@overload
+def _like(line: bytes, text: str) -> bytes: ...
+
+
+def _like(line: str | bytes, text: str) -> str | bytes:
+    """Return *text*, encoded to UTF-8 if *line* is ``bytes``."""
+    return text.encode("utf-8", "surrogateescape") if isinstance(line, bytes) else text
+
+
+# Characters of package names and versions, which an edit doesn't split.
+_WORD_CHARS = frozenset(string.ascii_letters + string.digits + "._-+!*")
+
+
+def _common_prefix_length(a: str, b: str) -> int:
+    """Return the length of the common start of *a* and *b*, not ending mid-word."""
+    length = min(len(a), len(b))
+    length = next((i for i in range(length) if a[i] != b[i]), length)
+    if a[length : length + 1] in _WORD_CHARS or b[length : length + 1] in _WORD_CHARS:
+        while length and a[length - 1] in _WORD_CHARS:
+            length -= 1
+    return length
+
+
+def _trimmed_edit(
+    offset: int, old: str, new: str, kind: PlanEditKind, package: str
+) -> PlanEdit:
+    """Return the edit of *old* at *offset* to *new*, without their common ends.
+
+    The ends are trimmed to whole words, so the edit of a dependency line spans
+    its versions rather than the digits that differ.
+    """
+    prefix = _common_prefix_length(old, new)
+    old_rest = old[prefix:]
+    new_rest = new[prefix:]
+    suffix = _common_prefix_length(old_rest[::-1], new_rest[::-1])
+    return PlanEdit(
+        offset + prefix,
+        old_rest[: len(old_rest) - suffix],
+        new_rest[: len(new_rest) - suffix],
+        kind,
+        package,
+    )
+
+
+class _TokenSync:
+    """Sync the tokens of a config in order, tracking the repo of each ``rev``."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        uv_data: dict[str, str],
+        *,
+        config_format: Literal["yaml", "toml"],
+        mappings: _RepoMappings,
+        changes: Changes | None,
+        dep_errors: list[str],
+        stats: SyncStats | None,
+        plan: list[PlanEdit] | None = None,
+    ) -> None:
+        self._uv_data = uv_data
+        self._skip_repos = _SKIP_REPOS[config_format]
+        self._mappings = mappings
+        self._repo_changes = changes.repos if changes is not None else None
+        self._line_changes = changes.lines if changes is not None else None
+        self._plan = plan
+        self._stats = stats
+        self._repo_url: str | None = None
+        self._package: str | None = None
+        self._sync_dependency_line = functools.partial(
+            _sync_dependency,
+            uv_data=uv_data,
+            changes=changes,
+            dep_errors=dep_errors,
+            stats=stats,
+        )
+
+    def apply(
+        self, token: Token, line: AnyStr, line_fixed: AnyStr, line_start: int
+    ) -> AnyStr:
+        """Return *line_fixed*, the *line* at *line_start*, with *token* synced.
+
+        The ``rev`` tokens of a line come in order, so earlier ones may already
+        be spliced into *line_fixed*. A line of ``bytes`` is only decoded when
+        it holds a dependency. Each edit is also appended to the plan, if any.
+        """
+        if token.kind == "repo":
+            if self._stats is not None:
+                self._stats.repo_headers += 1
+            self._repo_url = token.value
+            self._package = _repo_header_package(
+                token.value,
+                self._uv_data,
+                self._skip_repos,
+                self._mappings,
+                self._repo_changes,
+            )
+            return line_fixed
+        if token.kind == "dependency" or (
+            # the pragma on the rev of a repo that isn't synced has nothing to pin
+            not self._package
+            and _like(line, PRAGMA_TEXT) in line
+        ):
+            if isinstance(line, str):
+                line_fixed = self._sync_dependency_line(line, token.line_number)
+                if self._plan is not None and line_fixed is not line:
+                    assert self._line_changes is not None  # noqa: S101
+                    package = self._line_changes[token.line_number].package
+                    self._plan.append(
+                        _trimmed_edit(
+                            line_start, line, line_fixed, "dependency", package
+                        )
+                    )
+                return line_fixed
+            text = _as_text(line)
+            text_fixed = self._sync_dependency_line(text, token.line_number)
+            return line if text_fixed is text else _like(line, text_fixed)
+        if not self._package:
+            return line_fixed
+        assert self._repo_url is not None  # noqa: S101
+        target_version = _sync_rev(
+            token.value,
+            self._package,
+            self._uv_data[self._package],
+            version_template=self._mappings.version_template(self._repo_url),
+            repo_changes=self._repo_changes,
+        )
+        if target_version == token.value:
+            return line_fixed
+        if self._plan is not None:
+            self._plan.append(
+                PlanEdit(token.start, token.value, target_version, "rev", self._package)
+            )
+        shift = len(line_fixed) - len(line) - line_start
+        return (
+            line_fixed[: token.start + shift]
+            + _like(line_fixed, target_version)
+            + line_fixed[token.end + shift :]
+        )
+
+
+def sync_lines(  # noqa: PLR0913
+    lines: Iterable[AnyStr],
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None,
+    user_version_mappings: dict[str, str] | None,
+    changes: Changes | None,
+    dep_errors: list[str],
+    stats: SyncStats | None,
+    plan: list[PlanEdit] | None = None,
+    tokenizer: ConfigTokenizer | None = None,
+    token_batches: Iterable[list[Token]] | None = None,
+    mappings: _RepoMappings | None = None,
+    flush_batches: bool = False,
+) -> Iterator[tuple[int, AnyStr, AnyStr]]:
+    """Sync config lines; the engine behind :func:`process_config_text`.
+
+    The lines are read by a :class:`~sync_with_uv.tokenizer.ConfigTokenizer`,
+    in batches that spare a call per line but keep the early exit of
+    :func:`config_needs_sync` cheap, and each ``rev`` token of a synced repo is
+    spliced into its line by span.
+    Yields ``(line_number, line, fixed_line)`` for every line that holds a
+    token, where ``fixed_line`` is *line* itself when it is left unchanged; the
+    other lines are never changed. Results are recorded in *changes* (skipped
+    when it is ``None``), and each invalid ``# sync-with-uv`` line appends a
+    message to *dep_errors* before its line is yielded unchanged. The work done
+    is counted in *stats*, unless it is ``None``, up to the last yielded line.
+    The lines may be ``bytes``, see :func:`process_config_bytes`. With a
+    *plan* (and *changes*), the edits of ``str`` lines are also appended to it.
+    The lines are numbered from the *tokenizer*'s position, when it is given
+    (see :mod:`sync_with_uv.sharding`). The tokens of each batch may also be
+    given as *token_batches*, with the *mappings* that resolved their repos,
+    when the lines were scanned beforehand (see :func:`scan_config_bytes`).
+    With *flush_batches*, the last line of each batch is yielded too, even if
+    it holds no token, so that the lines read so far can be let go of (see
+    :func:`sync_config_stream`).
+    """
+    if tokenizer is None:
+        tokenizer = ConfigTokenizer(config_format)
+    if mappings is None:
+        mappings = _RepoMappings(user_repo_mappings, user_version_mappings, stats)
+    scanned_batches = iter(token_batches) if token_batches is not None else None
+    token_sync = _TokenSync(
+        uv_data,
+        config_format=config_format,
+        mappings=mappings,
+        changes=changes,
+        dep_errors=dep_errors,
+        stats=stats,
+        plan=plan,
+    )
+    line_iterator = iter(lines)
+    first_line_number = tokenizer.line_number + 1
+    first_line_start = tokenizer.offset
+    while batch := list(itertools.islice(line_iterator, _TOKENIZE_BATCH_LINES)):
+        tokens = (
+            tokenizer.feed_lines(batch)
+            if scanned_batches is None
+            else next(scanned_batches)
+        )
+        starts = list(itertools.accumulate(map(len, batch), initial=first_line_start))
+        counted = 0
+        line_number = 0
+        for line_number, line_tokens in itertools.groupby(
+            tokens, key=operator.attrgetter("line_number")
+        ):
+            index = line_number - first_line_number
+            line = line_fixed = batch[index]
+            for token in line_tokens:
+                line_fixed = token_sync.apply(token, line, line_fixed, starts[index])
+            if stats is not None:
+                _count_lines(
+                    stats, index + 1 - counted, starts[index + 1] - starts[counted]
+                )
+                counted = index + 1
+            yield line_number, line, line_fixed
+        if stats is not None:
+            _count_lines(stats, len(batch) - counted, starts[-1] - starts[counted])
+        first_line_number += len(batch)
+        first_line_start = starts[-1]
+        if flush_batches and line_number != first_line_number - 1:
+            yield first_line_number - 1, batch[-1], batch[-1]
+
+
+def raise_dep_errors(dep_errors: list[str]) -> None:
+    """Raise the :class:`ValueError` of the invalid pragma lines, if there are any.
+
+    *dep_errors* holds a message per line, as :func:`sync_lines` appends them.
+    """
+    if dep_errors:
+        msg = "invalid '# sync-with-uv' dependencies:\n  " + "\n  ".join(dep_errors)
+        raise ValueError(msg)
+
+
+def process_config_text(  # noqa: PLR0913
     config_text: str,
     uv_data: dict[str, str],
     *,
     config_format: Literal["yaml", "toml"],
     user_repo_mappings: dict[str, str] | None = None,
     user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
 ) -> tuple[str, Changes]:
     """Process config text and sync versions with uv.lock.
 
@@ -96,6 +635,10 @@ def process_config_text(
             or "toml" for prek.toml.
         user_repo_mappings: Optional user repo-to-package mappings.
         user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp (see :mod:`sync_with_uv.stamp`) to write or
+            update in the config.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count the work
+            done in. Nothing is counted without it.
 
     Returns:
         Tuple of (updated_config_text, changes), where ``changes`` is a
@@ -108,64 +651,647 @@ def process_config_text(
         ValueError: If a ``# sync-with-uv`` line has no dependency to sync, or
             its package is not present in uv.lock.
     """
-    repo_header_re = {
-        "yaml": re.compile(r"^\s*-\s*repo\s*:\s*(?P<repo_url>\S*).*$"),
-        "toml": re.compile(r"""^\s*repo\s*=\s*(['"])(?P<repo_url>[^'"]*)\1.*$"""),
-    }[config_format]
-    repo_rev_re = {
-        "yaml": re.compile(r"^\s*rev\s*:\s*(?P<repo_rev>\S*).*$"),
-        "toml": re.compile(r"""^\s*rev\s*=\s*(['"])(?P<repo_rev>[^'"]*)\1.*$"""),
-    }[config_format]
-    skip_repos = {
-        "yaml": {"local", "meta"},
-        "toml": {"local", "meta", "builtin"},
-    }[config_format]
     lines = config_text.splitlines(keepends=True)
-    new_lines: list[str] = []
-    repo_url: str | None = None
-    package: str | None = None
-    repo_changes: dict[str, bool | tuple[str, str]] = {}
-    dep_changes: dict[int, DepLineChange] = {}
+    edits, changes = sync_config_lines(
+        lines,
+        uv_data,
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        user_version_mappings=user_version_mappings,
+        stamp=stamp,
+        stats=stats,
+    )
+    return apply_line_edits(lines, edits), changes
+
+
+def process_config_bytes(  # noqa: PLR0913
+    config_bytes: bytes,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+    byte_edits: list[ByteEdit] | None = None,
+) -> tuple[bytes, Changes]:
+    r"""Like :func:`process_config_text`, but on the raw bytes of a config.
+
+    The config is never decoded as a whole: only the lines holding a
+    ``# sync-with-uv`` dependency are decoded (as UTF-8, keeping any invalid
+    bytes as they are), and the untouched runs of lines are copied to the output
+    as slices of the input. A config that is not valid UTF-8 is thus synced
+    rather than rejected, and its other bytes are kept exactly.
+
+    Lines are split at ``\n``, ``\r`` and ``\r\n`` only, as
+    :meth:`bytes.splitlines` does, so the line numbers in the returned changes
+    differ from :func:`process_config_text`'s for a config holding another
+    Unicode line break, such as a form feed.
+
+    Each rewritten or inserted line is also appended to *byte_edits*, if given,
+    in order, so that the config can be patched rather than rewritten (see
+    :func:`~sync_with_uv.in_place.write_in_place`).
+
+    Raises:
+        ValueError: As :func:`process_config_text`.
+    """
+    lines = config_bytes.splitlines(keepends=True)
+    changes = Changes({}, {})
     dep_errors: list[str] = []
-    for line_number, line in enumerate(lines, start=1):
-        if repo_header := repo_header_re.match(line):
-            repo_url = repo_header.group("repo_url")
-            package = _repo_header_package(
-                repo_url, uv_data, skip_repos, user_repo_mappings, repo_changes
-            )
-        elif package and package in uv_data and (repo_rev := repo_rev_re.match(line)):
-            assert repo_url is not None  # noqa: S101
-            version_template = repo_to_version_template(repo_url, user_version_mappings)
-            current_version = repo_rev.group("repo_rev")
-            if version_template is None:
-                version_template = (
-                    "v${version}"
-                    if current_version and current_version[0] == "v"
-                    else "${version}"
-                )
-            target_version = version_template.replace("${version}", uv_data[package])
-            line_fixed = (
-                line[: repo_rev.start("repo_rev")]
-                + target_version
-                + line[repo_rev.end("repo_rev") :]
+    # (line number, whether the line is replaced rather than inserted, new line)
+    edits = [
+        (line_number, True, line_fixed)
+        for line_number, line, line_fixed in sync_lines(
+            lines,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+            changes=changes,
+            dep_errors=dep_errors,
+            stats=stats,
+        )
+        if line_fixed is not line
+    ]
+    raise_dep_errors(dep_errors)
+    return (
+        apply_byte_edits(
+            config_bytes, lines, edits, stamp=stamp, byte_edits=byte_edits
+        ),
+        changes,
+    )
+
+
+class ScannedConfig(NamedTuple):
+    """A config read and tokenized without uv.lock, see :func:`scan_config_bytes`.
+
+    ``token_batches`` holds the tokens of each batch of ``lines``, and
+    ``packages`` the package of each repo URL, or ``None`` when it has none.
+    """
+
+    config_bytes: bytes
+    lines: list[bytes]
+    token_batches: list[list[Token]]
+    packages: dict[str, str | None]
+    config_format: Literal["yaml", "toml"]
+    user_repo_mappings: dict[str, str] | None
+    user_version_mappings: dict[str, str] | None
+
+
+def scan_config_bytes(
+    config_bytes: bytes,
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+) -> ScannedConfig:
+    """Split and tokenize a config, and resolve the packages of its repos.
+
+    None of this needs uv.lock, so it can be done while uv.lock is loaded (see
+    :mod:`sync_with_uv.pipeline`), before :func:`process_scanned_config` syncs
+    the config against it.
+    """
+    lines = config_bytes.splitlines(keepends=True)
+    tokenizer = ConfigTokenizer(config_format)
+    token_batches = [
+        tokenizer.feed_lines(lines[start : start + _TOKENIZE_BATCH_LINES])
+        for start in range(0, len(lines), _TOKENIZE_BATCH_LINES)
+    ]
+    packages = {
+        token.value: repo_to_package(token.value, user_repo_mappings)
+        for tokens in token_batches
+        for token in tokens
+        if token.kind == "repo"
+    }
+    return ScannedConfig(
+        config_bytes,
+        lines,
+        token_batches,
+        packages,
+        config_format,
+        user_repo_mappings,
+        user_version_mappings,
+    )
+
+
+def process_scanned_config(
+    scanned: ScannedConfig,
+    uv_data: dict[str, str],
+    *,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+    byte_edits: list[ByteEdit] | None = None,
+) -> tuple[bytes, Changes]:
+    """Like :func:`process_config_bytes`, on a config scanned beforehand.
+
+    The result is that of :func:`process_config_bytes` on the config, except
+    that the package lookups of the repos, resolved by the scan, are counted as
+    mapping cache hits in *stats*.
+
+    Raises:
+        ValueError: As :func:`process_config_text`.
+    """
+    changes = Changes({}, {})
+    dep_errors: list[str] = []
+    edits = [
+        (line_number, True, line_fixed)
+        for line_number, line, line_fixed in sync_lines(
+            scanned.lines,
+            uv_data,
+            config_format=scanned.config_format,
+            user_repo_mappings=scanned.user_repo_mappings,
+            user_version_mappings=scanned.user_version_mappings,
+            changes=changes,
+            dep_errors=dep_errors,
+            stats=stats,
+            token_batches=scanned.token_batches,
+            mappings=_RepoMappings(
+                scanned.user_repo_mappings,
+                scanned.user_version_mappings,
+                stats,
+                scanned.packages,
+            ),
+        )
+        if line_fixed is not line
+    ]
+    raise_dep_errors(dep_errors)
+    return (
+        apply_byte_edits(
+            scanned.config_bytes,
+            scanned.lines,
+            edits,
+            stamp=stamp,
+            byte_edits=byte_edits,
+        ),
+        changes,
+    )
+
+
+def apply_byte_edits(
+    config_bytes: bytes,
+    lines: list[bytes],
+    edits: list[tuple[int, bool, bytes]],
+    *,
+    stamp: str | None,
+    byte_edits: list[ByteEdit] | None,
+) -> bytes:
+    """Return the config *lines* of *config_bytes* with *edits* applied.
+
+    Each edit is a (line number, whether the line is replaced rather than
+    inserted, new line) tuple, in order; the edit of the *stamp* is added to
+    them. The untouched runs of lines are copied as slices of *config_bytes*.
+    """
+    head = [_as_text(line) for line in lines[:STAMP_SEARCH_LINES]]
+    if stamp is not None and (stamp_edit := stamp_line_edit(head, stamp)):
+        stamp_number, old_line, new_line = stamp_edit
+        edits.append((stamp_number, bool(old_line), _like(b"", new_line)))
+        edits.sort(key=operator.itemgetter(0, 1))
+    if not edits:
+        return config_bytes
+    view = memoryview(config_bytes)
+    fixed = bytearray()
+    position = 0  # the index of the next line to copy
+    offset = 0  # and its offset in the config
+    for line_number, replaces, line_fixed in edits:
+        index = line_number - 1
+        end = offset + sum(map(len, lines[position:index]))
+        fixed += view[offset:end]
+        fixed += line_fixed
+        if byte_edits is not None:
+            replaced = lines[index] if replaces else b""
+            byte_edits.append(ByteEdit(end, replaced, line_fixed))
+        position = index + 1 if replaces else index
+        offset = end + len(lines[index]) if replaces else end
+    fixed += view[offset:]
+    return bytes(fixed)
+
+
+def sync_config_lines(  # noqa: PLR0913
+    lines: list[str],
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+) -> tuple[list[LineEdit], Changes]:
+    """Like :func:`process_config_text`, but return the line edits to apply.
+
+    Since every edit is known, callers can render a diff or patch the file
+    without comparing the old and new texts.
+
+    Args:
+        lines: Config lines, with their line endings.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in.
+
+    Returns:
+        Tuple of (edits, changes), where ``edits`` is a list of
+        :class:`LineEdit` sorted by line number (see :func:`apply_line_edits`),
+        and ``changes`` is as in :func:`process_config_text`.
+
+    Raises:
+        ValueError: If a ``# sync-with-uv`` line has no dependency to sync, or
+            its package is not present in uv.lock.
+    """
+    changes = Changes({}, {})
+    dep_errors: list[str] = []
+    edits = [
+        LineEdit(line_number, line, line_fixed)
+        for line_number, line, line_fixed in sync_lines(
+            lines,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+            changes=changes,
+            dep_errors=dep_errors,
+            stats=stats,
+        )
+        if line_fixed is not line
+    ]
+    raise_dep_errors(dep_errors)
+    return with_stamp_edit(lines, edits, stamp), changes
+
+
+def with_stamp_edit(
+    lines: list[str], edits: list[LineEdit], stamp: str | None
+) -> list[LineEdit]:
+    """Return the *edits* of config *lines*, with the edit of the *stamp* added."""
+    if stamp is not None and (stamp_edit := stamp_line_edit(lines, stamp)):
+        # the stamp is a comment, so it never shares a line with another edit
+        edits.append(LineEdit(*stamp_edit))
+        edits.sort(key=lambda edit: (edit.line_number, edit.old_line != ""))
+    return edits
+
+
+def apply_line_edits(lines: list[str], edits: Iterable[LineEdit]) -> str:
+    """Return the text of config *lines* with *edits* (sorted by line) applied."""
+    chunks: list[str] = []
+    position = 0
+    for edit in edits:
+        index = edit.line_number - 1
+        chunks.extend(lines[position:index])
+        chunks.append(edit.new_line)
+        position = index + 1 if edit.old_line else index
+    chunks.extend(lines[position:])
+    return "".join(chunks)
+
+
+def plan_config_sync(  # noqa: PLR0913
+    config_text: str,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    changes: Changes | None = None,
+    stats: SyncStats | None = None,
+) -> list[PlanEdit]:
+    """Plan the sync of a config, to be applied later with :func:`apply_plan`.
+
+    The plan holds only the spans that change: each ``rev`` value, the part of
+    each dependency line between its unchanged start and end (such as the
+    version specifier), and the sync stamp. It is a list of tuples of plain
+    values, so it can be pickled, or serialized with :func:`dump_plan`, and
+    applied where the config lives.
+
+    Args:
+        config_text: Raw config file content.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+        changes: Optional :class:`Changes` to record the results in, as
+            :func:`process_config_text` returns them.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in.
+
+    Returns:
+        The edits, sorted by offset; empty when the config is already synced.
+
+    Raises:
+        ValueError: If a ``# sync-with-uv`` line has no dependency to sync, or
+            its package is not present in uv.lock.
+    """
+    lines = config_text.splitlines(keepends=True)
+    dep_errors: list[str] = []
+    plan: list[PlanEdit] = []
+    collections.deque(
+        sync_lines(
+            lines,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+            changes=Changes({}, {}) if changes is None else changes,
+            dep_errors=dep_errors,
+            stats=stats,
+            plan=plan,
+        ),
+        maxlen=0,
+    )
+    raise_dep_errors(dep_errors)
+    if stamp is not None and (stamp_edit := stamp_line_edit(lines, stamp)):
+        line_number, old_line, new_line = stamp_edit
+        offset = sum(map(len, lines[: line_number - 1]))
+        bisect.insort(
+            plan,
+            _trimmed_edit(offset, old_line, new_line, "stamp", ""),
+            key=operator.attrgetter("offset"),
+        )
+    return plan
+
+
+def apply_plan(config_text: str, plan: Iterable[PlanEdit]) -> str:
+    """Return *config_text* with the edits of *plan* applied.
+
+    Raises:
+        ValueError: If the plan was not made for this config: an edit's old text
+            is not at its offset, or the edits are out of order.
+    """
+    chunks: list[str] = []
+    position = 0
+    for edit in plan:
+        end = edit.offset + len(edit.old)
+        if edit.offset < position or config_text[edit.offset : end] != edit.old:
+            msg = f"the plan does not match the config at offset {edit.offset}"
+            raise ValueError(msg)
+        chunks.append(config_text[position : edit.offset])
+        chunks.append(edit.new)
+        position = end
+    chunks.append(config_text[position:])
+    return "".join(chunks)
+
+
+def dump_plan(plan: Iterable[PlanEdit]) -> str:
+    """Serialize a plan to JSON, one array per edit."""
+    return json.dumps(list(plan), ensure_ascii=False, separators=(",", ":"))
+
+
+def load_plan(data: str) -> list[PlanEdit]:
+    """Deserialize a plan produced by :func:`dump_plan`.
+
+    Raises:
+        ValueError: If *data* is not a serialized plan.
+    """
+    try:
+        items = json.loads(data)
+    except ValueError as e:
+        msg = "invalid plan"
+        raise ValueError(msg) from e
+    if not isinstance(items, list):
+        msg = "invalid plan"
+        raise ValueError(msg)  # noqa: TRY004
+    plan = []
+    for item in items:
+        match item:
+            case [
+                int(offset),
+                str(old),
+                str(new),
+                "rev" | "dependency" | "stamp" as kind,
+                str(package),
+            ] if offset >= 0 and not isinstance(offset, bool):
+                plan.append(PlanEdit(offset, old, new, kind, package))
+            case _:
+                msg = f"invalid plan edit: {item!r}"
+                raise ValueError(msg)
+    return plan
+
+
+def config_needs_sync(  # noqa: PLR0913
+    config_text: str,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    stats: SyncStats | None = None,
+) -> bool:
+    """Return whether :func:`process_config_text` would change the config.
+
+    A cheaper check-only path: it stops at the first ``rev`` or dependency line
+    that differs, without building the output text or a :class:`Changes`.
+    Because of that, an invalid ``# sync-with-uv`` line is only reported when it
+    comes before the first difference.
+
+    Args:
+        config_text: Raw config file content.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp; a config whose stamp differs needs a sync.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in; only
+            the lines up to the first difference are scanned.
+
+    Raises:
+        ValueError: If a ``# sync-with-uv`` line before the first difference has
+            no dependency to sync, or its package is not present in uv.lock.
+    """
+    lines = config_text.splitlines(keepends=True)
+    if stamp is not None and read_stamp(lines) != stamp:
+        return True
+    dep_errors: list[str] = []
+    for _, line, line_fixed in sync_lines(
+        lines,
+        uv_data,
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        user_version_mappings=user_version_mappings,
+        changes=None,
+        dep_errors=dep_errors,
+        stats=stats,
+    ):
+        raise_dep_errors(dep_errors)
+        if line_fixed is not line:
+            return True
+    return False
+
+
+def _split_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield the lines of text read in *chunks*, as ``str.splitlines`` would.
+
+    Each chunk must end at a line break (or the end of the text), as the lines
+    of a file opened with ``newline=""`` do.
+    """
+    for chunk in chunks:
+        yield from chunk.splitlines(keepends=True)
+
+
+def sync_config_stream(  # noqa: PLR0913
+    source: Iterable[str],
+    write: Callable[[str], object] | None,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    changes: Changes | None = None,
+    stats: SyncStats | None = None,
+) -> bool:
+    """Like :func:`process_config_text`, but stream the config line by line.
+
+    The config is read from *source* (such as a file opened with
+    ``newline=""``) as the sync goes, and every line of the updated config is
+    passed to *write* once its batch of lines is synced, so only about a batch
+    of lines is held in memory at a time, whatever the size of the config.
+
+    Args:
+        source: The config text, in chunks that end at line breaks.
+        write: Called with each line of the updated config, in order, or
+            ``None`` to only find out whether the config would change.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+        changes: Optional :class:`Changes` to record the results in, as
+            :func:`process_config_text` returns them. It grows with the number
+            of repos and ``# sync-with-uv`` lines.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in.
+
+    Returns:
+        Whether the updated config differs from the original.
+
+    Raises:
+        ValueError: If a ``# sync-with-uv`` line has no dependency to sync, or
+            its package is not present in uv.lock. It is raised once the whole
+            updated config has been written, with these lines left unchanged.
+    """
+    write = write or _discard
+    lines = _split_lines(source)
+    head = list(itertools.islice(lines, STAMP_SEARCH_LINES))
+    fixed_lines = {}
+    changed = False
+    if stamp is not None and (stamp_edit := stamp_line_edit(head, stamp)):
+        line_number, old_line, new_line = stamp_edit
+        changed = True
+        if old_line:
+            fixed_lines[line_number] = new_line
+        else:
+            write(new_line)
+    # the lines read by the engine and not written yet, from line_number on
+    pending: collections.deque[str] = collections.deque()
+    line_number = 1
+    dep_errors: list[str] = []
+    synced = sync_lines(
+        _read_into(pending, itertools.chain(head, lines)),
+        uv_data,
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        user_version_mappings=user_version_mappings,
+        changes=changes,
+        dep_errors=dep_errors,
+        stats=stats,
+        flush_batches=True,
+    )
+    for synced_line_number, line, line_fixed in synced:
+        if line_fixed is not line:
+            fixed_lines[synced_line_number] = line_fixed
+            changed = True
+        while line_number <= synced_line_number:
+            write(fixed_lines.pop(line_number, pending.popleft()))
+            line_number += 1
+    while pending:
+        write(fixed_lines.pop(line_number, pending.popleft()))
+        line_number += 1
+    raise_dep_errors(dep_errors)
+    return changed
+
+
+def _discard(_line: str) -> None:
+    """Write nothing, for a :func:`sync_config_stream` without *write*."""
+
+
+def _read_into(pending: collections.deque[str], lines: Iterable[str]) -> Iterator[str]:
+    """Yield *lines*, appending each one to *pending* first."""
+    for line in lines:
+        pending.append(line)
+        yield line
+
+
+def sync_config_file(  # noqa: PLR0913
+    config_path: Path,
+    uv_data: dict[str, str],
+    *,
+    config_format: Literal["yaml", "toml"],
+    user_repo_mappings: dict[str, str] | None = None,
+    user_version_mappings: dict[str, str] | None = None,
+    stamp: str | None = None,
+    check: bool = False,
+    changes: Changes | None = None,
+    stats: SyncStats | None = None,
+) -> bool:
+    """Sync a config file in place with :func:`sync_config_stream`.
+
+    The updated config is streamed to a temporary file in the same directory,
+    which then atomically replaces the config, so memory use does not depend on
+    the size of the config, and a failed sync leaves the config untouched. The
+    config is not replaced when nothing changed, or with *check*, which only
+    streams the config to find out whether it would change.
+
+    Args:
+        config_path: Path to the config file.
+        uv_data: Package name to version mapping from uv.lock.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        user_repo_mappings: Optional user repo-to-package mappings.
+        user_version_mappings: Optional user repo-to-version-template mappings.
+        stamp: Optional sync stamp to write or update in the config.
+        check: Don't write the updated config.
+        changes: Optional :class:`Changes` to record the results in.
+        stats: Optional :class:`~sync_with_uv.stats.SyncStats` to count in.
+
+    Returns:
+        Whether the updated config differs from the original.
+
+    Raises:
+        ValueError: If a ``# sync-with-uv`` line has no dependency to sync, or
+            its package is not present in uv.lock.
+    """
+    with contextlib.ExitStack() as stack:
+        source = stack.enter_context(config_path.open(encoding="utf-8", newline=""))
+        write = None
+        tmp_path = target = None
+        if not check:
+            fd, tmp_name = tempfile.mkstemp(
+                dir=config_path.parent, prefix=f".{config_path.name}.", suffix=".tmp"
             )
-            new_lines.append(line_fixed)
-            repo_changes[package] = current_version == target_version or (
-                current_version,
-                target_version,
+            tmp_path = Path(tmp_name)
+            stack.callback(tmp_path.unlink, missing_ok=True)
+            target = stack.enter_context(
+                os.fdopen(fd, "w", encoding="utf-8", newline="")
             )
-            continue  # don't add the line twice
-        elif (dep_result := sync_dependency_line(line, uv_data)) is not None:
-            if isinstance(dep_result, str):
-                dep_errors.append(f"line {line_number}: {dep_result}")
-                new_lines.append(line)
-            else:
-                line_fixed, dep_changes[line_number] = dep_result
-                new_lines.append(line_fixed)
-            continue  # don't add the line twice
-        new_lines.append(line)
-
-    if dep_errors:
-        msg = "invalid '# sync-with-uv' dependencies:\n  " + "\n  ".join(dep_errors)
-        raise ValueError(msg)
-    return "".join(new_lines), Changes(repo_changes, dep_changes)
+            write = target.write
+        changed = sync_config_stream(
+            source,
+            write,
+            uv_data,
+            config_format=config_format,
+            user_repo_mappings=user_repo_mappings,
+            user_version_mappings=user_version_mappings,
+            stamp=stamp,
+            changes=changes,
+            stats=stats,
+        )
+        if target is not None and tmp_path is not None and changed:
+            target.close()
+            # Windows can't replace a file that is still open
+            source.close()
+            shutil.copymode(config_path, tmp_path)
+            tmp_path.replace(config_path)
+    return changed
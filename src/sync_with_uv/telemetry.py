@@ -0,0 +1,206 @@
+"""Local JSON Lines telemetry of sync runs, and its aggregation.
+
+With ``--telemetry-log``, every run appends one record to a local file: the
+wall and CPU time of each phase, the size of uv.lock and of the config, the
+number of locked packages and the cache outcome. Nothing is sent anywhere;
+the files can be collected from many machines and summarized with
+``sync-with-uv stats``.
+"""
+
+import json
+import math
+import time
+from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TypedDict
+
+from . import __version__
+from .profiling import BACKGROUND_SUFFIX, PhaseTiming
+
+# The version of the record layout, bumped on incompatible changes.
+RECORD_VERSION = 1
+# Percentiles reported by :func:`summarize`.
+PERCENTILES = (50, 90, 95, 99)
+
+
+class TelemetryRecord(TypedDict):
+    """One line of a telemetry log.
+
+    ``phases`` maps each phase name to its ``[wall_ms, cpu_ms]``, with
+    :data:`~sync_with_uv.profiling.BACKGROUND_SUFFIX` appended to the name of a
+    phase run in the background; ``cache`` is as in :class:`RunInfo`.
+    """
+
+    v: int
+    time: float
+    tool: str
+    exit: int
+    phases: dict[str, list[float]]
+    lock_bytes: int | None
+    config_bytes: int | None
+    packages: int | None
+    cache: str
+
+
+@dataclass(slots=True)
+class RunInfo:
+    """Facts about a run gathered along the way, for its telemetry record.
+
+    ``cache`` is ``"off"`` without a result cache, ``"hit"`` or ``"miss"``
+    when one was consulted, ``"bypassed"`` when the run did not use it (such
+    as with ``--diff``), and ``"stamp"`` when a matching sync stamp ended the
+    run before the config was processed.
+    """
+
+    lock_bytes: int | None = None
+    config_bytes: int | None = None
+    packages: int | None = None
+    cache: str = "off"
+
+
+def make_record(
+    phases: Iterable[PhaseTiming], info: RunInfo, exit_code: int
+) -> TelemetryRecord:
+    """Return the telemetry record of a run, ready for :func:`append_record`."""
+    return TelemetryRecord(
+        v=RECORD_VERSION,
+        time=round(time.time(), 3),
+        tool=__version__,
+        exit=exit_code,
+        phases={
+            timing.label: [
+                round(timing.wall_ns / 1e6, 3),
+                round(timing.cpu_ns / 1e6, 3),
+            ]
+            for timing in phases
+        },
+        lock_bytes=info.lock_bytes,
+        config_bytes=info.config_bytes,
+        packages=info.packages,
+        cache=info.cache,
+    )
+
+
+def append_record(path: Path, record: TelemetryRecord) -> None:
+    """Append *record* to the JSON Lines file *path*.
+
+    The record is written with a single ``write`` to a file opened in append
+    mode, so concurrent runs logging to the same file don't interleave lines.
+    """
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as f:
+        f.write(line)
+
+
+def _parse_record(line: str) -> TelemetryRecord:
+    """Parse a log line, normalizing the fields :func:`summarize` uses.
+
+    Raises:
+        ValueError: If the line is not JSON or has another layout version.
+        TypeError: If a field has the wrong type.
+    """
+    record: TelemetryRecord = json.loads(line)
+    if record["v"] != RECORD_VERSION:
+        msg = f"unknown record version {record['v']!r}"
+        raise ValueError(msg)
+    record["phases"] = {
+        str(name): [float(wall), float(cpu)]
+        for name, (wall, cpu) in record["phases"].items()
+    }
+    record["cache"] = str(record["cache"])
+    return record
+
+
+def read_records(paths: Iterable[Path]) -> Iterator[TelemetryRecord]:
+    """Yield the records of telemetry log files.
+
+    Lines that are not valid records (such as a line truncated by a crash) are
+    skipped, as are records of an unknown layout version.
+    """
+    for path in paths:
+        with path.open(encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = _parse_record(line)
+                except (AttributeError, KeyError, TypeError, ValueError):
+                    continue
+                yield record
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Return the *q*-th percentile of non-empty *sorted_values*.
+
+    Values are linearly interpolated between the closest ranks, which is the
+    default method of NumPy.
+
+    >>> percentile([1.0, 2.0, 3.0, 4.0], 50)
+    2.5
+    """
+    position = (len(sorted_values) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (
+        position - low
+    )
+
+
+def _format_row(name: str, values: list[float]) -> tuple[str, ...]:
+    values.sort()
+    return (
+        name,
+        str(len(values)),
+        *(f"{percentile(values, q):.3f}" for q in PERCENTILES),
+        f"{values[-1]:.3f}",
+    )
+
+
+def summarize(records: Iterable[TelemetryRecord]) -> str:
+    """Return a table of the percentiles of the wall time of each phase.
+
+    Phases are listed in the order they first appear, followed by the total
+    wall time of each run, which leaves out the phases run in the background.
+    The cache outcomes are counted below the table.
+    """
+    wall_ms: dict[str, list[float]] = {}
+    totals: list[float] = []
+    cache_outcomes: Counter[str] = Counter()
+    for record in records:
+        phases = record["phases"]
+        for name, (wall, _cpu) in phases.items():
+            wall_ms.setdefault(name, []).append(wall)
+        totals.append(
+            sum(
+                wall
+                for name, (wall, _cpu) in phases.items()
+                if not name.endswith(BACKGROUND_SUFFIX)
+            )
+        )
+        cache_outcomes[record["cache"]] += 1
+    if not totals:
+        return "No runs recorded."
+    rows = [
+        ("phase", "runs", *(f"p{q}" for q in PERCENTILES), "max"),
+        *(_format_row(name, values) for name, values in wall_ms.items()),
+        _format_row("total", totals),
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+    lines = [
+        " ".join(
+            [row[0].ljust(widths[0])]
+            + [
+                cell.rjust(width)
+                for cell, width in zip(row[1:], widths[1:], strict=True)
+            ]
+        )
+        for row in rows
+    ]
+    lines.append("")
+    lines.append("wall times in ms")
+    lines.append(
+        "cache: "
+        + ", ".join(f"{outcome}={n}" for outcome, n in sorted(cache_outcomes.items()))
+    )
+    return "\n".join(lines)
@@ -0,0 +1,551 @@
+"""A structural, single-pass tokenizer of pre-commit YAML and prek TOML configs.
+
+The sync only needs a few entries of a config: the URL and ``rev`` of each
+repo, and the lines carrying a ``# sync-with-uv`` pragma. Rather than parsing
+the whole document into an object tree, :class:`ConfigTokenizer` reads the
+config line by line and emits a :class:`Token` for each such entry, with its
+span in the text, so that edits can be spliced in place.
+
+It knows just enough of each format to find the entries in block style
+(``- repo: ...``, ``repo = "..."``) as well as in YAML flow mappings
+(``- {repo: ..., rev: ...}``) and TOML inline tables
+(``repos = [{ repo = "...", rev = "..." }]``), and to skip quoted strings,
+comments, YAML block scalars and TOML multi-line strings. Each line is scanned
+once by a regex that jumps from one structural character to the next, so the
+time is linear in the size of the config.
+
+A ``rev`` belongs to the ``repo`` before it. In block style the ``repo`` key
+must come first, as the line-based sync always required; within a flow mapping
+or inline table on a single line, the keys may come in any order.
+"""
+
+import bisect
+import itertools
+import operator
+import re
+from collections.abc import Iterable, Iterator, Sequence
+from typing import AnyStr, Literal, NamedTuple
+
+from sync_with_uv.dependency_line import PRAGMA_TEXT
+
+TokenKind = Literal["repo", "rev", "dependency"]
+
+# YAML whitespace is only spaces, tabs and line breaks, so ``\s`` is matched with
+# re.ASCII; this also keeps the non-ASCII bytes of a latin-1 view apart.
+# A repo or rev key, matched where a key may start: at the start of a line
+# (after YAML ``- `` sequence markers) or after ``{`` or ``,`` in a mapping.
+_KEY_RE = {
+    "yaml": re.compile(
+        r"[ \t]*(?:-[ \t]+)*(?P<name>repo|rev)[ \t]*:(?=\s|$)", re.ASCII
+    ),
+    "toml": re.compile(
+        r"""[ \t]*(?P<quoted>["']?)(?P<name>repo|rev)(?P=quoted)[ \t]*="""
+    ),
+}
+_FLOW_KEY_RE = {
+    "yaml": re.compile(r"[ \t]*(?P<name>repo|rev)[ \t]*:(?=\s|$)", re.ASCII),
+    "toml": _KEY_RE["toml"],
+}
+# Skip the text of a line that doesn't change its structure: plain text, whole
+# quoted strings and comments. The skip stops at a flow bracket, a string that
+# doesn't end on the line (or a TOML multi-line string), and depending on where
+# the line is, at a YAML block scalar indicator in block style, or at the ``,``
+# before the next key in a flow mapping. Flow sequences of plain items, like
+# TOML table headers, are skipped whole. In YAML, a quote only starts a string
+# at the start of a scalar, and ``#`` only starts a comment after a space.
+_FLAT_SEQUENCE = r"""|\[\[[^\[\]{}"'\#]*\]\]|\[[^\[\]{}"'\#]*\]"""
+_YAML_SKIP_TAIL = _FLAT_SEQUENCE + (
+    r"""|(?<![^\s\[{,:])"(?:[^"\\]|\\.)*"|(?<![^\s\[{,:])'(?:[^']|'')*'"""
+    r"""|(?<=[^\s\[{,:])["']|(?<=\S)\#|(?<!\S)\#.*)*"""
+)
+_TOML_SKIP_TAIL = _FLAT_SEQUENCE + r"""|"(?!"")(?:[^"\\]|\\.)*"|'(?!'')[^']*'|\#.*)*"""
+_SKIP_RE = {
+    "yaml": {
+        "": re.compile(
+            r"""(?:[^\[\]{}"'\#|>]+|(?<=\S)[|>]|[|>](?![-+0-9]*[ \t]*(?:\#|$))"""
+            + _YAML_SKIP_TAIL,
+            re.ASCII,
+        ),
+        "[": re.compile(r"""(?:[^\[\]{}"'\#]+""" + _YAML_SKIP_TAIL, re.ASCII),
+        "{": re.compile(r"""(?:[^\[\]{}"'\#,]+""" + _YAML_SKIP_TAIL, re.ASCII),
+    },
+    "toml": {
+        "": re.compile(r"""(?:[^\[\]{}"'\#]+""" + _TOML_SKIP_TAIL),
+        "[": re.compile(r"""(?:[^\[\]{}"'\#]+""" + _TOML_SKIP_TAIL),
+        "{": re.compile(r"""(?:[^\[\]{}"'\#,]+""" + _TOML_SKIP_TAIL),
+    },
+}
+# Text a line contains when it may open or close a flow collection, a YAML block
+# scalar or a TOML multi-line string, and so change the structure.
+_RESTRUCTURING_NEEDLES = {
+    "yaml": ("[", "]", "{", "}", " |", " >", "\t"),
+    "toml": ("[", "]", "{", "}", '"""', "'''"),
+}
+# Text a line in block style must contain to hold a token or change the
+# structure: a key, the pragma, or a restructuring needle.
+# The restructuring needles come last, to override the others in the candidates.
+_NEEDLES = {
+    config_format: ("rev", "repo", PRAGMA_TEXT, *needles)
+    for config_format, needles in _RESTRUCTURING_NEEDLES.items()
+}
+# The text of a line before a YAML value in block style: sequence entry markers,
+# a mapping key, and node properties. A flow collection only starts there; past
+# it, a bracket is part of a plain scalar.
+_YAML_VALUE_START_RE = re.compile(
+    r"[ \t]*(?:[-?][ \t]+)*(?:[^#]*?:[ \t]+)?(?:[&!][^ \t]*[ \t]+)*", re.ASCII
+)
+# A YAML block sequence entry or block mapping key at the start of a line. Inside
+# a flow collection, such a line is only valid if it is indented more than the
+# line that opened the collection: past it, the collection was never closed.
+_YAML_BLOCK_ENTRY_RE = re.compile(
+    r"(?P<indent> *)(?:-(?:[ \t]|$)|[\w.][^#]*?:(?:[ \t]|$))", re.ASCII
+)
+# The rest of a line after a YAML block scalar indicator.
+_YAML_BLOCK_INDICATOR_RE = re.compile(r"[|>][-+0-9]*[ \t]*(?:#.*)?")
+# The value of a key: a quoted string (its content is the value), or a plain
+# scalar, which in a flow collection ends at a flow indicator.
+_YAML_QUOTED_VALUE_RE = re.compile(
+    r"""[ \t]*(?:"(?P<double>(?:[^"\\]|\\.)*)"|'(?P<single>(?:[^']|'')*)')"""
+)
+_YAML_PLAIN_VALUE_RE = re.compile(r"[ \t]*(?P<value>\S*)", re.ASCII)
+_YAML_FLOW_PLAIN_VALUE_RE = re.compile(r"[ \t]*(?P<value>[^\s,\[\]{}]*)", re.ASCII)
+_TOML_STRING_VALUE_RE = re.compile(
+    r"""[ \t]*(?!\"\"\"|''')(?:"(?P<double>(?:[^"\\]|\\.)*)"|'(?P<single>[^']*)')"""
+)
+# The rest of a quoted string, after its opening quote.
+_STRING_END_RE = {
+    "yaml": {'"': re.compile(r'(?:[^"\\]|\\.)*"'), "'": re.compile(r"(?:[^']|'')*'")},
+    "toml": {'"': re.compile(r'(?:[^"\\]|\\.)*"'), "'": re.compile(r"[^']*'")},
+}
+
+
+class Token(NamedTuple):
+    """A config entry the sync acts on.
+
+    For a ``repo`` or ``rev`` token, ``value`` is the repo URL or rev, without
+    quotes. A ``dependency`` token is a line, other than a ``repo`` or ``rev``
+    line, that contains the text ``sync-with-uv`` and so may carry the pragma;
+    its value is the line without its line ending. ``start`` and ``end`` are the
+    offsets of the value in the config text, and ``line_number`` is 1-based.
+    """
+
+    kind: TokenKind
+    value: str
+    line_number: int
+    start: int
+    end: int
+
+
+class ConfigTokenizer:
+    """Tokenize a config fed to it line by line, in order.
+
+    The tokenizer keeps the state that spans lines: the open flow collections,
+    and whether the next line is inside a YAML block scalar or a TOML
+    multi-line string.
+    """
+
+    def __init__(
+        self,
+        config_format: Literal["yaml", "toml"],
+        *,
+        line_number: int = 0,
+        offset: int = 0,
+    ) -> None:
+        """Create a tokenizer for a "yaml" or "toml" config.
+
+        To tokenize a config from one of its lines on, pass the *line_number*
+        and *offset* of the line before it, and where the line starts.
+        """
+        self.config_format = config_format
+        self._key_re = _KEY_RE[config_format]
+        self._flow_key_re = _FLOW_KEY_RE[config_format]
+        # the skip regexes, by the innermost open bracket ("" for block style)
+        self._skip_re = _SKIP_RE[config_format]
+        self._skip = self._skip_re[""]
+        self._string_end_re = _STRING_END_RE[config_format]
+        self._line_number = line_number
+        self._offset = offset
+        # the brackets of the open flow collections
+        self._open: list[str] = []
+        # the indentation of the line that opened the outermost YAML one
+        self._flow_indent = 0
+        # the line number and first token index of the outermost flow mapping
+        self._mapping_start = (0, 0)
+        # the index of the first token of the current line
+        self._line_tokens = 0
+        # the indentation of the line that started the current YAML block scalar
+        self._block_indent: int | None = None
+        # the closing delimiter of the current TOML multi-line string
+        self._string_delimiter: str | None = None
+
+    @property
+    def line_number(self) -> int:
+        """The number of the last line fed."""
+        return self._line_number
+
+    @property
+    def offset(self) -> int:
+        """The offset where the next line starts."""
+        return self._offset
+
+    def at_top_level(self, line: AnyStr) -> bool:
+        """Whether *line*, fed next, would start at the top level of the config.
+
+        That is outside any flow collection, YAML block scalar or TOML
+        multi-line string, so that a fresh tokenizer reads it the same.
+        """
+        if self._string_delimiter is not None:
+            return False
+        if not self._open and self._block_indent is None:
+            return True
+        if isinstance(line, bytes):
+            body = line.decode("latin-1").rstrip("\r\n")
+        else:
+            body = line.rstrip("\r\n")
+        if self._open:
+            return self._ends_flow(body)
+        assert self._block_indent is not None  # noqa: S101 (checked above)
+        content = body.lstrip(" ")
+        # the line ends the block scalar
+        return bool(content.strip()) and len(body) - len(content) <= self._block_indent
+
+    def feed(self, line: AnyStr) -> list[Token]:
+        """Return the tokens of the next *line* (with its line ending)."""
+        return self.feed_lines([line])
+
+    def feed_lines(self, lines: Sequence[AnyStr]) -> list[Token]:
+        """Return the tokens of the next *lines* (with their line endings).
+
+        The tokens are the same as those of :meth:`feed` on each line, but a
+        batch is faster: outside a flow mapping, a YAML block scalar or a TOML
+        multi-line string, a line can only hold a token or change the structure
+        if it contains one of the :data:`_NEEDLES`, and the batch is searched
+        for them at once, so the other lines are never looked at.
+
+        Lines of ``bytes`` are read through their latin-1 decoding, which maps
+        each byte to one character: every key and delimiter matched is ASCII,
+        so the tokens are the same, but their spans are byte offsets. Their
+        values are decoded from UTF-8, with undecodable bytes escaped.
+        """
+        if not lines:
+            return []
+        if isinstance(lines[0], bytes):
+            tokens = self._feed_text(
+                list(map(bytes.decode, lines, itertools.repeat("latin-1")))
+            )
+            return [
+                (
+                    token
+                    if token.value.isascii()
+                    else token._replace(
+                        value=token.value.encode("latin-1").decode(
+                            "utf-8", "surrogateescape"
+                        )
+                    )
+                )
+                for token in tokens
+            ]
+        return self._feed_text(lines)
+
+    def _feed_text(self, lines: Sequence[str]) -> list[Token]:
+        """Return the tokens of text *lines*, see :meth:`feed_lines`."""
+        tokens: list[Token] = []
+        starts = list(itertools.accumulate(map(len, lines), initial=0))
+        candidates = self._candidate_lines("".join(lines), starts[1:])
+        first_line_number = self._line_number + 1
+        next_index = 0
+        for index in sorted(candidates):
+            if index < next_index:
+                continue  # fed as part of a multi-line construct
+            self._line_number = first_line_number + index
+            self._feed_line(
+                lines[index],
+                self._offset + starts[index],
+                tokens,
+                restructures=candidates[index],
+            )
+            next_index = index + 1
+            # only a restructuring line can open a multi-line construct, whose
+            # lines are then fed one by one until it ends
+            while (
+                candidates[index] and next_index < len(lines) and self._in_construct()
+            ):
+                self._line_number = first_line_number + next_index
+                self._feed_line(
+                    lines[next_index],
+                    self._offset + starts[next_index],
+                    tokens,
+                    restructures=candidates.get(next_index, False),
+                )
+                next_index += 1
+        self._line_number = first_line_number + len(lines) - 1
+        self._offset += starts[-1]
+        return tokens
+
+    def _in_construct(self) -> bool:
+        """Whether the next line is inside a multi-line construct.
+
+        That is a flow mapping, a YAML block scalar or a TOML multi-line string:
+        any line in it may hold a token or end it.
+        """
+        return (
+            self._skip is self._skip_re["{"]
+            or self._block_indent is not None
+            or self._string_delimiter is not None
+        )
+
+    def _candidate_lines(self, text: str, ends: list[int]) -> dict[int, bool]:
+        """Return the lines of *text*, ending at *ends*, that contain a needle.
+
+        Each line index maps to whether the line contains a restructuring
+        needle. The occurrences of each needle are found by splitting *text* on
+        it, and mapped to their lines by bisecting *ends*, in C.
+        """
+        candidates: dict[int, bool] = {}
+        for needle in _NEEDLES[self.config_format]:
+            pieces = text.split(needle)[:-1]
+            positions = map(
+                operator.add,
+                itertools.accumulate(map(len, pieces)),
+                range(0, len(needle) * len(pieces), len(needle)),
+            )
+            candidates.update(
+                dict.fromkeys(
+                    map(bisect.bisect_right, itertools.repeat(ends), positions),
+                    needle in _RESTRUCTURING_NEEDLES[self.config_format],
+                )
+            )
+        return candidates
+
+    def _feed_line(
+        self, line: str, line_start: int, tokens: list[Token], *, restructures: bool
+    ) -> None:
+        """Add the tokens of *line*, which starts at offset *line_start*.
+
+        *restructures* tells whether the line contains a restructuring needle.
+        """
+        body = line.rstrip("\r\n")
+        position = 0
+        if self._block_indent is not None or self._string_delimiter is not None:
+            resumed = self._resume(body)
+            if resumed is None:
+                # a pragma is synced (or rejected) wherever it is, as ever
+                if PRAGMA_TEXT in body:
+                    tokens.append(self._dependency(body, line_start))
+                return
+            position = resumed
+        if self._open and self._ends_flow(body):
+            self._open.clear()
+            self._skip = self._skip_re[""]
+        self._line_tokens = len(tokens)
+        if position == 0 and ("rev" in body or "repo" in body):
+            position = self._scan_key(body, 0, line_start, tokens)
+        # outside a flow mapping, only the first key of a line can be a token, so
+        # the rest of the line is only scanned when it may change the structure
+        if self._skip is self._skip_re["{"] or (
+            restructures
+            # a TOML table header is balanced, and has no key
+            and not (
+                self.config_format == "toml" and not self._open and body[:1] == "["
+            )
+        ):
+            self._scan(body, position, line_start, tokens)
+        if self._line_tokens == len(tokens) and PRAGMA_TEXT in body:
+            tokens.append(self._dependency(body, line_start))
+
+    def _dependency(self, body: str, line_start: int) -> Token:
+        """Return the ``dependency`` token of the line *body* at *line_start*."""
+        return Token(
+            "dependency", body, self._line_number, line_start, line_start + len(body)
+        )
+
+    def _resume(self, body: str) -> int | None:
+        """Return where to start scanning *body*, or ``None`` to skip it.
+
+        A line is skipped while it is inside a YAML block scalar (it is blank or
+        more indented than the line that started the scalar) or a TOML
+        multi-line string (it does not close the string).
+        """
+        if self._block_indent is not None:
+            content = body.lstrip(" ")
+            if not content.strip() or len(body) - len(content) > self._block_indent:
+                return None
+            self._block_indent = None
+        if self._string_delimiter is not None:
+            end = body.find(self._string_delimiter)
+            if end == -1:
+                return None
+            self._string_delimiter = None
+            return end + 3
+        return 0
+
+    def _scan(
+        self, body: str, position: int, line_start: int, tokens: list[Token]
+    ) -> None:
+        """Follow the structure of *body* from *position*, adding flow tokens."""
+        length = len(body)
+        while True:
+            skipped = self._skip.match(body, position)
+            assert skipped is not None  # noqa: S101 (the skip regexes match "")
+            position = skipped.end()
+            if position >= length:
+                return
+            char = body[position]
+            if char in "[]{}":
+                position = self._bracket(body, position, line_start, tokens)
+            elif char == ",":
+                position = self._scan_key(body, position + 1, line_start, tokens)
+            elif char in "\"'":
+                end = self._skip_string(body, position)
+                if end is None:
+                    return
+                position = end
+            elif self._starts_block_scalar(body, position):
+                self._block_indent = len(body) - len(body.lstrip(" "))
+                return
+            else:
+                position += 1
+
+    def _ends_flow(self, body: str) -> bool:
+        """Whether the line *body* ends the open YAML flow collections.
+
+        That is a block entry or key not indented more than the line that
+        opened them, as after a stray ``files: {weird``; reading on in flow
+        style would give the next repos' revs to the repo before them.
+        """
+        if self.config_format != "yaml":
+            return False
+        entry = _YAML_BLOCK_ENTRY_RE.match(body)
+        return entry is not None and len(entry.group("indent")) <= self._flow_indent
+
+    def _bracket(
+        self, body: str, position: int, line_start: int, tokens: list[Token]
+    ) -> int:
+        """Open or close the flow collection at *position*; return the next one."""
+        char = body[position]
+        position += 1
+        if char in "]}":
+            if self._open:
+                self._open.pop()
+                self._skip = self._skip_re[self._open[-1] if self._open else ""]
+            return position
+        if (
+            self.config_format == "yaml"
+            and not self._open
+            and _YAML_VALUE_START_RE.fullmatch(body, 0, position - 1) is None
+        ):
+            return position  # part of a plain scalar, like ``name: check [it``
+        if not self._open:
+            self._flow_indent = len(body) - len(body.lstrip(" "))
+        self._open.append(char)
+        self._skip = self._skip_re[char]
+        if char == "[":
+            return position
+        if self._open.count("{") == 1:
+            self._mapping_start = (self._line_number, len(tokens))
+        return self._scan_key(body, position, line_start, tokens)
+
+    def _starts_block_scalar(self, body: str, start: int) -> bool:
+        """Whether the ``|`` or ``>`` at *start* starts a YAML block scalar.
+
+        It must follow a mapping key's ``:`` or a sequence entry's ``-`` and a
+        space, and end the line (but for a comment).
+        """
+        if not start or body[start - 1] not in " \t":
+            return False
+        before = body[:start].rstrip(" \t")
+        return (
+            before.endswith(":") or before.lstrip(" \t") == "-"
+        ) and _YAML_BLOCK_INDICATOR_RE.fullmatch(body, start) is not None
+
+    def _scan_key(
+        self, body: str, position: int, line_start: int, tokens: list[Token]
+    ) -> int:
+        """Add the token of a repo or rev key at *position*, if there is one.
+
+        In a flow collection, only keys of the outermost mapping count: a key
+        in a nested mapping is a hook's, and a key in a sequence is not a key.
+        Returns the position after the key and its value.
+        """
+        if not self._open:
+            key = self._key_re.match(body, position)
+        elif self._open[-1] == "{" and self._open.count("{") == 1:
+            key = self._flow_key_re.match(body, position)
+        else:
+            return position
+        if key is None:
+            return position
+        return self._scan_value(body, key.group("name"), key.end(), line_start, tokens)
+
+    def _scan_value(
+        self,
+        body: str,
+        name: str,
+        position: int,
+        line_start: int,
+        tokens: list[Token],
+    ) -> int:
+        """Add the token of the value of key *name* at *position*.
+
+        Returns the position after the value; a TOML value that is not a
+        single-line string is skipped by the caller instead.
+        """
+        if self.config_format == "yaml":
+            value = _YAML_QUOTED_VALUE_RE.match(body, position) or (
+                _YAML_FLOW_PLAIN_VALUE_RE if self._open else _YAML_PLAIN_VALUE_RE
+            ).match(body, position)
+        else:
+            value = _TOML_STRING_VALUE_RE.match(body, position)
+        if value is None:
+            return position
+        group = value.lastgroup or "value"
+        token = Token(
+            "repo" if name == "repo" else "rev",
+            value.group(group) or "",
+            self._line_number,
+            line_start + value.start(group),
+            line_start + value.end(group),
+        )
+        if name == "repo" and self._open:
+            # a rev that came before the repo in the same mapping belongs to it
+            line_number, token_index = self._mapping_start
+            tokens.insert(
+                (
+                    token_index
+                    if line_number == self._line_number
+                    else self._line_tokens
+                ),
+                token,
+            )
+        else:
+            tokens.append(token)
+        return value.end()
+
+    def _skip_string(self, body: str, start: int) -> int | None:
+        """Return the position after the string opened by the quote at *start*.
+
+        Returns ``None`` when the string continues on the next lines: a TOML
+        multi-line string is then skipped until it is closed, and an
+        unterminated YAML string is assumed to end with the line.
+        """
+        quote = body[start]
+        if self.config_format == "toml" and body.startswith(quote * 3, start):
+            end = body.find(quote * 3, start + 3)
+            if end == -1:
+                self._string_delimiter = quote * 3
+                return None
+            return end + 3
+        end_match = self._string_end_re[quote].match(body, start + 1)
+        return end_match.end() if end_match else None
+
+
+def tokenize_config(
+    lines: Iterable[AnyStr], config_format: Literal["yaml", "toml"]
+) -> Iterator[Token]:
+    """Yield the tokens of config *lines* (with their line endings), in order.
+
+    See :meth:`ConfigTokenizer.feed_lines` for lines of ``bytes``.
+    """
+    tokenizer = ConfigTokenizer(config_format)
+    for line in lines:
+        yield from tokenizer.feed(line)
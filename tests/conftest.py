@@ -0,0 +1,168 @@
+"""Performance regression gate for the ``perf`` benchmarks.
+
+The ``perf`` benchmarks run as plain tests by default, since the benchmarks are
+disabled in the pytest config. Run them as a regression gate with::
+
+    pytest -m perf --benchmark-enable
+
+Each benchmark's median time is divided by the median time of a fixed
+calibration workload, measured over several rounds right after the benchmark,
+so that the stored baseline (``tests/perf_baseline.json``) carries over between
+machines, and a machine that slows down during the session slows down both. A
+benchmark fails when its ratio exceeds the baseline ratio by more than its
+``max_regression``. Refresh the baseline with ``--perf-save-baseline``.
+"""
+
+import json
+import statistics
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import NamedTuple
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+DEFAULT_BASELINE = Path(__file__).with_name("perf_baseline.json")
+# The regression allowed for a benchmark without its own threshold.
+DEFAULT_MAX_REGRESSION = 1.0
+# The rounds of the calibration workload measured for each benchmark.
+CALIBRATION_ROUNDS = 25
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    """Add the options of the gate."""
+    group = parser.getgroup("perf", "performance regression gate")
+    group.addoption(
+        "--perf-baseline",
+        type=Path,
+        default=DEFAULT_BASELINE,
+        help="baseline JSON to compare the perf benchmarks against",
+    )
+    group.addoption(
+        "--perf-save-baseline",
+        action="store_true",
+        help="write the perf benchmark results to the baseline, keeping thresholds",
+    )
+
+
+class PerfResult(NamedTuple):
+    """A benchmark's time relative to the calibration, and its baseline."""
+
+    name: str
+    ratio: float
+    baseline_ratio: float | None
+    max_regression: float
+
+    @property
+    def regression(self) -> float | None:
+        """How much slower than the baseline, e.g. ``0.1`` for 10% slower."""
+        if self.baseline_ratio is None:
+            return None
+        return self.ratio / self.baseline_ratio - 1
+
+    @property
+    def failed(self) -> bool:
+        """Whether the benchmark regressed by more than its allowed margin."""
+        regression = self.regression
+        return regression is not None and regression > self.max_regression
+
+    def describe(self) -> str:
+        """Return a one-line report of the comparison."""
+        if self.baseline_ratio is None:
+            return f"{self.name}: {self.ratio:.2f}x calibration (no baseline)"
+        assert self.regression is not None  # noqa: S101
+        return (
+            f"{self.name}: {self.ratio:.2f}x calibration vs "
+            f"{self.baseline_ratio:.2f}x baseline ({self.regression:+.0%}, "
+            f"allowed {self.max_regression:+.0%})"
+        )
+
+
+_RESULTS_KEY = pytest.StashKey[list[PerfResult]]()
+
+
+def _calibration_workload() -> None:
+    """Run a fixed mix of string and dict work, similar to the code under test."""
+    counts: dict[str, int] = {}
+    for i in range(20_000):
+        key = f"package-{i % 500}"
+        counts[key] = counts.get(key, 0) + len(key.split("-"))
+    sorted(counts.items())
+
+
+def _calibration_ns() -> float:
+    """Return the median time of the calibration workload, in nanoseconds.
+
+    The median of many rounds is stable under short bursts of other load on the
+    machine, as is the median of a benchmark's rounds.
+    """
+    times = []
+    for _ in range(CALIBRATION_ROUNDS):
+        start = time.perf_counter_ns()
+        _calibration_workload()
+        times.append(time.perf_counter_ns() - start)
+    return statistics.median(times)
+
+
+def _load_baseline(path: Path) -> dict[str, dict[str, float]]:
+    if not path.is_file():
+        return {}
+    baseline: dict[str, dict[str, float]] = json.loads(path.read_text("utf-8"))
+    return baseline
+
+
+@pytest.fixture
+def perf_gate(request: pytest.FixtureRequest) -> Callable[[BenchmarkFixture], None]:
+    """Return a check of a finished benchmark against the stored baseline.
+
+    Does nothing when the benchmarks are disabled.
+    """
+    config = request.config
+    baseline = _load_baseline(config.getoption("--perf-baseline"))
+
+    def check(benchmark: BenchmarkFixture) -> None:
+        if benchmark.disabled or benchmark.stats is None:
+            return
+        name = request.node.name
+        entry = baseline.get(name, {})
+        result = PerfResult(
+            name,
+            benchmark.stats.stats.median * 1e9 / _calibration_ns(),
+            entry.get("ratio"),
+            entry.get("max_regression", DEFAULT_MAX_REGRESSION),
+        )
+        config.stash.setdefault(_RESULTS_KEY, []).append(result)
+        if result.failed and not config.getoption("--perf-save-baseline"):
+            pytest.fail(f"performance regression: {result.describe()}", pytrace=False)
+
+    return check
+
+
+def pytest_terminal_summary(
+    terminalreporter: pytest.TerminalReporter, config: pytest.Config
+) -> None:
+    """Report how each gated benchmark compares with the baseline."""
+    results = config.stash.get(_RESULTS_KEY, [])
+    if not results:
+        return
+    terminalreporter.section("performance regression gate")
+    for result in results:
+        terminalreporter.line(
+            ("FAILED " if result.failed else "ok     ") + result.describe()
+        )
+
+
+def pytest_sessionfinish(session: pytest.Session) -> None:
+    """Write the results to the baseline, with ``--perf-save-baseline``."""
+    config = session.config
+    results = config.stash.get(_RESULTS_KEY, [])
+    if not results or not config.getoption("--perf-save-baseline"):
+        return
+    path: Path = config.getoption("--perf-baseline")
+    baseline = _load_baseline(path)
+    for result in results:
+        entry = baseline.setdefault(result.name, {})
+        entry["ratio"] = round(result.ratio, 3)
+        entry.setdefault("max_regression", DEFAULT_MAX_REGRESSION)
+    path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n", "utf-8")
@@ -0,0 +1,280 @@
+"""Seeded generator of synthetic uv.lock files and configs, for scaling work.
+
+The generated inputs look like the real thing: the lock has registry sources,
+dependencies, an sdist and a ``wheels`` array per package, and the configs mix
+repos from :data:`~sync_with_uv.repo_data.REPO_TO_PACKAGE`, unmapped repos
+(whose URL may or may not name a locked package), ``local`` repos, stale and
+current revs, and ``# sync-with-uv`` dependency lines in various forms. The
+same arguments and seed always produce the same output.
+
+Used by the tests and benchmarks, and by ``scripts/gen_corpus.py``.
+"""
+
+import random
+from collections.abc import Iterator
+from typing import Literal, NamedTuple
+
+from sync_with_uv.repo_data import REPO_TO_PACKAGE, repo_to_version_template
+
+# The name of the project at the root of a generated lock.
+ROOT_PROJECT = "corpus-project"
+
+_WORDS = (
+    "async", "cache", "cli", "color", "config", "core", "data", "date", "http",
+    "json", "lint", "log", "math", "parse", "path", "plugin", "py", "schema",
+    "test", "text", "time", "toml", "type", "util", "web", "yaml",
+)  # fmt: skip
+_WHEEL_TAGS = (
+    "py3-none-any",
+    "cp312-cp312-manylinux_2_17_x86_64.manylinux2014_x86_64",
+    "cp312-cp312-macosx_11_0_arm64",
+    "cp312-cp312-win_amd64",
+    "cp313-cp313-manylinux_2_17_aarch64.manylinux2014_aarch64",
+    "cp313-cp313-musllinux_1_2_x86_64",
+    "cp313-cp313-win32",
+    "cp39-abi3-manylinux_2_31_riscv64",
+)
+
+
+class Corpus(NamedTuple):
+    """A generated uv.lock and config, with the versions in the lock.
+
+    ``versions`` is what :func:`~sync_with_uv.sync_with_uv.load_uv_lock` reads
+    from ``uv_lock``, including the root project.
+    """
+
+    uv_lock: str
+    config: str
+    versions: dict[str, str]
+
+
+def _version(rng: random.Random) -> str:
+    return f"{rng.randint(0, 30)}.{rng.randint(0, 20)}.{rng.randint(0, 15)}"
+
+
+def _hex(rng: random.Random, n_bits: int) -> str:
+    return f"{rng.getrandbits(n_bits):0{n_bits // 4}x}"
+
+
+def generate_versions(n_packages: int, *, seed: int = 0) -> dict[str, str]:
+    """Return *n_packages* locked package names and versions.
+
+    The packages of :data:`~sync_with_uv.repo_data.REPO_TO_PACKAGE` come
+    first (as many as fit), so that the built-in repos can be synced; the rest
+    have generated names.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    names = sorted(set(REPO_TO_PACKAGE.values()))[:n_packages]
+    index = 0
+    while len(names) < n_packages:
+        names.append(f"{rng.choice(_WORDS)}-{rng.choice(_WORDS)}-{index}")
+        index += 1
+    return {name: _version(rng) for name in names}
+
+
+def _lock_package(
+    rng: random.Random, name: str, version: str, names: list[str], n_wheels: int
+) -> list[str]:
+    dist_name = name.replace("-", "_")
+    base_url = "https://files.pythonhosted.org/packages"
+
+    def artifact(filename: str) -> str:
+        url = f"{base_url}/{_hex(rng, 8)}/{_hex(rng, 8)}/{_hex(rng, 240)}/{filename}"
+        upload_time = f"2026-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T12:00:00Z"
+        return (
+            f'{{ url = "{url}", hash = "sha256:{_hex(rng, 256)}", '
+            f'size = {rng.randint(10_000, 5_000_000)}, upload-time = "{upload_time}" }}'
+        )
+
+    lines = [
+        "[[package]]",
+        f'name = "{name}"',
+        f'version = "{version}"',
+        'source = { registry = "https://pypi.org/simple" }',
+    ]
+    dependencies = sorted(set(rng.sample(names, min(len(names), rng.randint(0, 3)))))
+    if dependencies:
+        lines.append("dependencies = [")
+        lines.extend(f'    {{ name = "{dep}" }},' for dep in dependencies)
+        lines.append("]")
+    lines.append(f"sdist = {artifact(f'{dist_name}-{version}.tar.gz')}")
+    lines.append("wheels = [")
+    lines.extend(
+        f"    {artifact(f'{dist_name}-{version}-{tag}.whl')},"
+        for tag in (_WHEEL_TAGS * (n_wheels // len(_WHEEL_TAGS) + 1))[:n_wheels]
+    )
+    lines.append("]")
+    return lines
+
+
+def format_uv_lock(
+    versions: dict[str, str], *, seed: int = 0, n_wheels: int = 8
+) -> str:
+    """Return a uv.lock locking *versions*, with *n_wheels* wheels per package.
+
+    The root project (:data:`ROOT_PROJECT`) depends on every locked package.
+    """
+    rng = random.Random(seed)  # noqa: S311
+    names = list(versions)
+    lines = [
+        "version = 1",
+        "revision = 3",
+        'requires-python = ">=3.10"',
+        "",
+        "[[package]]",
+        f'name = "{ROOT_PROJECT}"',
+        'version = "0.1.0"',
+        'source = { editable = "." }',
+        "dependencies = [",
+        *(f'    {{ name = "{name}" }},' for name in names),
+        "]",
+    ]
+    for name, version in versions.items():
+        lines.append("")
+        lines.extend(_lock_package(rng, name, version, names, n_wheels))
+    return "\n".join(lines) + "\n"
+
+
+def _repo_url(rng: random.Random, index: int, generated: list[str]) -> str:
+    """Return the URL of the *index*-th generated repo."""
+    kind = index % 4
+    if kind == 0:
+        return rng.choice(list(REPO_TO_PACKAGE))
+    if kind == 1 and generated:
+        # not mapped, but the URL names a locked package
+        return f"https://github.com/example-org/{rng.choice(generated)}"
+    if kind == 2:  # noqa: PLR2004
+        return f"https://github.com/example-org/tool-{index}"
+    return "local"
+
+
+def _rev(rng: random.Random, repo_url: str, version: str | None) -> str:
+    """Return a current or stale rev for a repo whose package is at *version*."""
+    if version is None or rng.random() < 0.5:  # noqa: PLR2004
+        version = _version(rng)
+    template = repo_to_version_template(repo_url) or "v${version}"
+    return template.replace("${version}", version)
+
+
+def _dependency(rng: random.Random, name: str) -> str:
+    """Return a dependency on *name*, in one of the forms the sync supports."""
+    if rng.random() < 0.3:  # noqa: PLR2004
+        name = name.replace("-", "_").capitalize()
+    form = rng.randrange(5)
+    if form == 0:
+        return name
+    if form == 1:
+        return f"{name}[extra]>={_version(rng)}"
+    if form == 2:  # noqa: PLR2004
+        return f"{name}>={_version(rng)},<{rng.randint(31, 99)}"
+    if form == 3:  # noqa: PLR2004
+        return f'{name}=={_version(rng)} ; python_version >= "3.10"'
+    return f"{name}=={_version(rng)}"
+
+
+def _yaml_repo(
+    repo_url: str, rev: str, hook_id: str, dependencies: list[str]
+) -> Iterator[str]:
+    yield f"- repo: {repo_url}"
+    if repo_url != "local":
+        yield f"  rev: {rev}"
+    yield "  hooks:"
+    yield f"    - id: {hook_id}"
+    yield "      additional_dependencies:"
+    for dependency in dependencies:
+        value, pragma, comment = dependency.partition("  #")
+        quote = "'" if '"' in value else ""
+        yield f"        - {quote}{value}{quote}{pragma}{comment}"
+
+
+def _toml_repo(
+    repo_url: str, rev: str, hook_id: str, dependencies: list[str]
+) -> Iterator[str]:
+    yield ""
+    yield "[[repos]]"
+    yield f'repo = "{repo_url}"'
+    if repo_url != "local":
+        yield f'rev = "{rev}"'
+    yield ""
+    yield "[[repos.hooks]]"
+    yield f'id = "{hook_id}"'
+    yield "additional_dependencies = ["
+    for dependency in dependencies:
+        value, pragma, comment = dependency.partition("  #")
+        quote = "'" if '"' in value else '"'
+        yield f"  {quote}{value}{quote},{pragma}{comment}"
+    yield "]"
+
+
+def format_config(
+    versions: dict[str, str],
+    n_repos: int,
+    n_pragma_lines: int,
+    *,
+    config_format: Literal["yaml", "toml"] = "yaml",
+    seed: int = 0,
+) -> str:
+    """Return a config with *n_repos* repos and *n_pragma_lines* pragma lines.
+
+    The pragma lines pin packages of *versions*, and are spread evenly over
+    the repos' hooks, next to dependencies without a pragma.
+
+    Raises:
+        ValueError: If there are pragma lines but no repos or no versions.
+    """
+    if n_pragma_lines and not (n_repos and versions):
+        msg = "pragma lines need at least one repo and one locked package"
+        raise ValueError(msg)
+    rng = random.Random(seed)  # noqa: S311
+    names = list(versions)
+    generated = [name for name in names if name not in REPO_TO_PACKAGE.values()]
+    if config_format == "yaml":
+        lines, format_repo = ["repos:"], _yaml_repo
+    else:
+        lines, format_repo = ['minimum_prek_version = "0.3.2"'], _toml_repo
+    for index in range(n_repos):
+        repo_url = _repo_url(rng, index, generated)
+        package = REPO_TO_PACKAGE.get(repo_url, repo_url.rsplit("/", 1)[-1])
+        rev = _rev(rng, repo_url, versions.get(package))
+        # this repo's share of the pragma lines
+        n_pragmas = n_pragma_lines // n_repos + (index < n_pragma_lines % n_repos)
+        dependencies = [
+            f"{_dependency(rng, rng.choice(names))}  # sync-with-uv"
+            for _ in range(n_pragmas)
+        ]
+        dependencies.append(f"{rng.choice(_WORDS)}-unpinned>=1")
+        lines.extend(format_repo(repo_url, rev, f"hook-{index}", dependencies))
+    return "\n".join(lines) + "\n"
+
+
+def generate_corpus(  # noqa: PLR0913
+    n_packages: int,
+    n_repos: int,
+    n_pragma_lines: int,
+    *,
+    config_format: Literal["yaml", "toml"] = "yaml",
+    n_wheels: int = 8,
+    seed: int = 0,
+) -> Corpus:
+    """Generate a uv.lock and a matching config.
+
+    Args:
+        n_packages: Number of locked packages, besides the root project.
+        n_repos: Number of repos in the config.
+        n_pragma_lines: Number of ``# sync-with-uv`` dependency lines.
+        config_format: Either "yaml" for .pre-commit-config.yaml
+            or "toml" for prek.toml.
+        n_wheels: Number of wheels of each locked package.
+        seed: Seed of the generator; the same seed gives the same corpus.
+
+    Returns:
+        The generated :class:`Corpus`.
+    """
+    versions = generate_versions(n_packages, seed=seed)
+    return Corpus(
+        format_uv_lock(versions, seed=seed, n_wheels=n_wheels),
+        format_config(
+            versions, n_repos, n_pragma_lines, config_format=config_format, seed=seed
+        ),
+        {ROOT_PROJECT: "0.1.0", **versions},
+    )
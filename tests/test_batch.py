@@ -0,0 +1,258 @@
+import difflib
+import shutil
+import subprocess
+import time
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+import pytest
+
+from sync_with_uv.batch import (
+    Project,
+    ProjectFiles,
+    find_project,
+    patch_project,
+    prefetch_project_files,
+    read_project_files,
+    sync_fleet,
+    write_fleet_patch,
+)
+from sync_with_uv.lock_index import lock_index_path
+from sync_with_uv.sync_with_uv import write_lock_index
+
+from .test_sync import (  # noqa: F401
+    FIXED_PRECOMMIT_CONTENT,
+    sample_precommit_config,
+    sample_uv_lock,
+)
+
+
+def _make_fleet(
+    root: Path, sample_uv_lock: Path, sample_precommit_config: Path, n: int
+) -> list[Path]:
+    directories = []
+    for i in range(n):
+        directory = root / "fleet" / f"project-{i}"
+        directory.mkdir(parents=True)
+        shutil.copy(sample_uv_lock, directory / "uv.lock")
+        shutil.copy(sample_precommit_config, directory / ".pre-commit-config.yaml")
+        directories.append(directory)
+    return directories
+
+
+def _snapshot(root: Path) -> dict[Path, bytes]:
+    return {path: path.read_bytes() for path in root.rglob("*") if path.is_file()}
+
+
+def test_find_project(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="does not exist"):
+        find_project(tmp_path)
+    (tmp_path / "prek.toml").touch()
+    assert find_project(tmp_path).config_path == tmp_path / "prek.toml"
+    (tmp_path / ".pre-commit-config.yaml").touch()
+    assert find_project(tmp_path) == Project(
+        tmp_path / ".pre-commit-config.yaml",
+        tmp_path / "uv.lock",
+        tmp_path / "pyproject.toml",
+    )
+
+
+@pytest.mark.usefixtures("sample_uv_lock")
+def test_patch_project(sample_precommit_config: Path, tmp_path: Path) -> None:
+    old_text = sample_precommit_config.read_text()
+    result = patch_project(find_project(tmp_path), root=tmp_path.parent, n=1)
+    path = f"{tmp_path.name}/.pre-commit-config.yaml"
+    assert result.patch == [
+        f"diff --git a/{path} b/{path}\n",
+        *difflib.unified_diff(
+            old_text.splitlines(keepends=True),
+            FIXED_PRECOMMIT_CONTENT.splitlines(keepends=True),
+            f"a/{path}",
+            f"b/{path}",
+            n=1,
+        ),
+    ]
+    assert result.changes is not None
+    assert result.changes.repos["black"] == ("23.9.1", "23.11.0")
+    assert result.error is None
+    # an up to date project has an empty patch
+    sample_precommit_config.write_text(FIXED_PRECOMMIT_CONTENT)
+    assert patch_project(find_project(tmp_path), root=tmp_path).patch == []
+
+
+@pytest.mark.usefixtures("sample_uv_lock")
+def test_patch_project_stamp(sample_precommit_config: Path, tmp_path: Path) -> None:
+    project = find_project(tmp_path)
+    result = patch_project(project, root=tmp_path, stamp=True)
+    assert any(line.startswith("+# sync-with-uv: ") for line in result.patch)
+    # a matching stamp skips the project
+    stamped = "".join(line[1:] for line in result.patch if line.startswith("+#"))
+    sample_precommit_config.write_text(stamped + sample_precommit_config.read_text())
+    assert patch_project(project, root=tmp_path, stamp=True).patch == []
+
+
+@pytest.mark.usefixtures("sample_uv_lock", "sample_precommit_config")
+def test_patch_project_outside_root(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="is not in the subpath"):
+        patch_project(find_project(tmp_path), root=tmp_path / "elsewhere")
+
+
+def test_read_project_files(
+    sample_uv_lock: Path, sample_precommit_config: Path, tmp_path: Path
+) -> None:
+    project = find_project(tmp_path)
+    files = read_project_files(project)
+    assert files == ProjectFiles(
+        sample_precommit_config.read_bytes(), sample_uv_lock.read_bytes(), None, None
+    )
+    assert files.size == len(files.config) + len(files.uv_lock)
+    write_lock_index(sample_uv_lock)
+    (tmp_path / "pyproject.toml").write_text("[project]\n")
+    files = read_project_files(project)
+    assert files.lock_index == lock_index_path(sample_uv_lock).read_bytes()
+    assert files.pyproject == b"[project]\n"
+    # the files read ahead give the same result
+    assert patch_project(project, root=tmp_path, files=files) == patch_project(
+        project, root=tmp_path
+    )
+    sample_uv_lock.unlink()
+    with pytest.raises(FileNotFoundError):
+        read_project_files(project)
+
+
+def test_prefetch_project_files_bounds(
+    sample_uv_lock: Path, sample_precommit_config: Path, tmp_path: Path
+) -> None:
+    directories = _make_fleet(tmp_path, sample_uv_lock, sample_precommit_config, 8)
+    pulled: list[Project] = []
+
+    def projects() -> Iterator[Project]:
+        for directory in directories:
+            project = find_project(directory)
+            pulled.append(project)
+            yield project
+
+    def read_two(max_bytes: int) -> int:
+        pulled.clear()
+        prefetched = prefetch_project_files(
+            projects(), max_projects=4, max_bytes=max_bytes
+        )
+        for _ in range(2):
+            _project, files = next(prefetched)
+            files.result()
+            time.sleep(0.1)  # for the projects read ahead to be read
+        n_pulled = len(pulled)
+        assert [project for project, _files in prefetched] == pulled[2:]
+        assert pulled == list(map(find_project, directories))
+        return n_pulled
+
+    # the first project and the four after it, then one more for the second
+    assert read_two(2**30) == 6
+    # but none once those read ahead take a byte, unless none is read ahead
+    assert read_two(1) < 6
+
+
+def test_prefetch_project_files_reads_while_syncing(
+    sample_uv_lock: Path, sample_precommit_config: Path, tmp_path: Path
+) -> None:
+    """The next project is read while the one yielded is synced."""
+    directories = _make_fleet(tmp_path, sample_uv_lock, sample_precommit_config, 3)
+    pulled: list[Path] = []
+
+    def projects() -> Iterator[Project]:
+        for directory in directories:
+            pulled.append(directory)
+            yield find_project(directory)
+
+    prefetched = prefetch_project_files(projects(), max_projects=1)
+    for index, (project, files) in enumerate(prefetched):
+        assert project.config_path.parent == directories[index]
+        # submitted before the caller resumes
+        assert pulled == directories[: index + 2]
+        assert files.result().config == sample_precommit_config.read_bytes()
+
+
+def test_sync_fleet_continues_after_errors(
+    sample_uv_lock: Path, sample_precommit_config: Path, tmp_path: Path
+) -> None:
+    directories = _make_fleet(tmp_path, sample_uv_lock, sample_precommit_config, 3)
+    (directories[1] / "uv.lock").write_text("not toml [")
+    (directories[2] / "uv.lock").unlink()
+    for prefetch_projects in (0, 1, 8):
+        results = list(
+            sync_fleet(
+                map(find_project, [*directories, directories[0]]),
+                root=tmp_path,
+                prefetch_projects=prefetch_projects,
+            )
+        )
+        assert [result.project.config_path.parent for result in results] == [
+            *directories,
+            directories[0],
+        ]
+        assert results[0].patch
+        assert results[1].patch == []
+        assert results[1].changes is None
+        assert results[1].error
+        assert results[2].error is not None
+        assert "uv.lock" in results[2].error
+        assert results[3].patch == results[0].patch
+
+
+def test_fleet_patch_does_not_write(
+    sample_uv_lock: Path, sample_precommit_config: Path, tmp_path: Path
+) -> None:
+    directories = _make_fleet(tmp_path, sample_uv_lock, sample_precommit_config, 2)
+    # a stale lock index is not rebuilt either
+    write_lock_index(directories[0] / "uv.lock")
+    with (directories[0] / "uv.lock").open("a") as f:
+        f.write("\n")
+    before = _snapshot(tmp_path)
+    written: list[str] = []
+    results = sync_fleet(map(find_project, directories), root=tmp_path)
+    assert len(list(write_fleet_patch(results, written.append))) == 2
+    assert sum(line.startswith("diff --git ") for line in written) == 2
+    assert _snapshot(tmp_path) == before
+    assert lock_index_path(directories[0] / "uv.lock") in before
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="git is not installed")
+@pytest.mark.parametrize(
+    "transform",
+    [
+        lambda text: text,
+        lambda text: text.replace("\n", "\r\n"),
+        lambda text: text.rstrip("\n"),
+        # git sees a single line here, so the patch is diffed again
+        lambda text: text.replace("\n", "\r"),
+    ],
+    ids=["lf", "crlf", "no-final-newline", "cr"],
+)
+def test_fleet_patch_applies_with_git(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    tmp_path: Path,
+    transform: Callable[[str], str],
+) -> None:
+    directories = _make_fleet(tmp_path, sample_uv_lock, sample_precommit_config, 3)
+    for directory in directories:
+        config = directory / ".pre-commit-config.yaml"
+        config.write_bytes(transform(config.read_text()).encode())
+    # one project is already synced
+    (directories[1] / ".pre-commit-config.yaml").write_bytes(
+        transform(FIXED_PRECOMMIT_CONTENT).encode()
+    )
+    patch = tmp_path / "fleet.patch"
+    with patch.open("w", newline="") as f:
+        results = sync_fleet(map(find_project, directories), root=tmp_path)
+        for _result in write_fleet_patch(results, f.write):
+            pass
+    subprocess.run(
+        ["git", "apply", "--whitespace=nowarn", "fleet.patch"],  # noqa: S607
+        cwd=tmp_path,
+        check=True,
+    )
+    for directory in directories:
+        assert (directory / ".pre-commit-config.yaml").read_bytes() == transform(
+            FIXED_PRECOMMIT_CONTENT
+        ).encode()
@@ -0,0 +1,127 @@
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+import sync_with_uv.bench
+from sync_with_uv.bench import BenchResult, bench_cases, format_results, run_bench
+from sync_with_uv.cli import app
+
+from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+
+
+def test_bench_result() -> None:
+    result = BenchResult("case", [1_000_000, 2_000_000, 3_000_000, 10_000_000])
+    assert result.min_ms == 1.0
+    assert result.median_ms == 2.5
+    assert result.p95_ms == pytest.approx(8.95)
+    lines = format_results([result]).splitlines()
+    assert lines[0].split() == [
+        "case",
+        "runs",
+        "min",
+        "ms",
+        "median",
+        "ms",
+        "p95",
+        "ms",
+    ]
+    assert lines[1].split() == ["case", "4", "1.000", "2.500", "8.950"]
+
+
+def test_run_bench() -> None:
+    calls: list[str] = []
+    results = run_bench({"a": lambda: calls.append("a")}, repeat=3)
+    assert calls == ["a"] * 4  # including the warm-up run
+    (result,) = results
+    assert result.name == "a"
+    assert len(result.times_ns) == 3
+    assert result.times_ns == sorted(result.times_ns)
+
+
+def test_bench_cases_never_write(
+    sample_uv_lock: Path, sample_precommit_config: Path
+) -> None:
+    config_text = sample_precommit_config.read_text()
+    with bench_cases(sample_precommit_config, "yaml", sample_uv_lock) as cases:
+        results = run_bench(cases, repeat=2)
+    assert [result.name for result in results] == [
+        "load_user_mappings",
+        "load_uv_lock",
+        "read_config",
+        "process[text]",
+        "process[bytes]",
+        "process[sharded]",
+        "process[edits]",
+        "process[check]",
+        "process[stream]",
+        "process[memory-cache]",
+        "process[disk-cache]",
+        "pipeline",
+    ]
+    assert sample_precommit_config.read_text() == config_text
+
+
+def test_bench_pipeline_case(
+    sample_uv_lock: Path, sample_precommit_config: Path, mocker: MockerFixture
+) -> None:
+    """The pipeline case syncs as the CLI does, without touching the lock index."""
+    spy = mocker.spy(sync_with_uv.bench, "sync_config_pipelined")
+    with bench_cases(sample_precommit_config, "yaml", sample_uv_lock) as cases:
+        synced = cases["pipeline"]()
+    spy.assert_called_once()
+    assert spy.call_args.kwargs["update_index"] is False
+    assert synced == spy.spy_return
+
+
+def test_cli_bench(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    args = ["bench", "-p", str(sample_precommit_config), "-u", str(sample_uv_lock)]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "-n", "2", "--case", "process[text]", "--case", "pipeline"])
+    assert exc_info.value.code == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[:2] for line in lines[1:]] == [
+        ["process[text]", "2"],
+        ["pipeline", "2"],
+    ]
+
+
+def test_cli_bench_memory(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    args = ["bench", "-p", str(sample_precommit_config), "-u", str(sample_uv_lock)]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "-n", "1", "--case", "load_uv_lock", "--memory"])
+    assert exc_info.value.code == 0
+    timings, memory = capsys.readouterr().out.split("\n\n")
+    assert timings.splitlines()[1].split()[0] == "load_uv_lock"
+    header, row = memory.splitlines()
+    assert header.split() == ["case", "peak", "KiB", "retained", "KiB", "blocks"]
+    assert row.split()[0] == "load_uv_lock"
+
+
+@pytest.mark.parametrize(
+    ("extra_args", "message"),
+    [
+        (["--case", "nope"], "unknown case nope"),
+        (["-n", "0"], "--repeat must be at least 1"),
+    ],
+)
+def test_cli_bench_errors(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+    extra_args: list[str],
+    message: str,
+) -> None:
+    args = ["bench", "-p", str(sample_precommit_config), "-u", str(sample_uv_lock)]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, *extra_args])
+    assert exc_info.value.code == 1
+    assert message in capsys.readouterr().err
@@ -0,0 +1,202 @@
+import os
+import textwrap
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+from sync_with_uv.cache import (
+    DiskResultCache,
+    MemoryResultCache,
+    cache_key,
+    cached_process_config_text,
+    dump_result,
+    load_result,
+)
+from sync_with_uv.cli import app
+from sync_with_uv.dependency_line import DepLineChange
+from sync_with_uv.sync_with_uv import Changes, process_config_text
+
+from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+
+CONFIG_TEXT = textwrap.dedent("""\
+    repos:
+    - repo: https://github.com/psf/black-pre-commit-mirror
+      rev: 23.9.1
+      hooks:
+        - id: black
+          additional_dependencies:
+            - ruff>=0.1  # sync-with-uv
+    - repo: https://github.com/example/unmanaged
+      rev: v1
+    """)
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5"}
+
+
+def test_cache_key_depends_on_all_inputs() -> None:
+    base = cache_key(CONFIG_TEXT, UV_DATA, config_format="yaml")
+    assert base == cache_key(CONFIG_TEXT, dict(UV_DATA), config_format="yaml")
+    assert base != cache_key(CONFIG_TEXT + "\n", UV_DATA, config_format="yaml")
+    assert base != cache_key(CONFIG_TEXT, {"black": "1"}, config_format="yaml")
+    assert base != cache_key(CONFIG_TEXT, UV_DATA, config_format="toml")
+    assert base != cache_key(
+        CONFIG_TEXT, UV_DATA, config_format="yaml", user_repo_mappings={"a": "b"}
+    )
+    assert base != cache_key(
+        CONFIG_TEXT, UV_DATA, config_format="yaml", user_version_mappings={"a": "b"}
+    )
+    # the lookups don't depend on the order of the mappings, nor does the key
+    mappings = {"https://x/a": "v${version}", "https://x": "${version}"}
+    assert cache_key(
+        CONFIG_TEXT, UV_DATA, config_format="yaml", user_version_mappings=mappings
+    ) == cache_key(
+        CONFIG_TEXT,
+        UV_DATA,
+        config_format="yaml",
+        user_version_mappings=dict(reversed(mappings.items())),
+    )
+
+
+def test_dump_load_result_round_trip() -> None:
+    result = process_config_text(CONFIG_TEXT, UV_DATA, config_format="yaml")
+    assert result[1].lines  # exercise the dependency-line serialization
+    assert load_result(dump_result(result)) == result
+
+
+@pytest.mark.parametrize("data", ["", "[]", '{"text": "x"}', '{"repos": []}'])
+def test_load_result_invalid(data: str) -> None:
+    with pytest.raises(ValueError, match="invalid cached result"):
+        load_result(data)
+
+
+def test_memory_cache_hit_skips_processing(mocker: MockerFixture) -> None:
+    cache = MemoryResultCache()
+    expected = process_config_text(CONFIG_TEXT, UV_DATA, config_format="yaml")
+    assert (
+        cached_process_config_text(cache, CONFIG_TEXT, UV_DATA, config_format="yaml")
+        == expected
+    )
+    spy = mocker.patch("sync_with_uv.cache.process_config_text")
+    assert (
+        cached_process_config_text(cache, CONFIG_TEXT, UV_DATA, config_format="yaml")
+        == expected
+    )
+    spy.assert_not_called()
+
+
+def test_memory_cache_returns_copies() -> None:
+    cache = MemoryResultCache()
+    cache.put("k", ("text", Changes({"black": True}, {})))
+    result = cache.get("k")
+    assert result is not None
+    result[1].repos.clear()
+    assert cache.get("k") == ("text", Changes({"black": True}, {}))
+
+
+def test_memory_cache_lru_eviction() -> None:
+    cache = MemoryResultCache(max_entries=2)
+    result = ("text", Changes({}, {}))
+    cache.put("a", result)
+    cache.put("b", result)
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.put("c", result)
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_disk_cache_round_trip(tmp_path: Path) -> None:
+    cache = DiskResultCache(tmp_path / "cache")
+    assert cache.get("k") is None
+    result = (
+        "text",
+        Changes(
+            {"black": ("1", "2"), "ruff": True, "url": False},
+            {3: DepLineChange("ruff", ">=0.1", "==0.1.5")},
+        ),
+    )
+    cache.put("k", result)
+    assert cache.get("k") == result
+    assert DiskResultCache(tmp_path / "cache").get("k") == result
+
+
+def test_disk_cache_corrupt_entry_is_a_miss(tmp_path: Path) -> None:
+    cache = DiskResultCache(tmp_path)
+    (tmp_path / "k.json").write_text("not json")
+    assert cache.get("k") is None
+
+
+def test_disk_cache_size_bounded_eviction(tmp_path: Path) -> None:
+    result = ("x" * 100, Changes({}, {}))
+    entry_size = len(dump_result(result))
+    cache = DiskResultCache(tmp_path, max_bytes=2 * entry_size)
+    cache.put("a", result)
+    cache.put("b", result)
+    # make "a" the most recently used, then overflow the cache
+    os.utime(tmp_path / "a.json", (1, 1))
+    os.utime(tmp_path / "b.json", (2, 2))
+    assert cache.get("a") is not None
+    cache.put("c", result)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.json", "c.json"]
+
+
+def test_disk_cache_scans_once(tmp_path: Path, mocker: MockerFixture) -> None:
+    cache = DiskResultCache(tmp_path)
+    (tmp_path / "old.json").write_text("x" * 10)
+    scan = mocker.spy(cache, "_entries")
+    for key in "abcde":
+        cache.put(key, ("text", Changes({}, {})))
+    cache.put("a", ("other", Changes({}, {})))
+    scan.assert_called_once()
+    # the size kept up to date evicts as a scan would
+    size = sum(path.stat().st_size for path in tmp_path.glob("*.json"))
+    cache.max_bytes = size
+    cache.put("f", ("text", Changes({}, {})))
+    assert scan.call_count == 2
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.json")) <= size
+    assert not (tmp_path / "old.json").exists()
+
+
+def test_unwritable_cache_is_bypassed(tmp_path: Path) -> None:
+    # the cache directory can't be created where a file is
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("")
+    cache = DiskResultCache(cache_dir)
+    with pytest.raises(OSError, match="File exists"):
+        cache.put("k", ("text", Changes({}, {})))
+    assert cached_process_config_text(
+        cache, CONFIG_TEXT, UV_DATA, config_format="yaml"
+    ) == process_config_text(CONFIG_TEXT, UV_DATA, config_format="yaml")
+
+
+def test_cli_unwritable_cache_dir(
+    sample_uv_lock: Path, sample_precommit_config: Path, tmp_path: Path
+) -> None:
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("")
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock)]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--cache-dir", str(cache_dir)])
+    assert exc_info.value.code == 0
+    assert "23.11.0" in sample_precommit_config.read_text()
+
+
+def test_cli_cache_dir(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    tmp_path: Path,
+    mocker: MockerFixture,
+) -> None:
+    cache_dir = tmp_path / "cache"
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock)]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check", "--cache-dir", str(cache_dir)])
+    assert exc_info.value.code == 1
+    assert len(list(cache_dir.iterdir())) == 1
+
+    spy = mocker.patch("sync_with_uv.cache.process_config_text")
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check", "--cache-dir", str(cache_dir)])
+    assert exc_info.value.code == 1
+    spy.assert_not_called()
@@ -1,13 +1,20 @@
+import io
 import textwrap
 from pathlib import Path
 
 import pytest
 from colorama import Fore
+from pytest_mock import MockerFixture
 
+import sync_with_uv.cli
 from sync_with_uv import __version__
 from sync_with_uv.cli import app
 
-from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+from .test_sync import (  # noqa: F401
+    FIXED_PRECOMMIT_CONTENT,
+    sample_precommit_config,
+    sample_uv_lock,
+)
 
 
 def test_version(capsys: pytest.CaptureFixture[str]) -> None:
@@ -463,3 +470,183 @@ def test_cli_reports_unchanged_dependency_line(
     err = capsys.readouterr().err
     assert "line 6: pydantic unchanged" in err
     assert "0 dependencies changed, 1 dependency left unchanged." in err
+
+
+def test_process_precommit_cli_check_q_uses_check_path(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    mocker: MockerFixture,
+) -> None:
+    """`--check -q` reports nothing, so it skips building the fixed text."""
+    spy = mocker.spy(sync_with_uv.cli, "config_needs_sync")
+    process_spy = mocker.spy(sync_with_uv.cli, "process_config_sharded")
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock)]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check", "-q"])
+    assert exc_info.value.code == 1
+    spy.assert_called_once()
+    process_spy.assert_not_called()
+
+    with pytest.raises(SystemExit) as exc_info:
+        app(args)
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check", "-q"])
+    assert exc_info.value.code == 0
+
+
+def test_cli_keeps_non_utf8_config(
+    sample_uv_lock: Path, sample_precommit_config: Path
+) -> None:
+    """The config is synced as bytes, so other encodings pass through."""
+    config = sample_precommit_config
+    config.write_bytes(b"# caf\xe9\r\n" + config.read_bytes())
+    args = ["-p", str(config), "-u", str(sample_uv_lock), "-q"]
+    with pytest.raises(SystemExit) as exc_info:
+        app(args)
+    assert exc_info.value.code == 0
+    assert config.read_bytes().startswith(b"# caf\xe9\r\n")
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check"])
+    assert exc_info.value.code == 0
+
+
+def test_cli_stream(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), "--stream"]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check"])
+    assert exc_info.value.code == 1
+    assert "rev: 23.9.1" in sample_precommit_config.read_text()
+    with pytest.raises(SystemExit) as exc_info:
+        app(args)
+    assert exc_info.value.code == 0
+    assert capsys.readouterr().err.endswith(
+        "All done!\n2 packages changed, 2 packages left unchanged.\n"
+    )
+    content = sample_precommit_config.read_text()
+    assert "black-pre-commit-mirror\n  rev: 23.11.0" in content
+    assert "ruff-pre-commit\n  rev: v0.1.5" in content
+
+
+@pytest.mark.parametrize("check", [False, True])
+def test_cli_stdin_to_stdout(
+    sample_uv_lock: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+    *,
+    check: bool,
+) -> None:
+    config = b'[[repos]]\r\nrepo = "https://github.com/psf/black-pre-commit-mirror"\r\n'
+    monkeypatch.setattr(
+        "sys.stdin", io.TextIOWrapper(io.BytesIO(config + b'rev = "23.9.1"\r\n'))
+    )
+    args = ["-p", "-", "-u", str(sample_uv_lock), "--config-format", "toml", "-q"]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check"] if check else args)
+    assert exc_info.value.code == int(check)
+    captured = capsys.readouterr()
+    # the line endings are kept
+    assert captured.out == ("" if check else config.decode() + 'rev = "23.11.0"\r\n')
+    assert captured.err == ""
+
+
+def test_cli_stream_incompatible_options(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    with pytest.raises(SystemExit) as exc_info:
+        app(
+            [
+                *("-p", str(sample_precommit_config), "-u", str(sample_uv_lock)),
+                *("--stream", "--diff"),
+            ]
+        )
+    assert exc_info.value.code == 1
+    assert "can't be used with --diff" in capsys.readouterr().err
+
+
+def test_cli_in_place(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), "--in-place"]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--stream"])
+    assert exc_info.value.code == 1
+    assert "can't be used with --diff, --cache-dir or --in-place" in (
+        capsys.readouterr().err
+    )
+    # the new versions are longer, so the config is replaced
+    with pytest.raises(SystemExit) as exc_info:
+        app(args)
+    assert exc_info.value.code == 0
+    assert sample_precommit_config.read_text() == FIXED_PRECOMMIT_CONTENT
+    assert capsys.readouterr().err == (
+        "All done!\n2 packages changed, 2 packages left unchanged.\n"
+    )
+
+
+@pytest.mark.parametrize(
+    ("options", "max_workers"), [([], 1), (["-j", "4"], 4), (["--pipeline"], 1)]
+)
+def test_cli_serial_by_default(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    mocker: MockerFixture,
+    *,
+    options: list[str],
+    max_workers: int,
+) -> None:
+    """Only --pipeline loads uv.lock in the background, and -j shards."""
+    serial_spy = mocker.spy(sync_with_uv.cli, "process_config_sharded")
+    pipelined_spy = mocker.spy(sync_with_uv.cli, "sync_config_pipelined")
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), "-q"]
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, *options])
+    assert exc_info.value.code == 0
+    assert sample_precommit_config.read_text() == FIXED_PRECOMMIT_CONTENT
+    spy = pipelined_spy if "--pipeline" in options else serial_spy
+    spy.assert_called_once()
+    assert spy.call_args.kwargs["max_workers"] == max_workers
+    (serial_spy if spy is pipelined_spy else pipelined_spy).assert_not_called()
+
+
+@pytest.mark.usefixtures("sample_uv_lock")
+def test_cli_fleet_patch(
+    sample_precommit_config: Path,
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    (tmp_path / "other").mkdir()
+    monkeypatch.chdir(tmp_path)
+    before = sample_precommit_config.read_text()
+    with pytest.raises(SystemExit) as exc_info:
+        app(["patch", ".", "other", "-o", "fleet.patch"])
+    # the project without a config is reported, the other is still patched
+    assert exc_info.value.code == 123
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert captured.err.startswith("Error: ")
+    assert captured.err.endswith("All done! 1 of 2 projects would be changed.\n")
+    patch = (tmp_path / "fleet.patch").read_text()
+    assert patch.startswith(
+        "diff --git a/.pre-commit-config.yaml b/.pre-commit-config.yaml\n"
+    )
+    assert "+  rev: 23.11.0  # a comment\n" in patch
+    assert sample_precommit_config.read_text() == before
+    with pytest.raises(SystemExit) as exc_info:
+        app(["patch", "-q"])
+    assert exc_info.value.code == 0
+    captured = capsys.readouterr()
+    assert captured.out == patch
+    assert captured.err == ""
+    with pytest.raises(SystemExit) as exc_info:
+        app(["patch", "-q", "--prefetch-projects", "0", "--prefetch-bytes", "1"])
+    assert exc_info.value.code == 0
+    assert capsys.readouterr().out == patch
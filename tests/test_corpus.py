@@ -0,0 +1,63 @@
+from typing import Literal
+
+import pytest
+
+from sync_with_uv.repo_data import REPO_TO_PACKAGE
+from sync_with_uv.sync_with_uv import _parse_uv_lock, process_config_text
+
+from .corpus import (
+    ROOT_PROJECT,
+    format_config,
+    generate_corpus,
+    generate_versions,
+)
+
+
+def test_generate_corpus_is_reproducible() -> None:
+    assert generate_corpus(50, 20, 30, seed=1) == generate_corpus(50, 20, 30, seed=1)
+    assert generate_corpus(50, 20, 30, seed=1) != generate_corpus(50, 20, 30, seed=2)
+
+
+def test_generate_versions() -> None:
+    versions = generate_versions(100)
+    assert len(versions) == 100
+    assert set(REPO_TO_PACKAGE.values()) <= versions.keys()
+    assert len(generate_versions(3)) == 3
+
+
+@pytest.mark.parametrize("n_wheels", [0, 3, 20])
+def test_uv_lock(n_wheels: int) -> None:
+    corpus = generate_corpus(40, 0, 0, n_wheels=n_wheels)
+    assert _parse_uv_lock(corpus.uv_lock) == corpus.versions
+    assert corpus.versions[ROOT_PROJECT] == "0.1.0"
+    assert corpus.uv_lock.count(".whl") == 40 * n_wheels
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+def test_config_syncs(config_format: Literal["yaml", "toml"]) -> None:
+    corpus = generate_corpus(200, 100, 250, config_format=config_format)
+    assert corpus.config.count("# sync-with-uv") == 250
+    fixed_text, changes = process_config_text(
+        corpus.config, corpus.versions, config_format=config_format
+    )
+    assert len(changes.lines) == 250
+    # mapped repos, unmapped repos of locked packages and unknown repos
+    assert any(isinstance(change, tuple) for change in changes.repos.values())
+    assert True in changes.repos.values()
+    assert False in changes.repos.values()
+    # syncing again is a no-op
+    assert process_config_text(
+        fixed_text, corpus.versions, config_format=config_format
+    )[0] == (fixed_text)
+
+
+def test_config_size_scales() -> None:
+    versions = generate_versions(100)
+    small = format_config(versions, 100, 100).count("\n")
+    large = format_config(versions, 1000, 1000).count("\n")
+    assert large == pytest.approx(10 * small, rel=0.01)
+
+
+def test_pragma_lines_need_repos() -> None:
+    with pytest.raises(ValueError, match="at least one repo"):
+        format_config({"a": "1.0"}, 0, 1)
@@ -0,0 +1,83 @@
+import pytest
+
+from sync_with_uv.dependency_line import (
+    DepLineEdit,
+    DepLineError,
+    sync_dependency_line,
+    sync_dependency_lines,
+)
+from sync_with_uv.stats import SyncStats
+
+from .corpus import generate_corpus
+
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5"}
+
+
+def _sync_each_line(
+    lines: list[str], uv_data: dict[str, str], stats: SyncStats | None = None
+) -> tuple[list[DepLineEdit], list[DepLineError]]:
+    edits = []
+    errors = []
+    for line_number, line in enumerate(lines, start=1):
+        result = sync_dependency_line(line, uv_data, stats)
+        if isinstance(result, str):
+            errors.append(DepLineError(line_number, result))
+        elif result is not None:
+            edits.append(DepLineEdit(line_number, line, *result))
+    return edits, errors
+
+
+def test_sync_dependency_lines() -> None:
+    text = (
+        "additional_dependencies:\n"
+        "  - ruff>=0.1  # sync-with-uv\n"
+        "  - black==23.11.0  # sync-with-uv\n"
+        "  - repo: https://github.com/tsvikas/sync-with-uv\n"
+        "  - missing  # sync-with-uv\n"
+        "  - black  # sync-with-uv"
+    )
+    edits, errors = sync_dependency_lines(text, UV_DATA)
+    assert [(edit.line_number, edit.new_line) for edit in edits] == [
+        (2, "  - ruff==0.1.5  # sync-with-uv\n"),
+        (3, "  - black==23.11.0  # sync-with-uv\n"),
+        (6, "  - black==23.11.0  # sync-with-uv"),
+    ]
+    assert [edit.change.changed for edit in edits] == [True, False, True]
+    assert errors == [DepLineError(5, "'missing' is not in uv.lock")]
+
+
+@pytest.mark.parametrize("line_ending", ["\n", "\r\n", "\r"])
+@pytest.mark.parametrize("as_buffer", [True, False])
+def test_sync_dependency_lines_matches_each_line(
+    line_ending: str, *, as_buffer: bool
+) -> None:
+    corpus = generate_corpus(50, 100, 300, seed=3)
+    text = corpus.config.replace("\n", line_ending)
+    lines = text.splitlines(keepends=True)
+    # a line of another format, and an unknown package
+    lines.insert(5, f'"black", # sync-with-uv{line_ending}')
+    lines.append("- unknown-package  # sync-with-uv")
+    bulk_stats = SyncStats()
+    each_stats = SyncStats()
+    bulk = sync_dependency_lines(
+        "".join(lines) if as_buffer else lines, corpus.versions, bulk_stats
+    )
+    assert bulk == _sync_each_line(lines, corpus.versions, each_stats)
+    assert len(bulk[0]) == 301
+    assert bulk[1]
+    assert bulk_stats == each_stats
+
+
+def test_sync_dependency_lines_other_line_breaks() -> None:
+    text = "- ruff  # sync-with-uv\u2028- black  # sync-with-uv\x0c- ruff\n"
+    edits, errors = sync_dependency_lines(text, UV_DATA)
+    assert [(edit.line_number, edit.new_line) for edit in edits] == [
+        (1, "- ruff==0.1.5  # sync-with-uv\u2028"),
+        (2, "- black==23.11.0  # sync-with-uv\x0c"),
+    ]
+    assert not errors
+
+
+def test_sync_dependency_lines_empty() -> None:
+    assert sync_dependency_lines("", UV_DATA) == ([], [])
+    assert sync_dependency_lines([], UV_DATA) == ([], [])
@@ -0,0 +1,154 @@
+import difflib
+import textwrap
+from pathlib import Path
+
+import pytest
+
+from sync_with_uv.cli import app
+from sync_with_uv.diff import git_patch_from_edits, unified_diff_from_edits
+from sync_with_uv.sync_with_uv import LineEdit, apply_line_edits, sync_config_lines
+
+from .test_sync import (  # noqa: F401
+    FIXED_PRECOMMIT_CONTENT,
+    sample_precommit_config,
+    sample_uv_lock,
+)
+
+# Blocks of unrelated hooks between synced repos, so hunks are sometimes merged
+# and sometimes separate depending on the context size.
+_FILLER = "".join(f"  - id: hook-{i}\n" for i in range(5))
+CONFIG_TEXT = (
+    textwrap.dedent("""\
+    repos:
+    - repo: https://github.com/psf/black-pre-commit-mirror
+      rev: 23.9.1
+      hooks:
+        - id: black
+          additional_dependencies:
+            - ruff>=0.1  # sync-with-uv
+            - black  # sync-with-uv
+    """)
+    + _FILLER
+    + textwrap.dedent("""\
+    - repo: https://github.com/astral-sh/ruff-pre-commit
+      rev: v0.0.292
+    """)
+    + _FILLER * 3
+    + textwrap.dedent("""\
+    - repo: https://github.com/pre-commit/mirrors-mypy
+      rev: v1.0.0
+    """)
+)
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5", "mypy": "1.6.0"}
+
+
+def _expected_diff(old_text: str, new_text: str, n: int) -> list[str]:
+    return list(
+        difflib.unified_diff(
+            old_text.splitlines(keepends=True),
+            new_text.splitlines(keepends=True),
+            fromfile="a",
+            tofile="b",
+            n=n,
+        )
+    )
+
+
+@pytest.mark.parametrize("n", [0, 1, 3, 10])
+@pytest.mark.parametrize("stamp", [None, "abc"])
+def test_unified_diff_from_edits_matches_difflib(n: int, stamp: str | None) -> None:
+    lines = CONFIG_TEXT.splitlines(keepends=True)
+    edits, _changes = sync_config_lines(
+        lines, UV_DATA, config_format="yaml", stamp=stamp
+    )
+    new_text = apply_line_edits(lines, edits)
+    assert list(unified_diff_from_edits(lines, edits, "a", "b", n=n)) == (
+        _expected_diff(CONFIG_TEXT, new_text, n)
+    )
+
+
+@pytest.mark.parametrize(
+    ("old_lines", "edits"),
+    [
+        ([], []),
+        (["a\n"], []),
+        ([], [LineEdit(1, "", "x\n")]),
+        (["a\n", "b\n"], [LineEdit(1, "", "x\n"), LineEdit(1, "a\n", "y\n")]),
+        (["a\n", "b\n", "c\n"], [LineEdit(3, "c\n", "z\n")]),
+        (["a\n", "b"], [LineEdit(2, "b", "z")]),
+    ],
+)
+def test_unified_diff_from_edits_edge_cases(
+    old_lines: list[str], edits: list[LineEdit]
+) -> None:
+    new_text = apply_line_edits(old_lines, edits)
+    assert list(unified_diff_from_edits(old_lines, edits, "a", "b")) == (
+        _expected_diff("".join(old_lines), new_text, 3)
+    )
+
+
+def test_cli_diff_output(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+) -> None:
+    old_text = sample_precommit_config.read_text()
+    with pytest.raises(SystemExit) as exc_info:
+        app(
+            [
+                *("-p", str(sample_precommit_config), "-u", str(sample_uv_lock)),
+                *("--diff", "--diff-context", "1"),
+            ]
+        )
+    assert exc_info.value.code == 0
+    name = str(sample_precommit_config)
+    expected = difflib.unified_diff(
+        old_text.splitlines(keepends=True),
+        FIXED_PRECOMMIT_CONTENT.splitlines(keepends=True),
+        fromfile=name,
+        tofile=name,
+        n=1,
+    )
+    assert capsys.readouterr().out == "".join(expected)
+
+
+@pytest.mark.parametrize(
+    ("old_lines", "edits", "expected"),
+    [
+        (["a\n"], [], []),
+        (
+            ["a\n", "b"],
+            [LineEdit(2, "b", "z")],
+            [
+                "diff --git a/d/f b/d/f\n",
+                "--- a/d/f\n",
+                "+++ b/d/f\n",
+                "@@ -1,2 +1,2 @@\n",
+                " a\n",
+                "-b\n",
+                "\\ No newline at end of file\n",
+                "+z\n",
+                "\\ No newline at end of file\n",
+            ],
+        ),
+        (
+            # git splits lines only at "\n", so this is one line
+            ["a\r", "b\r"],
+            [LineEdit(2, "b\r", "z\r")],
+            [
+                "diff --git a/d/f b/d/f\n",
+                "--- a/d/f\n",
+                "+++ b/d/f\n",
+                "@@ -1 +1 @@\n",
+                "-a\rb\r\n",
+                "\\ No newline at end of file\n",
+                "+a\rz\r\n",
+                "\\ No newline at end of file\n",
+            ],
+        ),
+    ],
+)
+def test_git_patch_from_edits(
+    old_lines: list[str], edits: list[LineEdit], expected: list[str]
+) -> None:
+    assert list(git_patch_from_edits(old_lines, edits, "d/f")) == expected
@@ -0,0 +1,148 @@
+import errno
+import os
+import stat
+from pathlib import Path
+
+import pytest
+
+import sync_with_uv.in_place
+from sync_with_uv.in_place import replace_file, write_in_place
+from sync_with_uv.sync_with_uv import ByteEdit, process_config_bytes
+
+from .corpus import generate_corpus
+
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5"}
+CONFIG = (
+    b"repos:\r\n"
+    b"- repo: https://github.com/psf/black\r\n"
+    b"  rev: 23.10.0  # caf\xe9\r\n"
+    b"  hooks:\r\n"
+    b"    - id: black\r\n"
+    b"      additional_dependencies:\r\n"
+    b"        - ruff==0.1.4  # sync-with-uv\r\n"
+)
+FIXED = CONFIG.replace(b"23.10.0", b"23.11.0").replace(b"0.1.4", b"0.1.5")
+# without os.pwrite, as on Windows, every write replaces the file
+needs_pwrite = pytest.mark.skipif(
+    not hasattr(os, "pwrite"), reason="os.pwrite is not available"
+)
+
+
+def _sync(
+    config: bytes, uv_data: dict[str, str], stamp: str | None = None
+) -> tuple[bytes, list[ByteEdit]]:
+    edits: list[ByteEdit] = []
+    fixed, _changes = process_config_bytes(
+        config, uv_data, config_format="yaml", stamp=stamp, byte_edits=edits
+    )
+    return fixed, edits
+
+
+@pytest.mark.parametrize("stamp", [None, "abc"])
+def test_process_config_bytes_edits(stamp: str | None) -> None:
+    corpus = generate_corpus(20, 40, 80, seed=5)
+    config = corpus.config.encode()
+    fixed, edits = _sync(config, corpus.versions, stamp)
+    assert edits
+    # the edits are in order, and splice the config into the synced one
+    parts = []
+    position = 0
+    for edit in edits:
+        assert config[edit.offset : edit.offset + len(edit.old)] == edit.old
+        parts += [config[position : edit.offset], edit.new]
+        position = edit.offset + len(edit.old)
+    assert b"".join([*parts, config[position:]]) == fixed
+    assert (edits[0].old == b"") == (stamp is not None)
+
+
+@needs_pwrite
+def test_write_in_place(tmp_path: Path) -> None:
+    config = tmp_path / "config.yaml"
+    config.write_bytes(CONFIG)
+    inode = config.stat().st_ino
+    fixed, edits = _sync(CONFIG, UV_DATA)
+    assert fixed == FIXED
+    assert [edit.offset for edit in edits] == [
+        CONFIG.index(b"  rev"),
+        CONFIG.index(b"        - ruff"),
+    ]
+    assert write_in_place(config, CONFIG, fixed, edits)
+    assert config.read_bytes() == FIXED
+    # the file was patched rather than replaced
+    assert config.stat().st_ino == inode
+    assert write_in_place(config, FIXED, FIXED, [])
+
+
+@pytest.mark.parametrize("case", ["longer", "unknown", "changed", "truncated"])
+def test_write_in_place_falls_back(tmp_path: Path, case: str) -> None:
+    config = tmp_path / "config.yaml"
+    config.write_bytes(CONFIG)
+    config.chmod(0o640)
+    fixed, edits = _sync(
+        CONFIG, {**UV_DATA, "black": "24.1.0"} if case == "longer" else UV_DATA
+    )
+    if case == "changed":
+        config.write_bytes(CONFIG.replace(b"23.10.0", b"23.10.1"))
+    elif case == "truncated":
+        config.write_bytes(CONFIG[:-1])
+    assert not write_in_place(
+        config, CONFIG, fixed, None if case == "unknown" else edits
+    )
+    assert config.read_bytes() == fixed
+    if os.name == "posix":  # Windows only has a read-only flag
+        assert stat.S_IMODE(config.stat().st_mode) == 0o640
+    assert [path.name for path in tmp_path.iterdir()] == ["config.yaml"]
+
+
+@needs_pwrite
+def test_write_in_place_checks_the_hash(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config = tmp_path / "config.yaml"
+    config.write_bytes(CONFIG)
+    inode = config.stat().st_ino
+    fixed, edits = _sync(CONFIG, UV_DATA)
+    monkeypatch.setattr(sync_with_uv.in_place, "_file_digest", lambda _fd: b"")
+    assert not write_in_place(config, CONFIG, fixed, edits)
+    assert config.read_bytes() == FIXED
+    assert config.stat().st_ino != inode
+
+
+@needs_pwrite
+def test_write_in_place_write_error(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A file left half patched by a failed write is replaced."""
+    config = tmp_path / "config.yaml"
+    config.write_bytes(CONFIG)
+    fixed, edits = _sync(CONFIG, UV_DATA)
+    pwrite = os.pwrite
+    calls = []
+
+    def fail_second(fd: int, data: bytes, offset: int) -> int:
+        calls.append(offset)
+        if len(calls) == 2:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return pwrite(fd, data, offset)
+
+    monkeypatch.setattr(os, "pwrite", fail_second)
+    assert not write_in_place(config, CONFIG, fixed, edits)
+    assert len(calls) == 2
+    assert config.read_bytes() == FIXED
+    assert [path.name for path in tmp_path.iterdir()] == ["config.yaml"]
+
+
+def test_replace_file_failure_keeps_file(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config = tmp_path / "config.yaml"
+    config.write_bytes(CONFIG)
+
+    def fail(*_args: object) -> None:
+        raise PermissionError
+
+    monkeypatch.setattr("shutil.copymode", fail)
+    with pytest.raises(PermissionError):
+        replace_file(config, FIXED)
+    assert config.read_bytes() == CONFIG
+    assert [path.name for path in tmp_path.iterdir()] == ["config.yaml"]
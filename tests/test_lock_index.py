@@ -0,0 +1,121 @@
+from pathlib import Path
+
+import pytest
+import tomli
+from pytest_mock import MockerFixture
+
+from sync_with_uv.cli import app
+from sync_with_uv.lock_index import (
+    LOCK_INDEX_FILENAME,
+    digest_bytes,
+    format_lock_index,
+    parse_lock_index,
+)
+from sync_with_uv.sync_with_uv import load_uv_lock, write_lock_index
+
+from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+
+UV_DATA = {"ruff": "0.1.5", "black": "23.11.0"}
+
+
+def test_format_parse_round_trip() -> None:
+    text = format_lock_index("abc", UV_DATA)
+    assert text == "sync-with-uv-lockindex 1 abc\nblack 23.11.0\nruff 0.1.5\n"
+    assert parse_lock_index(text, "abc") == UV_DATA
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "sync-with-uv-lockindex 1 other\nblack 23.11.0\n",
+        "sync-with-uv-lockindex 2 abc\nblack 23.11.0\n",
+        "sync-with-uv-lockindex 1 abc\nblack\n",
+        "something else\n",
+    ],
+)
+def test_parse_lock_index_rejects(text: str) -> None:
+    assert parse_lock_index(text, "abc") is None
+
+
+def test_write_lock_index(sample_uv_lock: Path) -> None:
+    index_path = write_lock_index(sample_uv_lock)
+    assert index_path == sample_uv_lock.parent / LOCK_INDEX_FILENAME
+    assert parse_lock_index(
+        index_path.read_text(), digest_bytes(sample_uv_lock.read_bytes())
+    ) == load_uv_lock(sample_uv_lock)
+
+
+def test_load_uv_lock_uses_matching_index(
+    sample_uv_lock: Path, mocker: MockerFixture
+) -> None:
+    expected = load_uv_lock(sample_uv_lock)
+    write_lock_index(sample_uv_lock)
+    spy = mocker.spy(tomli, "loads")
+    assert load_uv_lock(sample_uv_lock) == expected
+    spy.assert_not_called()
+
+
+def test_load_uv_lock_rebuilds_stale_index(sample_uv_lock: Path) -> None:
+    index_path = write_lock_index(sample_uv_lock)
+    sample_uv_lock.write_text(
+        sample_uv_lock.read_text().replace('version = "0.1.5"', 'version = "0.2.0"')
+    )
+    assert load_uv_lock(sample_uv_lock)["ruff"] == "0.2.0"
+    assert parse_lock_index(
+        index_path.read_text(), digest_bytes(sample_uv_lock.read_bytes())
+    ) == load_uv_lock(sample_uv_lock)
+
+
+def test_load_uv_lock_without_index_does_not_create_one(sample_uv_lock: Path) -> None:
+    load_uv_lock(sample_uv_lock)
+    assert not (sample_uv_lock.parent / LOCK_INDEX_FILENAME).exists()
+
+
+def _snapshot(directory: Path) -> dict[str, bytes]:
+    return {path.name: path.read_bytes() for path in sorted(directory.iterdir())}
+
+
+@pytest.mark.parametrize(
+    ("options", "code"),
+    [
+        (["--check"], 1),
+        (["--check", "-q"], 1),
+        (["--check", "--stream"], 1),
+        (["--diff"], 0),
+    ],
+)
+def test_cli_read_only_keeps_stale_index(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    options: list[str],
+    code: int,
+) -> None:
+    """--check and --diff leave the tree byte-for-byte unchanged."""
+    write_lock_index(sample_uv_lock)
+    sample_uv_lock.write_text(
+        sample_uv_lock.read_text().replace('version = "0.1.5"', 'version = "0.2.0"')
+    )
+    before = _snapshot(sample_uv_lock.parent)
+    with pytest.raises(SystemExit) as exc_info:
+        app(["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), *options])
+    assert exc_info.value.code == code
+    assert _snapshot(sample_uv_lock.parent) == before
+
+
+def test_cli_index(sample_uv_lock: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit) as exc_info:
+        app(["index", "-u", str(sample_uv_lock)])
+    assert exc_info.value.code == 0
+    index_path = sample_uv_lock.parent / LOCK_INDEX_FILENAME
+    assert capsys.readouterr().err == f"Wrote {index_path}\n"
+    assert index_path.is_file()
+
+
+def test_cli_index_error(tmp_path: Path, capsys: pytest.CaptureFixture[str]) -> None:
+    uv_lock = tmp_path / "uv.lock"
+    uv_lock.write_text("not toml")
+    with pytest.raises(SystemExit) as exc_info:
+        app(["index", "-u", str(uv_lock), "-q"])
+    assert exc_info.value.code == 123
+    assert capsys.readouterr().err.startswith("Error:")
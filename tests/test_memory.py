@@ -0,0 +1,159 @@
+"""Memory budgets of the sync stages, traced with tracemalloc.
+
+Traced allocations don't depend on the machine's load, so unlike the timing
+benchmarks these budgets are checked in every test run. Each budget is a
+multiple of the stage's input or output size, checked across input sizes so
+that memory growing faster than the input is caught too.
+"""
+
+import functools
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+import pytest
+
+from sync_with_uv.bench import MemoryResult, format_memory_results, measure_memory
+from sync_with_uv.repo_data import load_user_mappings
+from sync_with_uv.sync_with_uv import (
+    load_uv_lock,
+    process_config_bytes,
+    process_config_text,
+    sync_config_file,
+)
+
+from .corpus import generate_corpus
+
+SIZES = [100, 200, 400]
+
+
+def _map_size(mapping: dict[str, str]) -> int:
+    """Return the size of a dict of strings, including the strings."""
+    return sys.getsizeof(mapping) + sum(
+        sys.getsizeof(key) + sys.getsizeof(value) for key, value in mapping.items()
+    )
+
+
+def _measure(case: Callable[[], object]) -> MemoryResult:
+    case()  # warm up lazy imports and caches
+    return measure_memory("case", case)
+
+
+def test_measure_memory() -> None:
+    # the result is retained, the temporary bytearray only counts to the peak
+    result = _measure(lambda: [str(i) for i in range(1000)][len(bytearray(10**6)) :])
+    assert result.peak_bytes >= 10**6
+    assert 0 < result.retained_bytes < 1000
+    result = _measure(lambda: [str(i) for i in range(1000)])
+    assert result.retained_blocks >= 1000
+    assert format_memory_results([result]).splitlines()[1].split()[0] == "case"
+
+
+@pytest.mark.parametrize("n_packages", SIZES)
+def test_load_uv_lock_memory(n_packages: int, tmp_path: Path) -> None:
+    corpus = generate_corpus(n_packages, 0, 0, n_wheels=8)
+    uv_lock = tmp_path / "uv.lock"
+    uv_lock.write_text(corpus.uv_lock)
+    result = _measure(lambda: load_uv_lock(uv_lock))
+    # parsing builds the whole TOML tree, which is a few times the file size
+    assert result.peak_bytes < 6 * len(corpus.uv_lock)
+    # but only the versions are kept
+    assert result.retained_bytes < 2 * _map_size(corpus.versions) + 64 * 1024
+    assert result.retained_blocks < 3 * len(corpus.versions) + 500
+
+
+@pytest.mark.parametrize("n_mappings", SIZES)
+def test_load_user_mappings_memory(n_mappings: int, tmp_path: Path) -> None:
+    pyproject = tmp_path / "pyproject.toml"
+    pyproject.write_text(
+        "[tool.sync-with-uv.repo-to-package]\n"
+        + "".join(
+            f'"https://github.com/example-org/tool-{i}" = "tool-{i}"\n'
+            for i in range(n_mappings)
+        )
+        + "[tool.sync-with-uv.repo-to-version-template]\n"
+        + "".join(
+            f'"https://github.com/example-org/tool-{i}" = "v${{version}}"\n'
+            for i in range(n_mappings)
+        )
+    )
+    result = _measure(lambda: load_user_mappings(pyproject))
+    repo_mappings, version_mappings = load_user_mappings(pyproject)
+    output_size = _map_size(repo_mappings) + _map_size(version_mappings)
+    assert result.peak_bytes < 4 * output_size + 64 * 1024
+    assert result.retained_bytes < 2 * output_size + 64 * 1024
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+@pytest.mark.parametrize("n_repos", SIZES)
+def test_process_config_text_memory(
+    n_repos: int, config_format: Literal["yaml", "toml"]
+) -> None:
+    corpus = generate_corpus(
+        n_repos // 2, n_repos, 2 * n_repos, config_format=config_format
+    )
+    result = _measure(
+        lambda: process_config_text(
+            corpus.config, corpus.versions, config_format=config_format
+        )
+    )
+    # the lines of the config, the updated config and the changes
+    assert result.peak_bytes < 12 * len(corpus.config)
+    assert result.retained_bytes < 6 * len(corpus.config)
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+@pytest.mark.parametrize("n_repos", SIZES)
+def test_process_config_bytes_memory(
+    n_repos: int, config_format: Literal["yaml", "toml"]
+) -> None:
+    corpus = generate_corpus(
+        n_repos // 2, n_repos, 2 * n_repos, config_format=config_format
+    )
+    config_bytes = corpus.config.encode()
+    result = _measure(
+        lambda: process_config_bytes(
+            config_bytes, corpus.versions, config_format=config_format
+        )
+    )
+    # the lines of the config, a text view of one batch of them, the updated
+    # config and the changes
+    assert result.peak_bytes < 10 * len(config_bytes)
+    assert result.retained_bytes < 4 * len(config_bytes)
+
+
+def test_sync_config_file_memory(tmp_path: Path) -> None:
+    """Streaming a config takes the same memory whatever its size."""
+    peaks = []
+    sizes = []
+    for n_repos in (1000, 4000):
+        # few packages, so that the caches don't grow with the config either
+        corpus = generate_corpus(50, n_repos, 2 * n_repos)
+        config = tmp_path / f"config-{n_repos}.yaml"
+        config.write_text(corpus.config)
+        sync = functools.partial(
+            sync_config_file, config, corpus.versions, config_format="yaml", check=True
+        )
+        peaks.append(_measure(sync).peak_bytes)
+        sizes.append(len(corpus.config))
+    assert peaks[1] < 1.2 * peaks[0]
+    assert peaks[1] < sizes[1] // 2
+
+
+def test_sync_config_stream_memory_without_tokens(tmp_path: Path) -> None:
+    """Lines without a token are written on, not held until the next token."""
+    peaks = []
+    for n_lines in (10_000, 100_000):
+        config = tmp_path / f"config-{n_lines}.yaml"
+        config.write_text(
+            "repos:\n- repo: local\n  hooks:\n  - id: x\n    args:\n"
+            + "".join(f"    - --option-{i}\n" for i in range(n_lines))
+            + "- repo: https://github.com/psf/black\n  rev: 23.9.1\n"
+        )
+        sync = functools.partial(
+            sync_config_file, config, {"black": "23.11.0"}, config_format="yaml"
+        )
+        peaks.append(_measure(sync).peak_bytes)
+        assert config.read_text().endswith("rev: 23.11.0\n")
+    assert peaks[1] < 1.2 * peaks[0]
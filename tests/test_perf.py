@@ -0,0 +1,144 @@
+"""Benchmarks of the hot paths, gated against the stored baseline.
+
+See ``tests/conftest.py`` for how to run the gate.
+"""
+
+import subprocess
+import sys
+from collections.abc import Callable
+from pathlib import Path
+from typing import Literal
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+from sync_with_uv.dependency_line import sync_dependency_line
+from sync_with_uv.sync_with_uv import (
+    load_uv_lock,
+    process_config_bytes,
+    process_config_text,
+)
+
+from .conftest import PerfResult
+from .corpus import Corpus, generate_corpus
+from .test_scaling import ADVERSARIAL_LINES
+
+pytestmark = [pytest.mark.perf, pytest.mark.benchmark(group="hot-paths")]
+
+
+@pytest.fixture(scope="module")
+def corpus() -> Corpus:
+    return generate_corpus(500, 1000, 2000, n_wheels=8)
+
+
+@pytest.fixture(scope="module")
+def corpus_uv_lock(corpus: Corpus, tmp_path_factory: pytest.TempPathFactory) -> Path:
+    uv_lock = tmp_path_factory.mktemp("perf") / "uv.lock"
+    uv_lock.write_text(corpus.uv_lock)
+    return uv_lock
+
+
+def test_perf_load_uv_lock(
+    benchmark: BenchmarkFixture,
+    perf_gate: Callable[[BenchmarkFixture], None],
+    corpus: Corpus,
+    corpus_uv_lock: Path,
+) -> None:
+    assert benchmark(load_uv_lock, corpus_uv_lock) == corpus.versions
+    perf_gate(benchmark)
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+def test_perf_process_config_text(
+    benchmark: BenchmarkFixture,
+    perf_gate: Callable[[BenchmarkFixture], None],
+    config_format: Literal["yaml", "toml"],
+) -> None:
+    corpus = generate_corpus(500, 1000, 2000, config_format=config_format)
+    _text, changes = benchmark(
+        process_config_text, corpus.config, corpus.versions, config_format=config_format
+    )
+    assert len(changes.lines) == 2000
+    perf_gate(benchmark)
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+def test_perf_process_config_bytes(
+    benchmark: BenchmarkFixture,
+    perf_gate: Callable[[BenchmarkFixture], None],
+    config_format: Literal["yaml", "toml"],
+) -> None:
+    corpus = generate_corpus(500, 1000, 2000, config_format=config_format)
+    _fixed, changes = benchmark(
+        process_config_bytes,
+        corpus.config.encode(),
+        corpus.versions,
+        config_format=config_format,
+    )
+    assert len(changes.lines) == 2000
+    perf_gate(benchmark)
+
+
+def test_perf_sync_dependency_line(
+    benchmark: BenchmarkFixture,
+    perf_gate: Callable[[BenchmarkFixture], None],
+    corpus: Corpus,
+) -> None:
+    lines = corpus.config.splitlines(keepends=True)
+
+    def sync_all() -> int:
+        return sum(
+            sync_dependency_line(line, corpus.versions) is not None for line in lines
+        )
+
+    assert benchmark(sync_all) == 2000
+    perf_gate(benchmark)
+
+
+def test_perf_sync_dependency_line_pragma_free(
+    benchmark: BenchmarkFixture, perf_gate: Callable[[BenchmarkFixture], None]
+) -> None:
+    corpus = generate_corpus(500, 1000, 0)
+    lines = corpus.config.splitlines(keepends=True)
+
+    def sync_all() -> int:
+        return sum(
+            sync_dependency_line(line, corpus.versions) is not None for line in lines
+        )
+
+    assert benchmark(sync_all) == 0
+    perf_gate(benchmark)
+
+
+def test_perf_adversarial_dependency_lines(
+    benchmark: BenchmarkFixture, perf_gate: Callable[[BenchmarkFixture], None]
+) -> None:
+    lines = [build(10_000) for build in ADVERSARIAL_LINES.values()]
+    uv_data = {"a": "1.0"}
+
+    def sync_all() -> list[object]:
+        return [sync_dependency_line(line, uv_data) for line in lines]
+
+    assert len(benchmark(sync_all)) == len(ADVERSARIAL_LINES)
+    perf_gate(benchmark)
+
+
+def test_perf_cli_startup(
+    benchmark: BenchmarkFixture, perf_gate: Callable[[BenchmarkFixture], None]
+) -> None:
+    command = [sys.executable, "-m", "sync_with_uv", "--version"]
+    result = benchmark(subprocess.run, command, check=True, capture_output=True)
+    assert result.stdout
+    perf_gate(benchmark)
+
+
+@pytest.mark.parametrize(
+    ("ratio", "baseline_ratio", "failed"),
+    [(1.2, 1.0, False), (1.3, 1.0, True), (0.5, 1.0, False), (9.0, None, False)],
+)
+def test_perf_result(
+    ratio: float, baseline_ratio: float | None, *, failed: bool
+) -> None:
+    result = PerfResult("bench", ratio, baseline_ratio, 0.25)
+    assert result.failed is failed
+    assert result.describe().startswith("bench: ")
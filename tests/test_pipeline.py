@@ -0,0 +1,144 @@
+from pathlib import Path
+from typing import Literal
+
+import pytest
+import tomli
+from pytest_mock import MockerFixture
+
+import sync_with_uv.pipeline
+from sync_with_uv.pipeline import sync_config_pipelined
+from sync_with_uv.profiling import Profiler
+from sync_with_uv.stats import SyncStats
+from sync_with_uv.sync_with_uv import (
+    ByteEdit,
+    load_uv_lock,
+    process_config_bytes,
+    process_scanned_config,
+    scan_config_bytes,
+)
+
+from .corpus import generate_corpus
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+@pytest.mark.parametrize("stamp", [None, "abc"])
+def test_process_scanned_config_matches_process_config_bytes(
+    config_format: Literal["yaml", "toml"], stamp: str | None
+) -> None:
+    # more lines than a tokenizer batch, with repeated repos
+    corpus = generate_corpus(50, 600, 1200, config_format=config_format, seed=3)
+    config = corpus.config.encode()
+    user_repo_mappings = {"https://github.com/example-org/tool-1": "tool-2"}
+    expected_edits: list[ByteEdit] = []
+    expected_stats = SyncStats()
+    expected = process_config_bytes(
+        config,
+        corpus.versions,
+        config_format=config_format,
+        user_repo_mappings=user_repo_mappings,
+        stamp=stamp,
+        stats=expected_stats,
+        byte_edits=expected_edits,
+    )
+    scanned = scan_config_bytes(
+        config, config_format=config_format, user_repo_mappings=user_repo_mappings
+    )
+    byte_edits: list[ByteEdit] = []
+    stats = SyncStats()
+    result = process_scanned_config(
+        scanned,
+        corpus.versions,
+        stamp=stamp,
+        stats=stats,
+        byte_edits=byte_edits,
+    )
+    assert result == expected
+    assert byte_edits == expected_edits
+    # the packages were resolved by the scan, so only their lookups are hits
+    lookups = expected_stats.mapping_cache_hits + expected_stats.mapping_cache_misses
+    assert stats.mapping_cache_hits + stats.mapping_cache_misses == lookups
+    assert stats.mapping_cache_misses < expected_stats.mapping_cache_misses
+    stats.mapping_cache_hits = expected_stats.mapping_cache_hits
+    stats.mapping_cache_misses = expected_stats.mapping_cache_misses
+    assert stats == expected_stats
+
+
+def test_process_scanned_config_invalid_dependency() -> None:
+    config = (
+        b"- repo: local\n  hooks:\n    - id: x\n      entry: black  # sync-with-uv\n"
+    )
+    scanned = scan_config_bytes(config, config_format="yaml")
+    with pytest.raises(ValueError, match="line 4"):
+        process_scanned_config(scanned, {"ruff": "0.1.5"})
+
+
+def _write_project(
+    tmp_path: Path, config_format: Literal["yaml", "toml"]
+) -> tuple[Path, Path, dict[str, str]]:
+    corpus = generate_corpus(50, 300, 600, config_format=config_format, seed=5)
+    config_path = tmp_path / f"config.{config_format}"
+    config_path.write_text(corpus.config)
+    uv_lock_path = tmp_path / "uv.lock"
+    uv_lock_path.write_text(corpus.uv_lock)
+    return config_path, uv_lock_path, corpus.versions
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+def test_sync_config_pipelined(
+    config_format: Literal["yaml", "toml"], tmp_path: Path
+) -> None:
+    config_path, uv_lock_path, _versions = _write_project(tmp_path, config_format)
+    config = config_path.read_bytes()
+    expected = process_config_bytes(
+        config, load_uv_lock(uv_lock_path), config_format=config_format, stamp="abc"
+    )
+    profiler = Profiler()
+    synced = sync_config_pipelined(
+        config_path,
+        uv_lock_path,
+        config_format=config_format,
+        stamp="abc",
+        profiler=profiler,
+    )
+    assert (synced.fixed_bytes, synced.changes) == expected
+    assert synced.config_bytes == config
+    assert synced.uv_data == load_uv_lock(uv_lock_path)
+    # nothing is written
+    assert config_path.read_bytes() == config
+    assert [timing.label for timing in profiler.phases] == [
+        "read_config",
+        "scan_config",
+        "wait_uv_lock",
+        "load_uv_lock (background)",
+        "process_config_text",
+    ]
+    load = profiler.phases[3]
+    assert profiler.overlap_saved_ns <= load.wall_ns
+    assert "saved by overlap" in profiler.report()
+
+
+def test_sync_config_pipelined_sharded(tmp_path: Path, mocker: MockerFixture) -> None:
+    """A config large enough to shard isn't scanned before uv.lock is loaded."""
+    config_path, uv_lock_path, versions = _write_project(tmp_path, "yaml")
+    mocker.patch.object(sync_with_uv.pipeline, "shard_count", return_value=2)
+    scan_spy = mocker.spy(sync_with_uv.pipeline, "scan_config_bytes")
+    sharded_spy = mocker.spy(sync_with_uv.pipeline, "process_config_sharded")
+    synced = sync_config_pipelined(
+        config_path, uv_lock_path, config_format="yaml", max_workers=2
+    )
+    scan_spy.assert_not_called()
+    sharded_spy.assert_called_once()
+    assert (synced.fixed_bytes, synced.changes) == process_config_bytes(
+        config_path.read_bytes(), versions, config_format="yaml"
+    )
+
+
+def test_sync_config_pipelined_errors(tmp_path: Path) -> None:
+    config_path, uv_lock_path, _versions = _write_project(tmp_path, "yaml")
+    uv_lock_path.write_text("[[package]\n")
+    with pytest.raises(tomli.TOMLDecodeError):
+        sync_config_pipelined(config_path, uv_lock_path, config_format="yaml")
+    with pytest.raises(FileNotFoundError):
+        sync_config_pipelined(
+            tmp_path / "missing.yaml", uv_lock_path, config_format="yaml"
+        )
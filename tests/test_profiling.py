@@ -0,0 +1,124 @@
+import pstats
+from pathlib import Path
+
+import pytest
+
+from sync_with_uv.cli import app
+from sync_with_uv.profiling import Profiler, phase
+
+from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+
+
+def test_profiler_phases() -> None:
+    profiler = Profiler()
+    with profiler.phase("one"):
+        pass
+    with phase(profiler, "two"):
+        sum(range(1000))
+    profiler.add("three", 2_000_000, 1_000_000)
+    profiler.finish()
+    assert [p.name for p in profiler.phases] == ["one", "two", "three"]
+    assert all(p.wall_ns >= 0 and p.cpu_ns >= 0 for p in profiler.phases)
+    assert all(p.peak_memory is None for p in profiler.phases)
+    report = profiler.report().splitlines()
+    assert report[0].split() == ["phase", "wall", "ms", "cpu", "ms", "peak", "KiB"]
+    assert report[3].split() == ["three", "2.000", "1.000", "-"]
+    assert report[-1].split()[0] == "total"
+
+
+def test_profiler_background_phase() -> None:
+    profiler = Profiler()
+    profiler.add("one", 1_000_000, 1_000_000)
+    profiler.add_background("load", 5_000_000, 4_000_000, saved_ns=3_000_000)
+    profiler.add("two", 3_000_000, 2_000_000)
+    report = [line.split() for line in profiler.report().splitlines()]
+    # the background phase runs alongside the others, so it isn't in the total
+    assert report[3] == ["total", "4.000", "3.000"]
+    assert report[4] == ["load", "(background)", "5.000", "4.000", "-"]
+    assert report[5] == ["saved", "by", "overlap", "3.000"]
+    assert profiler.phases[1].label == "load (background)"
+
+
+def test_profiler_phase_records_on_error() -> None:
+    profiler = Profiler()
+    with pytest.raises(ValueError, match="boom"), profiler.phase("failing"):
+        raise ValueError("boom")
+    assert [p.name for p in profiler.phases] == ["failing"]
+
+
+def test_phase_without_profiler() -> None:
+    with phase(None, "ignored"):
+        pass
+
+
+def test_profiler_memory() -> None:
+    profiler = Profiler(trace_memory=True)
+    with profiler.phase("allocate"):
+        data = [0] * 100_000
+    del data
+    profiler.finish()
+    (timing,) = profiler.phases
+    assert timing.peak_memory is not None
+    assert timing.peak_memory >= 100_000 * 8
+
+
+def test_profiler_stats(tmp_path: Path) -> None:
+    stats_path = tmp_path / "run.pstats"
+    profiler = Profiler(stats_path=stats_path)
+    with profiler.phase("work"):
+        sorted(range(10))
+    profiler.finish()
+    assert pstats.Stats(str(stats_path)).total_calls > 0  # type: ignore[attr-defined]
+
+
+@pytest.mark.parametrize(
+    ("options", "expected"),
+    [
+        (
+            [],
+            ["load_uv_lock", "read_config", "process_config_text", "write", "total"],
+        ),
+        (
+            ["--pipeline"],
+            [
+                *("read_config", "scan_config", "wait_uv_lock"),
+                *("process_config_text", "write", "total", "load_uv_lock", "saved"),
+            ],
+        ),
+    ],
+)
+def test_cli_profile(  # noqa: PLR0913
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    *,
+    options: list[str],
+    expected: list[str],
+) -> None:
+    stats_path = tmp_path / "run.pstats"
+    with pytest.raises(SystemExit) as exc_info:
+        app(
+            [
+                *("-p", str(sample_precommit_config), "-u", str(sample_uv_lock)),
+                *("-q", "--profile-memory", "--profile-stats", str(stats_path)),
+                *options,
+            ]
+        )
+    assert exc_info.value.code == 0
+    phases = [line.split()[0] for line in capsys.readouterr().err.splitlines()]
+    assert phases == ["phase", "startup", "load_user_mappings", *expected]
+    assert stats_path.is_file()
+
+
+def test_cli_profile_env_var(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setenv("SYNC_WITH_UV_PROFILE", "1")
+    with pytest.raises(SystemExit) as exc_info:
+        app(["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), "-q"])
+    assert exc_info.value.code == 0
+    assert "load_uv_lock" in capsys.readouterr().err
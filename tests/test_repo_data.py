@@ -151,6 +151,30 @@ def test_repo_to_version_template_with_user_mappings() -> None:
     )
 
 
+def test_repo_to_version_template_sub_path() -> None:
+    user_mappings = {
+        "https://gitlab.com/group": "group-${version}",
+        "https://gitlab.com/group/project": "project-${version}",
+    }
+    assert (
+        repo_to_version_template("https://gitlab.com/group/other", user_mappings)
+        == "group-${version}"
+    )
+    # the most specific prefix wins
+    assert (
+        repo_to_version_template(
+            "https://gitlab.com/group/project/hooks", user_mappings
+        )
+        == "project-${version}"
+    )
+    assert (
+        repo_to_version_template("https://gitlab.com/groupie/x", user_mappings) is None
+    )
+    assert (
+        repo_to_version_template("https://github.com/psf/black/sub/dir") == "${version}"
+    )
+
+
 def test_repo_functions_with_empty_user_mappings() -> None:
     """Test repo functions work correctly with empty user mappings."""
     empty_mappings: dict[str, str] = {}
@@ -0,0 +1,226 @@
+"""Asymptotic scaling of the sync stages.
+
+Each stage runs on inputs of size n, 2n, 4n and 8n, and the growth exponent of
+its cost is fitted on a log-log scale; anything above :data:`MAX_EXPONENT`
+means the stage went superlinear. The cost is counted rather than timed, so
+the tests are stable on a loaded machine: the number of Python and C function
+calls made (with :func:`sys.setprofile`), and the counters of
+:class:`~sync_with_uv.stats.SyncStats`.
+
+Regex matching runs inside the C engine, where nothing can be counted, so the
+adversarial dependency lines are timed instead, with the fastest of several
+runs and the looser :data:`MAX_TIMED_EXPONENT`; catastrophic backtracking
+grows quadratically or worse.
+"""
+
+import functools
+import math
+import sys
+import time
+from collections.abc import Callable
+from pathlib import Path
+from types import FrameType
+from typing import Literal
+
+import pytest
+
+from sync_with_uv.dependency_line import sync_dependency_line
+from sync_with_uv.diff import unified_diff_from_edits
+from sync_with_uv.repo_data import load_user_mappings
+from sync_with_uv.stats import SyncStats
+from sync_with_uv.sync_with_uv import (
+    load_uv_lock,
+    process_config_text,
+    sync_config_lines,
+)
+
+from .corpus import generate_corpus
+
+SIZES = [50, 100, 200, 400]
+MAX_EXPONENT = 1.2
+MAX_TIMED_EXPONENT = 1.5
+
+# Builders of pragma lines whose length grows with n, crafted to make a
+# backtracking regex engine retry many ways to split them.
+ADVERSARIAL_LINES: dict[str, Callable[[int], str]] = {
+    "specifier_chain": lambda n: "- a" + ",".join([">=1.0"] * n) + "  # sync-with-uv",
+    "spaced_specifiers": lambda n: "- a>=1" + "  ,  <2" * n + " x  # sync-with-uv",
+    "commas": lambda n: "- a==1" + " ," * n + "b  # sync-with-uv",
+    "operators": lambda n: "- a" + "==" * n + "  # sync-with-uv",
+    "extras": lambda n: "- a[" + "x," * n + "]==1  # sync-with-uv",
+    "unclosed_extras": lambda n: "- a[" + "x," * n + "  # sync-with-uv",
+    "repeated_extras": lambda n: "- a" + "[x]" * n + "  # sync-with-uv",
+    "long_name": lambda n: "- " + "a-" * n + ":  # sync-with-uv",
+    "whitespace": lambda n: "-" + " " * n + "a  # sync-with-uv",
+    "hashes": lambda n: "- a==1 " + "# " * n + "sync-with-uv",
+    "quotes": lambda n: "- a==1" + " '\"," * n + "x  # sync-with-uv",
+    "epochs": lambda n: "- a==" + "1!" * n + "  # sync-with-uv",
+    "long_marker": lambda n: '- a==1 ; python_version > "'
+    + "3" * n
+    + '"  # sync-with-uv',
+}
+
+
+def growth_exponent(sizes: list[int], costs: list[int]) -> float:
+    """Return the least-squares slope of log(cost) against log(size).
+
+    >>> round(growth_exponent([1, 2, 4], [3, 12, 48]), 6)
+    2.0
+    """
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(cost) for cost in costs]
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+    return sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys, strict=True)) / (
+        sum((x - x_mean) ** 2 for x in xs)
+    )
+
+
+def count_calls(func: Callable[[], object]) -> int:
+    """Return the number of Python and C function calls made by *func*."""
+    calls = 0
+
+    def profile(_frame: FrameType, event: str, _arg: object) -> None:
+        nonlocal calls
+        if event in {"call", "c_call"}:
+            calls += 1
+
+    previous = sys.getprofile()
+    sys.setprofile(profile)
+    try:
+        func()
+    finally:
+        sys.setprofile(previous)
+    return calls
+
+
+def assert_linear(
+    sizes: list[int], costs: list[int], what: str = "function calls"
+) -> None:
+    exponent = growth_exponent(sizes, costs)
+    assert (
+        exponent <= MAX_EXPONENT
+    ), f"{what} grow as n^{exponent:.2f} for n in {sizes}: {costs}"
+
+
+def test_growth_exponent_detects_quadratic() -> None:
+    assert growth_exponent(SIZES, [5 * n + 100 for n in SIZES]) <= MAX_EXPONENT
+    assert growth_exponent(SIZES, [n * n // 10 + n for n in SIZES]) > MAX_EXPONENT
+
+
+def _user_mappings(n: int) -> dict[str, str]:
+    """Return *n* mappings of repos that are not in the generated configs."""
+    return {f"https://git.example.com/team-{i}/hooks": "v${version}" for i in range(n)}
+
+
+def test_scaling_load_uv_lock(tmp_path: Path) -> None:
+    costs = []
+    for n in SIZES:
+        corpus = generate_corpus(n, 0, 0, n_wheels=2)
+        uv_lock = tmp_path / f"uv-{n}.lock"
+        uv_lock.write_text(corpus.uv_lock)
+        costs.append(count_calls(functools.partial(load_uv_lock, uv_lock)))
+    assert_linear(SIZES, costs)
+
+
+def test_scaling_load_user_mappings(tmp_path: Path) -> None:
+    costs = []
+    for n in SIZES:
+        pyproject = tmp_path / f"pyproject-{n}.toml"
+        pyproject.write_text(
+            "[tool.sync-with-uv.repo-to-version-template]\n"
+            + "".join(
+                f'"{repo}" = "{tpl}"\n' for repo, tpl in _user_mappings(n).items()
+            )
+        )
+        costs.append(count_calls(functools.partial(load_user_mappings, pyproject)))
+    assert_linear(SIZES, costs)
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+def test_scaling_process_config_text(config_format: Literal["yaml", "toml"]) -> None:
+    costs = []
+    stats_list = []
+    for n in SIZES:
+        corpus = generate_corpus(n, n, 4 * n, config_format=config_format)
+        stats = SyncStats()
+        process = functools.partial(
+            process_config_text,
+            corpus.config,
+            corpus.versions,
+            config_format=config_format,
+            stats=stats,
+        )
+        costs.append(count_calls(process))
+        stats_list.append(stats)
+    assert_linear(SIZES, costs)
+    assert_linear(
+        SIZES, [sum(stats.regex_attempts.values()) for stats in stats_list], "regexes"
+    )
+    assert_linear(SIZES, [stats.bytes_processed for stats in stats_list], "bytes")
+
+
+def test_scaling_repo_mappings() -> None:
+    """Repo lookups don't scan the mappings: n user mappings and n repos."""
+    costs = []
+    for n in SIZES:
+        corpus = generate_corpus(n, n, n)
+        mappings = _user_mappings(n)
+        process = functools.partial(
+            process_config_text,
+            corpus.config,
+            corpus.versions,
+            config_format="yaml",
+            user_repo_mappings=mappings,
+            user_version_mappings=mappings,
+        )
+        costs.append(count_calls(process))
+    assert_linear(SIZES, costs)
+
+
+def test_pragma_free_lines_make_no_calls() -> None:
+    """Lines without the pragma text are rejected without calling anything."""
+    corpus = generate_corpus(10, 20, 0)
+    for line in corpus.config.splitlines(keepends=True):
+        check = functools.partial(sync_dependency_line, line, corpus.versions)
+        # the partial and sync_dependency_line itself
+        assert count_calls(check) == 2, line
+
+
+def test_scaling_diff() -> None:
+    costs = []
+    for n in SIZES:
+        corpus = generate_corpus(n, n, 4 * n)
+        lines = corpus.config.splitlines(keepends=True)
+        edits, _changes = sync_config_lines(
+            lines, corpus.versions, config_format="yaml"
+        )
+        diff = functools.partial(unified_diff_from_edits, lines, edits)
+        costs.append(count_calls(lambda: list(diff())))  # noqa: B023
+    assert_linear(SIZES, costs)
+
+
+def best_time_ns(func: Callable[[], object], repeat: int = 5) -> int:
+    """Return the fastest of *repeat* runs of *func*, in nanoseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        func()
+        times.append(time.perf_counter_ns() - start)
+    return min(times)
+
+
+@pytest.mark.parametrize("kind", ADVERSARIAL_LINES)
+def test_scaling_adversarial_dependency_line(kind: str) -> None:
+    sizes = [2_000, 4_000, 8_000, 16_000]
+    uv_data = {"a": "1.0"}
+    costs = []
+    for n in sizes:
+        line = ADVERSARIAL_LINES[kind](n)
+        costs.append(
+            best_time_ns(functools.partial(sync_dependency_line, line, uv_data))
+        )
+    exponent = growth_exponent(sizes, costs)
+    assert (
+        exponent <= MAX_TIMED_EXPONENT
+    ), f"{kind} lines take n^{exponent:.2f} time for n in {sizes}: {costs} ns"
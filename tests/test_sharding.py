@@ -0,0 +1,168 @@
+import textwrap
+from typing import Literal
+
+import pytest
+from pytest_mock import MockerFixture
+
+import sync_with_uv.sharding
+from sync_with_uv.sharding import process_config_sharded, shard_boundaries
+from sync_with_uv.stats import SyncStats
+from sync_with_uv.sync_with_uv import (
+    ByteEdit,
+    process_config_bytes,
+    process_config_text,
+)
+
+from .corpus import generate_corpus
+
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5"}
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+@pytest.mark.parametrize("as_bytes", [False, True])
+@pytest.mark.parametrize("stamp", [None, "abc"])
+def test_process_config_sharded_matches_serial(
+    config_format: Literal["yaml", "toml"], stamp: str | None, *, as_bytes: bool
+) -> None:
+    corpus = generate_corpus(50, 300, 600, config_format=config_format, seed=7)
+    serial_stats = SyncStats()
+    sharded_stats = SyncStats()
+    if as_bytes:
+        config = corpus.config.encode()
+        serial_edits: list[ByteEdit] = []
+        sharded_edits: list[ByteEdit] = []
+        expected: tuple[object, ...] = process_config_bytes(
+            config,
+            corpus.versions,
+            config_format=config_format,
+            stamp=stamp,
+            stats=serial_stats,
+            byte_edits=serial_edits,
+        )
+        result: tuple[object, ...] = process_config_sharded(
+            config,
+            corpus.versions,
+            config_format=config_format,
+            stamp=stamp,
+            stats=sharded_stats,
+            byte_edits=sharded_edits,
+            max_workers=4,
+            min_shard_lines=100,
+            use_threads=True,
+        )
+        assert sharded_edits == serial_edits
+    else:
+        expected = process_config_text(
+            corpus.config,
+            corpus.versions,
+            config_format=config_format,
+            stamp=stamp,
+            stats=serial_stats,
+        )
+        result = process_config_sharded(
+            corpus.config,
+            corpus.versions,
+            config_format=config_format,
+            stamp=stamp,
+            stats=sharded_stats,
+            max_workers=4,
+            min_shard_lines=100,
+            use_threads=True,
+        )
+    assert result == expected
+    # each shard has its own memo of the repo mappings
+    for stats in (serial_stats, sharded_stats):
+        stats.mapping_cache_hits = stats.mapping_cache_misses = 0
+    assert sharded_stats == serial_stats
+
+
+def test_process_config_sharded_processes() -> None:
+    corpus = generate_corpus(20, 200, 200, seed=2)
+    config = corpus.config.encode()
+    assert process_config_sharded(
+        config,
+        corpus.versions,
+        config_format="yaml",
+        max_workers=2,
+        min_shard_lines=100,
+        use_threads=False,
+    ) == process_config_bytes(config, corpus.versions, config_format="yaml")
+
+
+def test_shard_boundaries() -> None:
+    corpus = generate_corpus(20, 200, 200, config_format="toml", seed=2)
+    lines = corpus.config.splitlines(keepends=True)
+    boundaries = shard_boundaries(lines, "toml", 4)
+    assert len(boundaries) == 4
+    assert boundaries[0] == 0
+    for index in boundaries[1:]:
+        assert lines[index].startswith("repo = ")
+    # a config without repo headers is a single shard
+    assert shard_boundaries(["- id: x\n"] * 100, "yaml", 4) == [0]
+
+
+def test_process_config_sharded_small_config_is_serial(
+    mocker: MockerFixture,
+) -> None:
+    corpus = generate_corpus(20, 200, 200, seed=2)
+    spy = mocker.spy(sync_with_uv.sharding, "_sync_shard")
+    assert process_config_sharded(
+        corpus.config, corpus.versions, config_format="yaml", max_workers=4
+    ) == process_config_text(corpus.config, corpus.versions, config_format="yaml")
+    spy.assert_not_called()
+
+
+def test_process_config_sharded_falls_back_inside_block_scalar(
+    mocker: MockerFixture,
+) -> None:
+    """A shard starting inside a block scalar is synced again serially."""
+    fake_repos = "  - repo: https://github.com/psf/black\n    rev: 1.0\n" * 100
+    config = (
+        "description: |\n"
+        + fake_repos
+        + "repos:\n"
+        + "- repo: https://github.com/psf/black\n  rev: 23.9.1\n"
+    )
+    spy = mocker.spy(sync_with_uv.sharding, "_sync_shard")
+    result = process_config_sharded(
+        config,
+        UV_DATA,
+        config_format="yaml",
+        max_workers=2,
+        min_shard_lines=50,
+        use_threads=True,
+    )
+    assert spy.call_count == 2
+    assert result == process_config_text(config, UV_DATA, config_format="yaml")
+    assert result[0] == config.replace("rev: 23.9.1", "rev: 23.11.0")
+
+
+def test_process_config_sharded_dependency_errors() -> None:
+    block = textwrap.dedent("""\
+        - repo: https://github.com/psf/black
+          rev: 23.9.1
+          hooks:
+            - id: black
+              additional_dependencies:
+                - ruff  # sync-with-uv
+        """)
+    lines = block.splitlines(keepends=True)
+    config = "repos:\n" + block * 50
+    # unknown packages in the first and the last shard
+    config = config.replace("- ruff", "- missing", 1)
+    head, _, tail = config.rpartition("- ruff")
+    config = head + "- unknown" + tail
+    with pytest.raises(ValueError, match="sync-with-uv") as serial_error:
+        process_config_text(config, UV_DATA, config_format="yaml")
+    with pytest.raises(ValueError, match="sync-with-uv") as sharded_error:
+        process_config_sharded(
+            config,
+            UV_DATA,
+            config_format="yaml",
+            max_workers=4,
+            min_shard_lines=len(lines) * 5,
+            use_threads=True,
+        )
+    assert str(sharded_error.value) == str(serial_error.value)
+    assert "line 7:" in str(sharded_error.value)
+    assert "line 301:" in str(sharded_error.value)
@@ -0,0 +1,112 @@
+import textwrap
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockerFixture
+
+import sync_with_uv.cli
+from sync_with_uv.cli import app
+from sync_with_uv.stamp import (
+    compute_stamp,
+    format_stamp,
+    read_config_stamp,
+    read_stamp,
+    stamp_line_edit,
+)
+from sync_with_uv.sync_with_uv import process_config_text
+
+from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+
+
+def test_compute_stamp() -> None:
+    stamp = compute_stamp(b"lock")
+    assert len(stamp) == 16
+    assert stamp == compute_stamp(b"lock", {}, {})
+    assert stamp != compute_stamp(b"lock2")
+    assert stamp != compute_stamp(b"lock", {"a": "b"})
+    assert stamp != compute_stamp(b"lock", None, {"a": "b"})
+    # the order of the mappings doesn't matter
+    assert compute_stamp(b"lock", {"a": "b", "c": "d"}, {"e": "f", "g": "h"}) == (
+        compute_stamp(b"lock", {"c": "d", "a": "b"}, {"g": "h", "e": "f"})
+    )
+
+
+def test_stamp_line_edit_inserts_first_line() -> None:
+    assert stamp_line_edit(["repos:\n"], "abc") == (
+        1,
+        "",
+        "# sync-with-uv: lock=abc\n",
+    )
+    assert stamp_line_edit(["repos:\r\n"], "abc") == (
+        1,
+        "",
+        "# sync-with-uv: lock=abc\r\n",
+    )
+    assert stamp_line_edit([], "abc") == (1, "", "# sync-with-uv: lock=abc\n")
+
+
+def test_stamp_line_edit_updates_in_place() -> None:
+    lines = ["# header\n", "#  sync-with-uv:  lock=0123 \r\n", "repos:\n"]
+    assert stamp_line_edit(lines, "abc") == (
+        2,
+        "#  sync-with-uv:  lock=0123 \r\n",
+        "# sync-with-uv: lock=abc\r\n",
+    )
+    assert stamp_line_edit(["# sync-with-uv: lock=abc\n"], "abc") is None
+
+
+def test_read_stamp() -> None:
+    assert read_stamp(["a\n", format_stamp("abc") + "\n"]) == "abc"
+    assert read_stamp(["a\n"] * 5 + [format_stamp("abc") + "\n"]) is None
+    assert read_stamp([]) is None
+
+
+def test_read_config_stamp(tmp_path: Path) -> None:
+    config = tmp_path / "config.yaml"
+    config.write_bytes(b"# sync-with-uv: lock=abc\r\nrepos: []\r\n")
+    assert read_config_stamp(config) == "abc"
+
+
+def test_process_config_text_with_stamp() -> None:
+    text = textwrap.dedent("""\
+        # sync-with-uv: lock=0123
+        repos:
+        - repo: https://github.com/psf/black-pre-commit-mirror
+          rev: 23.9.1
+        """)
+    fixed_text, changes = process_config_text(
+        text, {"black": "23.11.0"}, config_format="yaml", stamp="abc"
+    )
+    assert fixed_text == text.replace("0123", "abc").replace("23.9.1", "23.11.0")
+    assert changes.repos == {"black": ("23.9.1", "23.11.0")}
+    assert changes.lines == {}
+
+
+def test_cli_stamp(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    capsys: pytest.CaptureFixture[str],
+    mocker: MockerFixture,
+) -> None:
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), "--stamp"]
+    with pytest.raises(SystemExit) as exc_info:
+        app(args)
+    assert exc_info.value.code == 0
+    assert read_config_stamp(sample_precommit_config) == compute_stamp(
+        sample_uv_lock.read_bytes()
+    )
+    capsys.readouterr()
+
+    spy = mocker.spy(sync_with_uv.cli, "process_config_sharded")
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check"])
+    assert exc_info.value.code == 0
+    spy.assert_not_called()
+    assert capsys.readouterr().err == "All done! Stamp matches uv.lock.\n"
+
+    # a changed lock invalidates the stamp
+    sample_uv_lock.write_text(sample_uv_lock.read_text() + "\n")
+    with pytest.raises(SystemExit) as exc_info:
+        app([*args, "--check"])
+    assert exc_info.value.code == 1
+    spy.assert_called_once()
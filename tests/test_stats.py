@@ -0,0 +1,85 @@
+import textwrap
+from collections import Counter
+
+from sync_with_uv.dependency_line import sync_dependency_line
+from sync_with_uv.stats import SyncStats
+from sync_with_uv.sync_with_uv import config_needs_sync, process_config_text
+
+CONFIG_TEXT = textwrap.dedent("""\
+    repos:
+    - repo: https://github.com/psf/black-pre-commit-mirror
+      rev: 23.9.1
+      hooks:
+        - id: black
+          additional_dependencies:
+            - ruff>=0.1  # sync-with-uv
+            - black  # sync-with-uv
+    - repo: https://github.com/psf/black-pre-commit-mirror
+      rev: 23.11.0
+    - repo: local
+      hooks:
+    """)
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5"}
+
+
+def test_process_config_text_stats() -> None:
+    stats = SyncStats()
+    process_config_text(CONFIG_TEXT, UV_DATA, config_format="yaml", stats=stats)
+    assert stats == SyncStats(
+        lines_scanned=12,
+        bytes_processed=len(CONFIG_TEXT),
+        repo_headers=3,
+        pragma_lines=2,
+        # the second black repo reuses the mappings of the first
+        mapping_cache_hits=2,
+        mapping_cache_misses=3,
+        regex_attempts=Counter(
+            # only the lines containing "sync-with-uv" reach the regex
+            dep_pragma=2,
+            dep_line=2,
+            dep_bare=1,
+            dep_tail=2,
+        ),
+    )
+
+
+def test_stats_accumulate() -> None:
+    stats = SyncStats()
+    process_config_text(CONFIG_TEXT, UV_DATA, config_format="yaml", stats=stats)
+    process_config_text(CONFIG_TEXT, UV_DATA, config_format="yaml", stats=stats)
+    assert stats.lines_scanned == 24
+    assert stats.repo_headers == 6
+
+
+def test_config_needs_sync_stats_stop_at_first_difference() -> None:
+    stats = SyncStats()
+    assert config_needs_sync(CONFIG_TEXT, UV_DATA, config_format="yaml", stats=stats)
+    assert stats.lines_scanned == 3
+    assert stats.repo_headers == 1
+
+
+def test_sync_dependency_line_stats() -> None:
+    stats = SyncStats()
+    assert sync_dependency_line("- id: black\n", UV_DATA, stats) is None
+    sync_dependency_line("- black  # sync-with-uv\n", UV_DATA, stats)
+    assert stats.pragma_lines == 1
+    assert stats.regex_attempts == Counter(
+        dep_pragma=1, dep_line=1, dep_bare=1, dep_tail=1
+    )
+    assert stats.lines_scanned == 0
+
+
+def test_sync_stats_update() -> None:
+    stats = SyncStats(lines_scanned=1, regex_attempts=Counter(dep_line=2))
+    stats.update(
+        SyncStats(
+            lines_scanned=2,
+            pragma_lines=1,
+            regex_attempts=Counter(dep_line=1, dep_tail=1),
+        )
+    )
+    assert stats == SyncStats(
+        lines_scanned=3,
+        pragma_lines=1,
+        regex_attempts=Counter(dep_line=3, dep_tail=1),
+    )
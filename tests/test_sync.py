@@ -1,14 +1,33 @@
+import io
+import os
+import pickle
+import stat
 import textwrap
 from pathlib import Path
+from typing import Literal
 
 import pytest
 import tomli
+from pytest_mock import MockerFixture
 
+from sync_with_uv.dependency_line import DepLineChange
 from sync_with_uv.sync_with_uv import (
+    Changes,
+    PlanEdit,
+    apply_plan,
+    config_needs_sync,
+    dump_plan,
+    load_plan,
     load_uv_lock,
+    plan_config_sync,
+    process_config_bytes,
     process_config_text,
+    sync_config_file,
+    sync_config_stream,
 )
 
+from .corpus import generate_corpus
+
 
 @pytest.fixture
 def sample_uv_lock(tmp_path: Path) -> Path:
@@ -451,6 +470,42 @@ def test_sync_additional_dependencies_no_dependency_errors() -> None:
     assert "line 6: no dependency to sync" in message
 
 
+def test_sync_pragma_in_block_scalar_or_unsynced_rev() -> None:
+    """A pragma is synced or rejected even in a block scalar or on a rev line."""
+    precommit_text = textwrap.dedent("""\
+        repos:
+        - repo: https://github.com/example/unknown
+          rev: 1.0  # sync-with-uv
+          hooks:
+            - id: x
+              entry: |
+                - pydantic  # sync-with-uv
+                not a dependency  # sync-with-uv
+        - repo: https://github.com/psf/black
+          rev: 23.9.1  # sync-with-uv
+        """)
+    uv_data = {"black": "23.11.0", "pydantic": "2.5.0"}
+
+    with pytest.raises(ValueError, match="no dependency to sync") as exc_info:
+        process_config_text(precommit_text, uv_data, config_format="yaml")
+    message = str(exc_info.value)
+    assert "line 3: no dependency to sync" in message
+    assert "line 8: no dependency to sync" in message
+    # the rev of a synced repo is synced, as before
+    assert "line 10" not in message
+
+    fixed, changes = process_config_text(
+        precommit_text.replace("1.0  # sync-with-uv", "1.0").replace(
+            "not a dependency  # sync-with-uv", "not a dependency"
+        ),
+        uv_data,
+        config_format="yaml",
+    )
+    assert "- pydantic==2.5.0  # sync-with-uv" in fixed
+    assert "rev: 23.11.0  # sync-with-uv" in fixed
+    assert changes.lines[7] == DepLineChange("pydantic", "", "==2.5.0")
+
+
 @pytest.mark.parametrize(
     "dep_line",
     [
@@ -625,3 +680,293 @@ def test_sync_additional_dependencies_pragma_lookalike_ignored(comment: str) ->
     assert result == precommit_text
     assert changes.repos == {}
     assert changes.lines == {}
+
+
+@pytest.mark.parametrize(
+    "comment", ["# sync-with-uv: pinned for mypy", "#sync-with-uv:", "# sync-with-uv:x"]
+)
+def test_sync_additional_dependencies_pragma_with_colon(comment: str) -> None:
+    """The pragma may be followed by a colon, unless it is the sync stamp."""
+    precommit_text = f"- repo: local\n  - pydantic>=2.0  {comment}\n"
+    uv_data = {"pydantic": "2.5.0"}
+
+    result, changes = process_config_text(precommit_text, uv_data, config_format="yaml")
+
+    assert result == precommit_text.replace(">=2.0", "==2.5.0")
+    assert changes.lines == {2: ("pydantic", ">=2.0", "==2.5.0")}
+    stamped = "# sync-with-uv: lock=abc\n" + precommit_text
+    assert process_config_text(stamped, uv_data, config_format="yaml")[1].lines == {
+        3: ("pydantic", ">=2.0", "==2.5.0")
+    }
+
+
+@pytest.mark.parametrize(
+    ("precommit_text", "uv_data", "expected"),
+    [
+        (FIXED_PRECOMMIT_CONTENT, {"black": "23.11.0", "ruff": "0.1.5"}, False),
+        (FIXED_PRECOMMIT_CONTENT, {"black": "23.12.0", "ruff": "0.1.5"}, True),
+        (
+            "- repo: local\n  - pydantic==2.5.0  # sync-with-uv\n",
+            {"pydantic": "2.5.0"},
+            False,
+        ),
+        (
+            "- repo: local\n  - pydantic>=2.5.0  # sync-with-uv\n",
+            {"pydantic": "2.5.0"},
+            True,
+        ),
+        ("", {}, False),
+    ],
+)
+def test_config_needs_sync(
+    precommit_text: str, uv_data: dict[str, str], *, expected: bool
+) -> None:
+    assert config_needs_sync(precommit_text, uv_data, config_format="yaml") is expected
+    fixed_text, _changes = process_config_text(
+        precommit_text, uv_data, config_format="yaml"
+    )
+    assert (fixed_text != precommit_text) is expected
+
+
+def test_config_needs_sync_stops_at_first_difference() -> None:
+    """Only errors before the first difference are reported by the check path."""
+    precommit_text = textwrap.dedent("""\
+        repos:
+        - repo: local
+          hooks:
+            - id: mypy
+              additional_dependencies:
+                - pydantic>=2.0  # sync-with-uv
+                - missing==1.0  # sync-with-uv
+        """)
+    uv_data = {"pydantic": "2.5.0"}
+    assert config_needs_sync(precommit_text, uv_data, config_format="yaml")
+    reordered = precommit_text.replace("pydantic>=2.0", "pydantic==2.5.0")
+    with pytest.raises(ValueError, match=r"'missing' is not in uv\.lock"):
+        config_needs_sync(reordered, uv_data, config_format="yaml")
+
+
+def test_config_needs_sync_stamp() -> None:
+    text = "# sync-with-uv: lock=abc\nrepos: []\n"
+    assert not config_needs_sync(text, {}, config_format="yaml", stamp="abc")
+    assert config_needs_sync(text, {}, config_format="yaml", stamp="def")
+
+
+@pytest.mark.parametrize("line_ending", ["\n", "\r\n", "\r"], ids=["LF", "CRLF", "CR"])
+@pytest.mark.parametrize("stamp", [None, "abc", "def"])
+def test_sync_config_stream_matches_process_config_text(
+    line_ending: str, stamp: str | None
+) -> None:
+    corpus = generate_corpus(50, 100, 300, seed=5)
+    text = ("# sync-with-uv: lock=abc\n" + corpus.config).replace("\n", line_ending)
+    expected_text, expected_changes = process_config_text(
+        text, corpus.versions, config_format="yaml", stamp=stamp
+    )
+    output: list[str] = []
+    changes = Changes({}, {})
+    changed = sync_config_stream(
+        # a file in newline="" mode, read line by line
+        io.StringIO(text, newline=""),
+        output.append,
+        corpus.versions,
+        config_format="yaml",
+        stamp=stamp,
+        changes=changes,
+    )
+    assert "".join(output) == expected_text
+    assert changed is (expected_text != text)
+    assert changes == expected_changes
+
+
+def test_sync_config_stream_check_and_errors() -> None:
+    text = (
+        "- repo: local\n"
+        "  - pydantic>=2.0  # sync-with-uv\n"
+        "  - missing  # sync-with-uv\n"
+    )
+    uv_data = {"pydantic": "2.5.0", "missing": "1.0"}
+    assert sync_config_stream([text], None, uv_data, config_format="yaml")
+    del uv_data["pydantic"]
+    output: list[str] = []
+    with pytest.raises(ValueError, match=r"'pydantic' is not in uv\.lock"):
+        sync_config_stream([text], output.append, uv_data, config_format="yaml")
+    # the whole config is written before the error, with the line left unchanged
+    assert "".join(output) == text.replace("missing  #", "missing==1.0  #")
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+@pytest.mark.parametrize("line_ending", ["\n", "\r\n", "\r"], ids=["LF", "CRLF", "CR"])
+@pytest.mark.parametrize("stamp", [None, "abc", "def"])
+def test_process_config_bytes_matches_process_config_text(
+    config_format: Literal["yaml", "toml"], line_ending: str, stamp: str | None
+) -> None:
+    corpus = generate_corpus(50, 100, 300, config_format=config_format, seed=6)
+    text = ("# sync-with-uv: lock=abc\n# déjà vu ✓\n" + corpus.config).replace(
+        "\n", line_ending
+    )
+    expected_text, expected_changes = process_config_text(
+        text, corpus.versions, config_format=config_format, stamp=stamp
+    )
+    config_bytes = text.encode()
+    fixed_bytes, changes = process_config_bytes(
+        config_bytes, corpus.versions, config_format=config_format, stamp=stamp
+    )
+    assert fixed_bytes == expected_text.encode()
+    assert changes == expected_changes
+    if expected_text == text:
+        assert fixed_bytes is config_bytes
+
+
+def test_process_config_bytes_keeps_invalid_utf8() -> None:
+    config_bytes = (
+        b"# caf\xe9\n"
+        b"- repo: https://github.com/psf/black\n"
+        b"  rev: 23.9.1  # \xff\n"
+        b"  hooks:\n"
+        b"    - id: black\n"
+        b"      additional_dependencies:\n"
+        b"        - ruff  # sync-with-uv \xe9\xff\n"
+    )
+    uv_data = {"black": "23.11.0", "ruff": "0.1.5"}
+    fixed_bytes, changes = process_config_bytes(
+        config_bytes, uv_data, config_format="yaml", stamp="abc"
+    )
+    assert fixed_bytes == (
+        b"# sync-with-uv: lock=abc\n"
+        + config_bytes.replace(b"23.9.1", b"23.11.0").replace(
+            b"- ruff  #", b"- ruff==0.1.5  #"
+        )
+    )
+    assert changes.repos["black"] == ("23.9.1", "23.11.0")
+    assert changes.lines[7] == DepLineChange("ruff", "", "==0.1.5")
+    with pytest.raises(ValueError, match=r"'ruff' is not in uv\.lock"):
+        process_config_bytes(config_bytes, {"black": "1"}, config_format="yaml")
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+@pytest.mark.parametrize("line_ending", ["\n", "\r\n"], ids=["LF", "CRLF"])
+@pytest.mark.parametrize("stamp", [None, "abc", "def"])
+def test_plan_config_sync_matches_process_config_text(
+    config_format: Literal["yaml", "toml"], line_ending: str, stamp: str | None
+) -> None:
+    corpus = generate_corpus(50, 100, 300, config_format=config_format, seed=7)
+    text = ("# a comment\n# sync-with-uv: lock=abc\n" + corpus.config).replace(
+        "\n", line_ending
+    )
+    expected_text, expected_changes = process_config_text(
+        text, corpus.versions, config_format=config_format, stamp=stamp
+    )
+    changes = Changes({}, {})
+    plan = plan_config_sync(
+        text,
+        corpus.versions,
+        config_format=config_format,
+        stamp=stamp,
+        changes=changes,
+    )
+    assert apply_plan(text, plan) == expected_text
+    assert changes == expected_changes
+    assert [edit.offset for edit in plan] == sorted(edit.offset for edit in plan)
+    assert pickle.loads(pickle.dumps(plan)) == plan  # noqa: S301
+    assert load_plan(dump_plan(plan)) == plan
+
+
+def test_plan_config_sync_edits() -> None:
+    text = (
+        "repos:\n"
+        "- {repo: https://github.com/psf/black, rev: 23.9.1}\n"
+        "- repo: https://github.com/astral-sh/ruff-pre-commit\n"
+        "  rev: v0.1.5\n"
+        "  hooks:\n"
+        "    - id: ruff\n"
+        "      additional_dependencies:\n"
+        "        - black>=23  # sync-with-uv\n"
+        "        - ruff  # sync-with-uv\n"
+    )
+    uv_data = {"black": "23.11.0", "ruff": "0.1.5"}
+    plan = plan_config_sync(text, uv_data, config_format="yaml", stamp="abc")
+    assert plan == [
+        PlanEdit(0, "", "# sync-with-uv: lock=abc\n", "stamp", ""),
+        PlanEdit(text.index("23.9.1"), "23.9.1", "23.11.0", "rev", "black"),
+        PlanEdit(text.index(">=23"), ">=23", "==23.11.0", "dependency", "black"),
+        PlanEdit(text.index("ruff  #") + 4, "", "==0.1.5", "dependency", "ruff"),
+    ]
+    assert dump_plan(plan[1:2]) == '[[51,"23.9.1","23.11.0","rev","black"]]'
+    synced = apply_plan(text, plan)
+    assert plan_config_sync(synced, uv_data, config_format="yaml", stamp="abc") == []
+
+
+def test_apply_plan_mismatch() -> None:
+    text = "- repo: https://github.com/psf/black\n  rev: 23.9.1\n"
+    plan = plan_config_sync(text, {"black": "23.11.0"}, config_format="yaml")
+    assert apply_plan(text, plan) == text.replace("23.9.1", "23.11.0")
+    with pytest.raises(ValueError, match="does not match the config at offset 44"):
+        apply_plan(text.replace("23.9.1", "23.10.1"), plan)
+    with pytest.raises(ValueError, match="does not match the config at offset 0"):
+        apply_plan(text, [*plan, PlanEdit(0, "", "#\n", "stamp", "")])
+
+
+@pytest.mark.parametrize(
+    "data",
+    [
+        "",
+        "{}",
+        "[[1, 'a', 'b', 'rev', 'x']]",
+        '[[1, "a", "b", "rev"]]',
+        '[[-1, "a", "b", "rev", "x"]]',
+        '[[true, "a", "b", "rev", "x"]]',
+        '[[1, "a", "b", "other", "x"]]',
+        '[[1, "a", null, "rev", "x"]]',
+    ],
+)
+def test_load_plan_invalid(data: str) -> None:
+    with pytest.raises(ValueError, match="invalid plan"):
+        load_plan(data)
+
+
+def test_sync_config_file(sample_precommit_config: Path) -> None:
+    config = sample_precommit_config
+    original = config.read_bytes()
+    config.chmod(0o640)
+    uv_data = {"black": "23.11.0", "ruff": "0.1.5"}
+    assert sync_config_file(config, uv_data, config_format="yaml", check=True)
+    assert config.read_bytes() == original
+    assert sync_config_file(config, uv_data, config_format="yaml")
+    assert config.read_text() == FIXED_PRECOMMIT_CONTENT
+    if os.name == "posix":  # Windows only has a read-only flag
+        assert stat.S_IMODE(config.stat().st_mode) == 0o640
+    assert not sync_config_file(config, uv_data, config_format="yaml")
+    # no temporary file is left behind
+    assert list(config.parent.iterdir()) == [config]
+
+
+def test_sync_config_file_closes_config_before_replacing(
+    sample_precommit_config: Path,
+    monkeypatch: pytest.MonkeyPatch,
+    mocker: MockerFixture,
+) -> None:
+    """Windows can't replace a file that is still open."""
+    open_spy = mocker.spy(Path, "open")
+    replaced: list[bool] = []
+    path_replace = Path.replace
+
+    def replace(path: Path, target: Path) -> Path:
+        replaced.append(open_spy.spy_return.closed)
+        return path_replace(path, target)
+
+    monkeypatch.setattr(Path, "replace", replace)
+    uv_data = {"black": "23.11.0", "ruff": "0.1.5"}
+    assert sync_config_file(sample_precommit_config, uv_data, config_format="yaml")
+    open_spy.assert_called_once()
+    assert replaced == [True]
+
+
+def test_sync_config_file_error_leaves_config(sample_precommit_config: Path) -> None:
+    config = sample_precommit_config
+    with config.open("a") as f:
+        f.write("      - missing  # sync-with-uv\n")
+    original = config.read_bytes()
+    with pytest.raises(ValueError, match=r"'missing' is not in uv\.lock"):
+        sync_config_file(config, {"black": "23.11.0"}, config_format="yaml")
+    assert config.read_bytes() == original
+    assert list(config.parent.iterdir()) == [config]
@@ -0,0 +1,154 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from sync_with_uv.cli import app
+from sync_with_uv.profiling import PhaseTiming
+from sync_with_uv.telemetry import (
+    RunInfo,
+    append_record,
+    make_record,
+    percentile,
+    read_records,
+    summarize,
+)
+
+from .test_sync import sample_precommit_config, sample_uv_lock  # noqa: F401
+
+
+@pytest.mark.parametrize(
+    ("values", "q", "expected"),
+    [
+        ([5.0], 99, 5.0),
+        ([1.0, 2.0], 50, 1.5),
+        ([1.0, 2.0, 3.0, 4.0, 5.0], 90, 4.6),
+        ([1.0, 2.0, 3.0], 100, 3.0),
+    ],
+)
+def test_percentile(values: list[float], q: float, expected: float) -> None:
+    assert percentile(values, q) == pytest.approx(expected)
+
+
+def test_append_and_read_records(tmp_path: Path) -> None:
+    log = tmp_path / "logs" / "telemetry.jsonl"
+    phases = [PhaseTiming("load_uv_lock", 2_000_000, 1_000_000, None)]
+    for cache in ("hit", "miss"):
+        append_record(log, make_record(phases, RunInfo(10, 20, 3, cache), 0))
+    with log.open("a", encoding="utf-8") as f:
+        f.write('{"v": 1, "phases": {"x": [1]}, "cache": "hit"}\n')  # bad timing
+        f.write(json.dumps({"v": 99, "phases": {}, "cache": "off"}) + "\n")
+        f.write('{"v": 1, "phases"')  # truncated
+    records = list(read_records([log]))
+    assert [record["cache"] for record in records] == ["hit", "miss"]
+    assert records[0]["phases"] == {"load_uv_lock": [2.0, 1.0]}
+    assert records[0]["lock_bytes"] == 10
+    assert records[0]["config_bytes"] == 20
+    assert records[0]["packages"] == 3
+
+
+def test_summarize(tmp_path: Path) -> None:
+    log = tmp_path / "telemetry.jsonl"
+    for wall_ms in range(1, 11):
+        phases = [
+            PhaseTiming("one", wall_ms * 1_000_000, 0, None),
+            PhaseTiming("two", 1_000_000, 0, None),
+        ]
+        append_record(log, make_record(phases, RunInfo(cache="off"), 0))
+    lines = summarize(read_records([log])).splitlines()
+    assert lines[0].split() == ["phase", "runs", "p50", "p90", "p95", "p99", "max"]
+    assert lines[1].split() == [
+        "one",
+        "10",
+        "5.500",
+        "9.100",
+        "9.550",
+        "9.910",
+        "10.000",
+    ]
+    assert lines[2].split() == ["two", "10", *["1.000"] * 5]
+    assert lines[3].split()[:3] == ["total", "10", "6.500"]
+    assert lines[-1] == "cache: off=10"
+
+
+def test_summarize_background_phase(tmp_path: Path) -> None:
+    log = tmp_path / "telemetry.jsonl"
+    phases = [
+        PhaseTiming("one", 2_000_000, 0, None),
+        PhaseTiming("load_uv_lock", 5_000_000, 0, None, background=True),
+    ]
+    append_record(log, make_record(phases, RunInfo(cache="off"), 0))
+    (record,) = read_records([log])
+    assert list(record["phases"]) == ["one", "load_uv_lock (background)"]
+    lines = summarize([record]).splitlines()
+    assert lines[2].split()[:4] == ["load_uv_lock", "(background)", "1", "5.000"]
+    assert lines[3].split()[:3] == ["total", "1", "2.000"]
+
+
+def test_summarize_empty() -> None:
+    assert summarize([]) == "No runs recorded."
+
+
+def test_cli_telemetry_log(
+    sample_uv_lock: Path,
+    sample_precommit_config: Path,
+    tmp_path: Path,
+    capsys: pytest.CaptureFixture[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    log = tmp_path / "telemetry.jsonl"
+    monkeypatch.setenv("SYNC_WITH_UV_TELEMETRY_LOG", str(log))
+    args = ["-p", str(sample_precommit_config), "-u", str(sample_uv_lock), "-q"]
+    for _ in range(2):
+        with pytest.raises(SystemExit) as exc_info:
+            app([*args, "--cache-dir", str(tmp_path / "cache")])
+        assert exc_info.value.code == 0
+    # without --profile, nothing is reported
+    assert capsys.readouterr().err == ""
+    first, second = read_records([log])
+    assert list(first["phases"]) == [
+        "startup",
+        "load_user_mappings",
+        "load_uv_lock",
+        "read_config",
+        "process_config_text",
+        "write",
+    ]
+    assert first["exit"] == 0
+    assert first["lock_bytes"] == sample_uv_lock.stat().st_size
+    assert first["packages"] == 3
+    # the first run rewrites the config, so the second one misses as well
+    assert (first["cache"], second["cache"]) == ("miss", "miss")
+    with pytest.raises(SystemExit):
+        app([*args, "--check", "--cache-dir", str(tmp_path / "cache")])
+    with pytest.raises(SystemExit):
+        app([*args, "--verbose", "--check", "--cache-dir", str(tmp_path / "cache")])
+    *_, bypassed, hit = read_records([log])
+    assert (bypassed["cache"], hit["cache"]) == ("bypassed", "hit")
+
+    with pytest.raises(SystemExit) as exc_info:
+        app(["stats", str(log)])
+    assert exc_info.value.code == 0
+    output = capsys.readouterr().out
+    assert "cache: bypassed=1, hit=1, miss=2" in output
+
+
+def test_cli_telemetry_log_error(
+    sample_uv_lock: Path, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    log = tmp_path / "telemetry.jsonl"
+    config = tmp_path / "missing-dep.yaml"
+    config.write_text("repos:\n  - missing  # sync-with-uv\n")
+    with pytest.raises(SystemExit) as exc_info:
+        app(["-p", str(config), "-u", str(sample_uv_lock), "--telemetry-log", str(log)])
+    assert exc_info.value.code == 123
+    assert "Error:" in capsys.readouterr().err
+    (record,) = read_records([log])
+    assert record["exit"] == 123
+
+
+def test_cli_stats_without_logs(capsys: pytest.CaptureFixture[str]) -> None:
+    with pytest.raises(SystemExit) as exc_info:
+        app(["stats"])
+    assert exc_info.value.code == 1
+    assert "no telemetry log" in capsys.readouterr().err
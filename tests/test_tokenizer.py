@@ -0,0 +1,269 @@
+import textwrap
+from typing import Literal
+
+import pytest
+
+from sync_with_uv.sync_with_uv import process_config_text
+from sync_with_uv.tokenizer import ConfigTokenizer, Token, tokenize_config
+
+UV_DATA = {"black": "23.11.0", "ruff": "0.1.5"}
+
+
+def _tokens(
+    text: str, config_format: Literal["yaml", "toml"]
+) -> list[tuple[str, str, int]]:
+    tokens = list(tokenize_config(text.splitlines(keepends=True), config_format))
+    for token in tokens:
+        assert text[token.start : token.end] == token.value
+    return [(token.kind, token.value, token.line_number) for token in tokens]
+
+
+def test_tokenize_yaml_block_style() -> None:
+    text = textwrap.dedent("""\
+        repos:
+        - repo: https://github.com/psf/black  # a comment
+          rev: "23.9.1"
+          hooks:
+            - id: black
+              additional_dependencies:
+                - ruff  # sync-with-uv
+        -   repo: 'https://github.com/astral-sh/ruff-pre-commit'
+            rev: v0.1.0
+        """)
+    assert _tokens(text, "yaml") == [
+        ("repo", "https://github.com/psf/black", 2),
+        ("rev", "23.9.1", 3),
+        ("dependency", "        - ruff  # sync-with-uv", 7),
+        ("repo", "https://github.com/astral-sh/ruff-pre-commit", 8),
+        ("rev", "v0.1.0", 9),
+    ]
+
+
+def test_tokenize_yaml_flow_style() -> None:
+    text = textwrap.dedent("""\
+        repos:
+        - {repo: https://github.com/psf/black, rev: 23.9.1, hooks: [{id: black}]}
+        - {rev: v0.1.0, repo: https://github.com/astral-sh/ruff-pre-commit}
+        - {
+            repo: "https://github.com/x/y",
+            rev: v1,
+          }
+        """)
+    assert _tokens(text, "yaml") == [
+        ("repo", "https://github.com/psf/black", 2),
+        ("rev", "23.9.1", 2),
+        # the repo comes first, so the rev is linked to it
+        ("repo", "https://github.com/astral-sh/ruff-pre-commit", 3),
+        ("rev", "v0.1.0", 3),
+        ("repo", "https://github.com/x/y", 5),
+        ("rev", "v1", 6),
+    ]
+
+
+def test_tokenize_yaml_skips_values_and_block_scalars() -> None:
+    text = textwrap.dedent("""\
+        - repo: local
+          hooks:
+            - id: check
+              name: "rev: 1.0"
+              args: [rev: 1, "repo: x"]
+              entry: |
+                rev: 2.0
+                - repo: https://github.com/psf/black
+
+                - black  # sync-with-uv
+              language: system  # sync-with-uv
+        - repo: meta
+        """)
+    assert _tokens(text, "yaml") == [
+        ("repo", "local", 1),
+        # a pragma is still a dependency in a block scalar
+        ("dependency", "        - black  # sync-with-uv", 10),
+        ("dependency", "      language: system  # sync-with-uv", 11),
+        ("repo", "meta", 12),
+    ]
+
+
+@pytest.mark.parametrize("value", ["check [things", "a {b", "a ]b", "x, {y"])
+def test_tokenize_yaml_brackets_in_plain_scalars(value: str) -> None:
+    """A bracket past the start of a block style value doesn't open a collection."""
+    text = (
+        "- repo: local\n"
+        "  hooks:\n"
+        "    - id: check\n"
+        f"      name: {value}\n"
+        "- repo: https://github.com/psf/black\n"
+        "  rev: 23.1.0\n"
+    )
+    assert _tokens(text, "yaml") == [
+        ("repo", "local", 1),
+        ("repo", "https://github.com/psf/black", 5),
+        ("rev", "23.1.0", 6),
+    ]
+    result, changes = process_config_text(text, UV_DATA, config_format="yaml")
+    assert "rev: 23.11.0" in result
+    assert changes.repos == {"black": ("23.1.0", "23.11.0")}
+
+
+@pytest.mark.parametrize(
+    "line",
+    ["  args: [", "  args: &anchor !!seq [", "  - - [", "  ? [", "  args:\t["],
+)
+def test_tokenize_yaml_multi_line_flow_sequence(line: str) -> None:
+    text = f"- repo: local\n{line}\n    rev: 1, repo: x\n  ]\n- repo: meta\n"
+    assert _tokens(text, "yaml") == [("repo", "local", 1), ("repo", "meta", 5)]
+
+
+@pytest.mark.parametrize("value", ["{weird", "[weird", "{a: [b", "[{a"])
+def test_tokenize_yaml_unclosed_flow_collection(value: str) -> None:
+    text = (
+        "repos:\n"
+        "- repo: https://github.com/psf/black\n"
+        "  rev: 23.1.0\n"
+        "  hooks:\n"
+        "  - id: black\n"
+        f"    files: {value}\n"
+        "- repo: https://github.com/astral-sh/ruff-pre-commit\n"
+        "  rev: v0.1.0\n"
+    )
+    assert _tokens(text, "yaml") == [
+        ("repo", "https://github.com/psf/black", 2),
+        ("rev", "23.1.0", 3),
+        ("repo", "https://github.com/astral-sh/ruff-pre-commit", 7),
+        ("rev", "v0.1.0", 8),
+    ]
+    result, changes = process_config_text(text, UV_DATA, config_format="yaml")
+    assert result.endswith("  rev: v0.1.5\n")
+    assert changes.repos == {
+        "black": ("23.1.0", "23.11.0"),
+        "ruff": ("v0.1.0", "v0.1.5"),
+    }
+
+
+def test_tokenize_toml() -> None:
+    text = textwrap.dedent('''\
+        [[repos]]
+        repo = "https://github.com/psf/black"
+        rev = '23.9.1'
+        hooks = [{ id = "black", entry = """
+        rev = "1.0"
+        """, additional_dependencies = [
+          "ruff",  # sync-with-uv
+        ] }]
+
+        repos = [
+          { repo = "https://github.com/astral-sh/ruff-pre-commit", rev = "v0.1.0" },
+          { "rev" = "v1", "repo" = "https://github.com/x/y" },
+          { repo = "local", hooks = [{ id = "x", rev = "ignored" }] },
+        ]
+        ''')
+    assert _tokens(text, "toml") == [
+        ("repo", "https://github.com/psf/black", 2),
+        ("rev", "23.9.1", 3),
+        ("dependency", '  "ruff",  # sync-with-uv', 7),
+        ("repo", "https://github.com/astral-sh/ruff-pre-commit", 11),
+        ("rev", "v0.1.0", 11),
+        ("repo", "https://github.com/x/y", 12),
+        ("rev", "v1", 12),
+        ("repo", "local", 13),
+    ]
+
+
+def test_config_tokenizer_offsets() -> None:
+    tokenizer = ConfigTokenizer("yaml")
+    assert tokenizer.feed("- repo: https://github.com/psf/black\r\n") == [
+        Token("repo", "https://github.com/psf/black", 1, 8, 36)
+    ]
+    assert tokenizer.feed("  rev: 1.0\r\n") == [Token("rev", "1.0", 2, 45, 48)]
+
+
+@pytest.mark.parametrize(
+    ("config_format", "text", "expected"),
+    [
+        (
+            "yaml",
+            (
+                "- {repo: https://github.com/psf/black, rev: 23.9.1}\n"
+                "- {rev: 0.1.0, repo: https://github.com/astral-sh/ruff-pre-commit}\n"
+            ),
+            (
+                "- {repo: https://github.com/psf/black, rev: 23.11.0}\n"
+                "- {rev: v0.1.5, repo: https://github.com/astral-sh/ruff-pre-commit}\n"
+            ),
+        ),
+        (
+            "yaml",
+            '- repo: "https://github.com/psf/black"\n  rev: "23.9.1"\n',
+            '- repo: "https://github.com/psf/black"\n  rev: "23.11.0"\n',
+        ),
+        (
+            "toml",
+            (
+                'repos = [{ repo = "https://github.com/psf/black", rev = "23.9.1" },'
+                ' { repo = "https://github.com/astral-sh/ruff-pre-commit",'
+                ' rev = "v0" }]\n'
+            ),
+            (
+                'repos = [{ repo = "https://github.com/psf/black", rev = "23.11.0" },'
+                ' { repo = "https://github.com/astral-sh/ruff-pre-commit",'
+                ' rev = "v0.1.5" }]\n'
+            ),
+        ),
+    ],
+)
+def test_process_config_text_inline_repos(
+    config_format: Literal["yaml", "toml"], text: str, expected: str
+) -> None:
+    result, changes = process_config_text(text, UV_DATA, config_format=config_format)
+    assert result == expected
+    assert changes.repos["black"] == ("23.9.1", "23.11.0")
+
+
+@pytest.mark.parametrize("config_format", ["yaml", "toml"])
+def test_tokenize_bytes(config_format: Literal["yaml", "toml"]) -> None:
+    text = (
+        "# déjà vu\n- repo: https://example.com/ünï\n  rev: ✓1.0\n"
+        if config_format == "yaml"
+        else '# déjà vu\n[[repos]]\nrepo = "https://example.com/ünï"\nrev = "✓1.0"\n'
+    )
+    data = text.encode()
+    tokens = list(tokenize_config(data.splitlines(keepends=True), config_format))
+    assert [token.value for token in tokens] == ["https://example.com/ünï", "✓1.0"]
+    for token in tokens:
+        # the spans are byte offsets
+        assert data[token.start : token.end] == token.value.encode()
+    assert [token.line_number for token in tokens] == (
+        [2, 3] if config_format == "yaml" else [3, 4]
+    )
+
+
+@pytest.mark.parametrize(
+    ("config_format", "text", "next_line", "expected"),
+    [
+        ("yaml", "- repo: local\n", "- repo: meta\n", True),
+        ("yaml", "- {repo: local,\n", "  rev: v1}\n", False),
+        ("yaml", "- repo: local\n  entry: |\n", "    - repo: meta\n", False),
+        ("yaml", "- repo: local\n  entry: |\n    x\n", "- repo: meta\n", True),
+        ("toml", 'a = """\n', 'repo = "local"\n', False),
+        ("toml", 'a = """x"""\n', 'repo = "local"\n', True),
+    ],
+)
+def test_config_tokenizer_at_top_level(
+    config_format: Literal["yaml", "toml"],
+    text: str,
+    next_line: str,
+    *,
+    expected: bool,
+) -> None:
+    tokenizer = ConfigTokenizer(config_format)
+    tokenizer.feed_lines(text.splitlines(keepends=True))
+    assert tokenizer.at_top_level(next_line) is expected
+    assert tokenizer.at_top_level(next_line.encode()) is expected
+
+
+def test_config_tokenizer_starts_at_line() -> None:
+    text = "# head\n- repo: https://github.com/psf/black\n  rev: 1.0\n"
+    lines = text.splitlines(keepends=True)
+    tokenizer = ConfigTokenizer("yaml", line_number=1, offset=len(lines[0]))
+    assert tokenizer.feed_lines(lines[1:]) == list(tokenize_config(lines, "yaml"))
+    assert (tokenizer.line_number, tokenizer.offset) == (3, len(text))